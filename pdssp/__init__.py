@@ -36,8 +36,8 @@ from .custom_logging import UtilsLogs
 logging.getLogger(__name__).addHandler(NullHandler())
 
 UtilsLogs.add_logging_level("TRACE", 15)
+PATH_TO_CONF = os.path.dirname(os.path.realpath(__file__))
 try:
-    PATH_TO_CONF = os.path.dirname(os.path.realpath(__file__))
     logging.config.fileConfig(
         os.path.join(PATH_TO_CONF, "logging.conf"),
         disable_existing_loggers=False,
@@ -45,4 +45,12 @@ try:
     logging.debug(f"file {os.path.join(PATH_TO_CONF, 'logging.conf')} loaded")
 except Exception as exception:  # pylint: disable=broad-except
     logging.warning(f"cannot load logging.conf : {exception}")
+try:
+    UtilsLogs.configure_from_file(
+        os.path.join(PATH_TO_CONF, "conf", "pdssp.conf"), __name__
+    )
+except Exception as exception:  # pylint: disable=broad-except
+    logging.warning(
+        f"cannot configure the logging from pdssp.conf : {exception}"
+    )
 logging.setLogRecordFactory(LogRecord)  # pylint: disable=no-member
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from .footprints import Footprints
+from .geodesy import Geodesy
+from .lod import LevelOfDetail
+from .query import Mask
+from .query import QueryCache
+from .temporal import Temporal
+from .temporal import TimeIndex
+
+__all__ = [
+    "Footprints",
+    "Geodesy",
+    "LevelOfDetail",
+    "Mask",
+    "QueryCache",
+    "Temporal",
+    "TimeIndex",
+]
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+from typing import List
+from typing import Optional
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import CRS
+from shapely.geometry.base import BaseGeometry
+
+from .geodesy import Geodesy
+
+logger = logging.getLogger(__name__)
+
+
+def _union_chunk(geometries: np.ndarray) -> BaseGeometry:
+    return shapely.union_all(geometries)
+
+
+class Footprints:
+    """Geometric analytics on the footprints of a catalog.
+
+    The areas and perimeters are computed on the ellipsoid of the body by
+    Geodesy, vectorized over all the footprints. The unions are split in
+    chunks processed by a pool of processes.
+    """
+
+    CHUNK_SIZE = 20000
+
+    @staticmethod
+    def _chunks(geometries: np.ndarray, chunk_size: int) -> List[np.ndarray]:
+        return [
+            geometries[start : start + chunk_size]
+            for start in range(0, len(geometries), chunk_size)
+        ]
+
+    @staticmethod
+    def _map(
+        func: Callable,
+        chunks: List[np.ndarray],
+        max_workers: Optional[int],
+        *args,
+    ) -> List:
+        if len(chunks) <= 1 or max_workers == 1:
+            return [func(chunk, *args) for chunk in chunks]
+        max_workers = min(len(chunks), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            return list(
+                pool.map(func, chunks, *[[arg] * len(chunks) for arg in args])
+            )
+
+    @staticmethod
+    def _geometries(data: gpd.GeoDataFrame) -> np.ndarray:
+        return np.asarray(data.geometry.values, dtype=object)
+
+    @staticmethod
+    def area(data: gpd.GeoDataFrame, crs: CRS) -> pd.Series:
+        """Returns the area of the footprints on the ellipsoid of the body.
+
+        Args:
+            data (gpd.GeoDataFrame): footprints in longitude/latitude
+            crs (CRS): geographic CRS of the body, defining its ellipsoid
+
+        Returns:
+            pd.Series: area in square meters, with the index of data
+        """
+        return pd.Series(
+            Geodesy.get_instance(crs).area(Footprints._geometries(data)),
+            index=data.index,
+            name="area",
+        )
+
+    @staticmethod
+    def perimeter(data: gpd.GeoDataFrame, crs: CRS) -> pd.Series:
+        """Returns the geodesic perimeter of the footprints, in meters."""
+        return pd.Series(
+            Geodesy.get_instance(crs).perimeter(Footprints._geometries(data)),
+            index=data.index,
+            name="perimeter",
+        )
+
+    @staticmethod
+    def coverage(
+        data: gpd.GeoDataFrame,
+        max_workers: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> BaseGeometry:
+        """Returns the union of the footprints.
+
+        The chunks are merged in parallel, then the partial unions are
+        merged together.
+        """
+        chunks = Footprints._chunks(Footprints._geometries(data), chunk_size)
+        unions = Footprints._map(_union_chunk, chunks, max_workers)
+        return shapely.union_all(np.array(unions, dtype=object))
+
+    @staticmethod
+    def coverage_area(
+        data: gpd.GeoDataFrame,
+        crs: CRS,
+        max_workers: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> float:
+        """Returns the area covered by the footprints on the ellipsoid of
+        the body, in square meters, the overlaps being counted once."""
+        union = Footprints.coverage(data, max_workers, chunk_size)
+        return float(
+            Geodesy.get_instance(crs).area(np.array([union], dtype=object))[0]
+        )
+
+    @staticmethod
+    def _intersecting_pairs(
+        geometries: np.ndarray, chunk_size: int
+    ) -> np.ndarray:
+        """Returns the pairs (i, j), i < j, of intersecting geometries."""
+        tree = shapely.STRtree(geometries)
+        pairs: List[np.ndarray] = list()
+        for start in range(0, len(geometries), chunk_size):
+            left, right = tree.query(
+                geometries[start : start + chunk_size], predicate="intersects"
+            )
+            left = left + start
+            keep = left < right
+            pairs.append(np.stack([left[keep], right[keep]]))
+        if len(pairs) == 0:
+            return np.empty((2, 0), dtype=np.intp)
+        return np.concatenate(pairs, axis=1)
+
+    @staticmethod
+    def overlap_counts(
+        data: gpd.GeoDataFrame, chunk_size: int = CHUNK_SIZE
+    ) -> pd.Series:
+        """Returns, for each footprint, the number of other footprints
+        intersecting it."""
+        geometries = Footprints._geometries(data)
+        pairs = Footprints._intersecting_pairs(geometries, chunk_size)
+        counts = np.bincount(pairs.ravel(), minlength=len(geometries)).astype(
+            np.int64
+        )
+        return pd.Series(counts, index=data.index, name="overlaps")
+
+    @staticmethod
+    def stereo_pairs(
+        data: gpd.GeoDataFrame,
+        min_overlap: float = 0.5,
+        angle_column: Optional[str] = None,
+        min_angle_difference: float = 0,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> pd.DataFrame:
+        """Returns the pairs of footprints that can form a stereo pair.
+
+        Args:
+            data (gpd.GeoDataFrame): footprints
+            min_overlap (float, optional): minimum ratio between the
+                intersection and the smallest footprint of the pair.
+                Defaults to 0.5.
+            angle_column (Optional[str], optional): column of the viewing
+                angle (emission angle, ...). Defaults to None.
+            min_angle_difference (float, optional): minimum difference of
+                viewing angle between the two footprints. Defaults to 0.
+            chunk_size (int, optional): number of footprints by probe of
+                the spatial index.
+
+        Returns:
+            pd.DataFrame: the positions and the index values of the two
+            footprints and their overlap ratio
+        """
+        geometries = Footprints._geometries(data)
+        left, right = Footprints._intersecting_pairs(geometries, chunk_size)
+        if angle_column is not None:
+            angles = data[angle_column].to_numpy(dtype=float)
+            keep = np.abs(angles[left] - angles[right]) >= min_angle_difference
+            left, right = left[keep], right[keep]
+        areas = shapely.area(geometries)
+        intersections = shapely.area(
+            shapely.intersection(geometries[left], geometries[right])
+        )
+        smallest = np.minimum(areas[left], areas[right])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            overlap = np.where(smallest > 0, intersections / smallest, 0.0)
+        keep = overlap >= min_overlap
+        return pd.DataFrame(
+            {
+                "left": left[keep],
+                "right": right[keep],
+                "left_index": data.index[left[keep]],
+                "right_index": data.index[right[keep]],
+                "overlap": overlap[keep],
+            }
+        )
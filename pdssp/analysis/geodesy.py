@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+import shapely
+from pyproj import CRS
+from pyproj import Geod
+
+logger = logging.getLogger(__name__)
+
+
+class Geodesy:
+    """Areas, perimeters and distances on the ellipsoid of a body.
+
+    The computations are vectorized over whole arrays of geometries. The
+    distances and perimeters are geodesic; the areas are computed on the
+    authalic sphere of the ellipsoid, which keeps the areas, with the
+    exact spherical excess of each edge.
+
+    One instance is built by body, see get_instance.
+    """
+
+    __instances: Dict[str, "Geodesy"] = dict()
+    __lock = threading.Lock()
+
+    def __init__(self, crs: CRS):
+        geod: Optional[Geod] = CRS(crs).get_geod()
+        if geod is None:
+            raise ValueError(f"{crs} has no ellipsoid")
+        self.__geod: Geod = geod
+        self.__e: float = np.sqrt(self.geod.f * (2 - self.geod.f))
+        self.__qp: float = self._q(np.array([np.pi / 2]))[0]
+        self.__authalic_radius: float = self.geod.a * np.sqrt(self.__qp / 2)
+
+    @staticmethod
+    def get_instance(crs: CRS) -> "Geodesy":
+        """Returns the geodesy of the ellipsoid of crs, built once."""
+        key: str = CRS(crs).to_wkt()
+        with Geodesy.__lock:
+            if key not in Geodesy.__instances:
+                Geodesy.__instances[key] = Geodesy(crs)
+            return Geodesy.__instances[key]
+
+    @property
+    def geod(self) -> Geod:
+        return self.__geod
+
+    @property
+    def authalic_radius(self) -> float:
+        return self.__authalic_radius
+
+    def _q(self, phi: np.ndarray) -> np.ndarray:
+        sin_phi = np.sin(phi)
+        e = self.__e
+        if e == 0:
+            return 2 * sin_phi
+        return (1 - e ** 2) * (
+            sin_phi / (1 - (e * sin_phi) ** 2)
+            - np.log((1 - e * sin_phi) / (1 + e * sin_phi)) / (2 * e)
+        )
+
+    def _authalic_latitude(self, lat: np.ndarray) -> np.ndarray:
+        phi = np.radians(lat)
+        if self.__e == 0:
+            return phi
+        return np.arcsin(np.clip(self._q(phi) / self.__qp, -1, 1))
+
+    @staticmethod
+    def _edges(
+        lines: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the coordinates of the start and the end of the edges of
+        linear geometries, and the position of their geometry."""
+        coords, index = shapely.get_coordinates(lines, return_index=True)
+        same = index[:-1] == index[1:]
+        return coords[:-1][same], coords[1:][same], index[:-1][same]
+
+    def _ring_excess(self, rings: np.ndarray) -> np.ndarray:
+        start, end, index = Geodesy._edges(rings)
+        beta1 = self._authalic_latitude(start[:, 1])
+        beta2 = self._authalic_latitude(end[:, 1])
+        dlon = np.radians((end[:, 0] - start[:, 0] + 180) % 360 - 180)
+        tan1 = np.tan(beta1 / 2)
+        tan2 = np.tan(beta2 / 2)
+        excess = 2 * np.arctan(
+            np.tan(dlon / 2) * (tan1 + tan2) / (1 + tan1 * tan2)
+        )
+        return np.abs(np.bincount(index, excess, minlength=len(rings)))
+
+    def area(self, geometries: np.ndarray) -> np.ndarray:
+        """Returns the areas of (multi)polygons in longitude/latitude, in
+        square meters; 0 for the other geometries."""
+        geometries = np.asarray(geometries, dtype=object)
+        parts, part_index = shapely.get_parts(geometries, return_index=True)
+        is_polygon = shapely.get_type_id(parts) == 3
+        parts, part_index = parts[is_polygon], part_index[is_polygon]
+        rings, ring_index = shapely.get_rings(parts, return_index=True)
+        # the exterior ring is the first ring of each polygon
+        first = np.ones(len(rings), dtype=bool)
+        first[1:] = ring_index[1:] != ring_index[:-1]
+        excess = self._ring_excess(rings)
+        signed = np.where(first, excess, -excess)
+        by_part = np.bincount(ring_index, signed, minlength=len(parts))
+        by_geometry = np.bincount(
+            part_index, by_part, minlength=len(geometries)
+        )
+        return by_geometry * self.authalic_radius ** 2
+
+    def _geodesic_length(self, lines: np.ndarray, size: int) -> np.ndarray:
+        start, end, index = Geodesy._edges(lines)
+        distances = self.geod.inv(
+            start[:, 0], start[:, 1], end[:, 0], end[:, 1]
+        )[2]
+        return np.bincount(index, distances, minlength=size)
+
+    def perimeter(self, geometries: np.ndarray) -> np.ndarray:
+        """Returns the geodesic perimeters of (multi)polygons, holes
+        included, in meters."""
+        geometries = np.asarray(geometries, dtype=object)
+        parts, part_index = shapely.get_parts(geometries, return_index=True)
+        rings, ring_index = shapely.get_rings(parts, return_index=True)
+        by_ring = self._geodesic_length(rings, len(rings))
+        by_part = np.bincount(ring_index, by_ring, minlength=len(parts))
+        return np.bincount(part_index, by_part, minlength=len(geometries))
+
+    def length(self, geometries: np.ndarray) -> np.ndarray:
+        """Returns the geodesic lengths of (multi)linestrings, in
+        meters."""
+        geometries = np.asarray(geometries, dtype=object)
+        parts, part_index = shapely.get_parts(geometries, return_index=True)
+        by_part = self._geodesic_length(parts, len(parts))
+        return np.bincount(part_index, by_part, minlength=len(geometries))
+
+    def distance(
+        self,
+        lon1: np.ndarray,
+        lat1: np.ndarray,
+        lon2: np.ndarray,
+        lat2: np.ndarray,
+    ) -> np.ndarray:
+        """Returns the geodesic distances between points, in meters."""
+        return np.asarray(self.geod.inv(lon1, lat1, lon2, lat2)[2])
+
+    def distance_points(
+        self, points1: np.ndarray, points2: np.ndarray
+    ) -> np.ndarray:
+        """Returns the geodesic distances between two arrays of points, in
+        meters."""
+        return self.distance(
+            shapely.get_x(points1),
+            shapely.get_y(points1),
+            shapely.get_x(points2),
+            shapely.get_y(points2),
+        )
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+logger = logging.getLogger(__name__)
+
+
+class LevelOfDetail:
+    """Simplified footprints of a catalog at several tolerances.
+
+    Each level is computed once, on the first use, by a vectorized
+    topology-preserving simplification of all the footprints. The level of
+    a view is the coarsest one whose tolerance stays under a pixel, made
+    coarser while the selection has more than MAX_VERTICES vertices.
+    """
+
+    # tolerances of the levels in units of the CRS, level 0 is the full
+    # resolution
+    TOLERANCES: Tuple[float, ...] = (0.0, 0.001, 0.005, 0.02, 0.1, 0.5)
+    # number of pixels across the view
+    RESOLUTION = 1024
+    # maximum number of vertices sent for a view
+    MAX_VERTICES = 200000
+
+    def __init__(
+        self,
+        geometries: gpd.GeoSeries,
+        tolerances: Tuple[float, ...] = TOLERANCES,
+    ):
+        self.__index: pd.Index = geometries.index
+        self.__crs = geometries.crs
+        self.__tolerances: Tuple[float, ...] = tuple(tolerances)
+        self.__levels: Dict[int, np.ndarray] = {
+            0: np.asarray(geometries.values, dtype=object)
+        }
+        self.__vertices: Dict[int, np.ndarray] = dict()
+        self.__lock = threading.Lock()
+
+    @property
+    def tolerances(self) -> Tuple[float, ...]:
+        return self.__tolerances
+
+    def geometries(self, level: int) -> np.ndarray:
+        """Footprints simplified at level, computed once."""
+        with self.__lock:
+            if level not in self.__levels:
+                logger.debug(
+                    f"Simplifying {len(self.__index)} footprints with "
+                    f"tolerance {self.tolerances[level]}"
+                )
+                self.__levels[level] = shapely.simplify(
+                    self.__levels[0],
+                    self.tolerances[level],
+                    preserve_topology=True,
+                )
+            return self.__levels[level]
+
+    def nb_vertices(self, level: int) -> np.ndarray:
+        """Number of vertices of each footprint at level."""
+        geometries: np.ndarray = self.geometries(level)
+        with self.__lock:
+            if level not in self.__vertices:
+                self.__vertices[level] = shapely.get_num_coordinates(
+                    geometries
+                )
+            return self.__vertices[level]
+
+    def _positions(self, data: gpd.GeoDataFrame) -> Optional[np.ndarray]:
+        """Positions of the rows of data in the catalog, None when they
+        cannot be found by index."""
+        if not self.__index.is_unique:
+            return None
+        positions: np.ndarray = self.__index.get_indexer(data.index)
+        if (positions < 0).any():
+            return None
+        return positions
+
+    def level(self, extent: float, data: gpd.GeoDataFrame) -> int:
+        """Level to display data in a view of extent, in units of the
+        CRS."""
+        pixel: float = extent / LevelOfDetail.RESOLUTION
+        level: int = 0
+        while (
+            level + 1 < len(self.tolerances)
+            and self.tolerances[level + 1] <= pixel
+        ):
+            level += 1
+        positions: Optional[np.ndarray] = self._positions(data)
+        if positions is None:
+            return level
+        while (
+            level + 1 < len(self.tolerances)
+            and self.nb_vertices(level)[positions].sum()
+            > LevelOfDetail.MAX_VERTICES
+        ):
+            level += 1
+        return level
+
+    def simplify(self, data: gpd.GeoDataFrame, level: int) -> gpd.GeoDataFrame:
+        """Returns data with its footprints at level."""
+        if level == 0:
+            return data
+        positions: Optional[np.ndarray] = self._positions(data)
+        geometries: np.ndarray
+        if positions is None:
+            geometries = shapely.simplify(
+                np.asarray(data.geometry.values, dtype=object),
+                self.tolerances[level],
+                preserve_topology=True,
+            )
+        else:
+            geometries = self.geometries(level)[positions]
+        return data.set_geometry(
+            gpd.GeoSeries(geometries, index=data.index, crs=self.__crs)
+        )
+
+    def select(
+        self, extent: float, data: gpd.GeoDataFrame
+    ) -> Tuple[int, gpd.GeoDataFrame]:
+        """Returns the level of data in a view of extent and data simplified
+        at this level."""
+        level: int = self.level(extent, data)
+        return level, self.simplify(data, level)
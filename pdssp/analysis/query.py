@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import ast
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class Mask:
+    """Boolean mask of the rows of a catalog selected by an expression.
+
+    Masks are combined with &, | and ~ without evaluating the expressions
+    again.
+    """
+
+    def __init__(self, expression: str, values: np.ndarray):
+        self.__expression: str = expression
+        self.__values: np.ndarray = values
+
+    @property
+    def expression(self) -> str:
+        return self.__expression
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.__values
+
+    def __and__(self, other: "Mask") -> "Mask":
+        return Mask(
+            f"({self.expression}) and ({other.expression})",
+            self.values & other.values,
+        )
+
+    def __or__(self, other: "Mask") -> "Mask":
+        return Mask(
+            f"({self.expression}) or ({other.expression})",
+            self.values | other.values,
+        )
+
+    def __invert__(self) -> "Mask":
+        return Mask(f"not ({self.expression})", ~self.values)
+
+    def __len__(self) -> int:
+        return int(self.values.sum())
+
+    def __repr__(self) -> str:
+        return f"Mask({self.expression!r}, {len(self)} rows)"
+
+
+class QueryCache:
+    """Masks and results of the queries of a catalog, computed once.
+
+    An expression is parsed once and normalized, so that the spacing does
+    not matter. Its and/or/not operands (and the parenthesized &, |, ~
+    ones) are evaluated separately by pandas and cached as masks, so that
+    an expression sharing operands with the previous ones only evaluates
+    the new ones. Before Python 3.9, without ast.unparse, the operands are
+    not split and the whole expression is cached with its spacing
+    normalized. The caches are dropped when the shape or the columns of
+    the data change, or by invalidate after an in-place modification.
+    """
+
+    # number of masks and of results kept
+    MAX_MASKS = 256
+    MAX_RESULTS = 16
+
+    def __init__(self, data: pd.DataFrame):
+        self.__data: pd.DataFrame = data
+        self.__fingerprint: Tuple = self._fingerprint()
+        self.__masks: OrderedDict = OrderedDict()
+        self.__results: OrderedDict = OrderedDict()
+        self.__lock = threading.RLock()
+        self.__hits: int = 0
+        self.__misses: int = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Number of hits and misses of the masks and results."""
+        return {"hits": self.__hits, "misses": self.__misses}
+
+    def _fingerprint(self) -> Tuple:
+        return self.__data.shape, tuple(self.__data.columns)
+
+    def invalidate(self) -> None:
+        """Drops the cached masks and results, after a modification of the
+        data."""
+        with self.__lock:
+            self.__masks.clear()
+            self.__results.clear()
+            self.__fingerprint = self._fingerprint()
+
+    def _check_data(self) -> None:
+        if self._fingerprint() != self.__fingerprint:
+            logger.debug("The data have changed, the queries are dropped")
+            self.invalidate()
+
+    @staticmethod
+    def _parse(expression: str) -> Union[ast.expr, str]:
+        if not hasattr(ast, "unparse"):
+            return " ".join(expression.split())
+        try:
+            return ast.parse(expression.strip(), mode="eval").body
+        except SyntaxError:
+            # pandas syntax, as the backquoted column names
+            return " ".join(expression.split())
+
+    @staticmethod
+    def normalize(expression: str) -> str:
+        """Normalized form of expression, used as key of the caches."""
+        node: Union[ast.expr, str] = QueryCache._parse(expression)
+        return node if isinstance(node, str) else ast.unparse(node)
+
+    @staticmethod
+    def _put(cache: OrderedDict, key: str, value, max_size: int) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+    def _evaluate(self, expression: str) -> np.ndarray:
+        values = self.__data.eval(expression)
+        if not isinstance(values, pd.Series) or not (
+            pd.api.types.is_bool_dtype(values.dtype)
+        ):
+            raise ValueError(f"{expression} is not a boolean expression")
+        return values.fillna(False).to_numpy(dtype=bool)
+
+    def _mask(self, node: Union[ast.expr, str]) -> np.ndarray:
+        key: str = node if isinstance(node, str) else ast.unparse(node)
+        values = self.__masks.get(key)
+        if values is not None:
+            self.__hits += 1
+            self.__masks.move_to_end(key)
+            return values
+        self.__misses += 1
+        if isinstance(node, ast.BoolOp):
+            values = self._mask(node.values[0])
+            for operand in node.values[1:]:
+                if isinstance(node.op, ast.And):
+                    values = values & self._mask(operand)
+                else:
+                    values = values | self._mask(operand)
+        elif isinstance(node, ast.BinOp) and isinstance(
+            node.op, (ast.BitAnd, ast.BitOr)
+        ):
+            left = self._mask(node.left)
+            right = self._mask(node.right)
+            if isinstance(node.op, ast.BitAnd):
+                values = left & right
+            else:
+                values = left | right
+        elif isinstance(node, ast.UnaryOp) and isinstance(
+            node.op, (ast.Not, ast.Invert)
+        ):
+            values = ~self._mask(node.operand)
+        else:
+            values = self._evaluate(key)
+        values.flags.writeable = False
+        QueryCache._put(self.__masks, key, values, QueryCache.MAX_MASKS)
+        return values
+
+    def mask(self, expression: Union[str, Mask]) -> Mask:
+        """Mask of the rows selected by expression."""
+        if isinstance(expression, Mask):
+            return expression
+        with self.__lock:
+            self._check_data()
+            node: Union[ast.expr, str] = QueryCache._parse(expression)
+            key: str = node if isinstance(node, str) else ast.unparse(node)
+            return Mask(key, self._mask(node))
+
+    def query(self, expression: Union[str, Mask]) -> pd.DataFrame:
+        """Rows selected by expression, like DataFrame.query."""
+        with self.__lock:
+            mask: Mask = self.mask(expression)
+            key: str = QueryCache.normalize(mask.expression)
+            result = self.__results.get(key)
+            if result is None:
+                self.__misses += 1
+                result = self.__data[mask.values]
+                QueryCache._put(
+                    self.__results, key, result, QueryCache.MAX_RESULTS
+                )
+            else:
+                self.__hits += 1
+                self.__results.move_to_end(key)
+        # without copy on write (pandas < 3), a shallow copy would share
+        # the blocks of the cached result
+        return result.copy()
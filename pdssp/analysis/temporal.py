@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import logging
+from typing import Union
+
+import geopandas as gpd
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+Time = Union[str, pd.Timestamp]
+
+
+class Temporal:
+    """Time-window queries on a catalog indexed by datetime.
+
+    The windows are found by binary search on the sorted index, so a query
+    does not parse any pandas query string. Each call sorts and scans the
+    index; use a TimeIndex to query the same catalog several times.
+    """
+
+    @staticmethod
+    def _index(data: gpd.GeoDataFrame) -> pd.DatetimeIndex:
+        if not isinstance(data.index, pd.DatetimeIndex):
+            raise ValueError("The catalog is not indexed by datetime")
+        return data.index
+
+    @staticmethod
+    def _nb_valid(index: pd.DatetimeIndex) -> int:
+        return len(index) - int(index.isna().sum())
+
+    @staticmethod
+    def _sorted(data: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        index: pd.DatetimeIndex = Temporal._index(data)
+        nb_valid: int = Temporal._nb_valid(index)
+        # the items without datetime are at the end of a sorted catalog
+        if (
+            not index[:nb_valid].is_monotonic_increasing
+            or index[:nb_valid].hasnans
+        ):
+            data = data.sort_index(na_position="last")
+        return data
+
+    @staticmethod
+    def _timestamp(index: pd.DatetimeIndex, time: Time) -> pd.Timestamp:
+        timestamp = pd.Timestamp(time)
+        if index.tz is not None and timestamp.tz is None:
+            timestamp = timestamp.tz_localize(index.tz)
+        elif index.tz is None and timestamp.tz is not None:
+            timestamp = timestamp.tz_convert(None)
+        return timestamp
+
+    @staticmethod
+    def parse(data: gpd.GeoDataFrame, column: str = "datetime") -> None:
+        """Converts a column of RFC 3339 strings to UTC datetime64, the
+        invalid or missing values becoming NaT."""
+        data[column] = pd.to_datetime(data[column], utc=True, errors="coerce")
+
+    @staticmethod
+    def between(
+        data: gpd.GeoDataFrame, start: Time, end: Time
+    ) -> gpd.GeoDataFrame:
+        """Returns the items acquired between start and end, both included.
+
+        Args:
+            data (gpd.GeoDataFrame): catalog indexed by datetime
+            start (Time): start of the window
+            end (Time): end of the window
+
+        Returns:
+            gpd.GeoDataFrame: the items of the window
+        """
+        return TimeIndex(data).between(start, end)
+
+    @staticmethod
+    def asof(data: gpd.GeoDataFrame, time: Time) -> gpd.GeoDataFrame:
+        """Returns the last item acquired at or before time.
+
+        Args:
+            data (gpd.GeoDataFrame): catalog indexed by datetime
+            time (Time): time
+
+        Returns:
+            gpd.GeoDataFrame: the item, empty when all the items are
+            acquired after time
+        """
+        return TimeIndex(data).asof(time)
+
+    @staticmethod
+    def resample(data: gpd.GeoDataFrame, freq: str) -> pd.Series:
+        """Returns the number of items acquired in each time window.
+
+        Args:
+            data (gpd.GeoDataFrame): catalog indexed by datetime
+            freq (str): length of the windows, as a pandas offset alias
+                (D, W, MS, ...)
+
+        Returns:
+            pd.Series: the number of items by window
+        """
+        index: pd.DatetimeIndex = Temporal._index(data).dropna()
+        counts = pd.Series(1, index=index).sort_index().resample(freq).sum()
+        counts.name = "count"
+        return counts
+
+
+class TimeIndex:
+    """Catalog indexed by datetime, sorted once with the items without
+    datetime at the end, so that each query is only a binary search on
+    the datetimes."""
+
+    def __init__(self, data: gpd.GeoDataFrame):
+        self.__data: gpd.GeoDataFrame = Temporal._sorted(data)
+        index: pd.DatetimeIndex = Temporal._index(self.__data)
+        self.__valid: pd.DatetimeIndex = index[: Temporal._nb_valid(index)]
+
+    @property
+    def data(self) -> gpd.GeoDataFrame:
+        return self.__data
+
+    def _search(self, time: Time, side: str) -> int:
+        timestamp = Temporal._timestamp(self.__valid, time)
+        return int(self.__valid.searchsorted(timestamp, side=side))
+
+    def between(self, start: Time, end: Time) -> gpd.GeoDataFrame:
+        """Returns the items acquired between start and end, both
+        included."""
+        first: int = self._search(start, "left")
+        last: int = self._search(end, "right")
+        return self.data.iloc[first:last]
+
+    def asof(self, time: Time) -> gpd.GeoDataFrame:
+        """Returns the last item acquired at or before time, empty when all
+        the items are acquired after time."""
+        position: int = self._search(time, "right")
+        return self.data.iloc[max(0, position - 1) : position]
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""GeoJSON serialization of the footprints of a planet."""
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import geopandas as gpd
+import numpy as np
+
+from ..tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+
+def to_geojson(data: gpd.GeoDataFrame) -> Dict:
+    """Serializes data as a GeoJSON feature collection, the id of a feature
+    being its index."""
+    with Tracer.get_instance().span(
+        "planet.geojson", rows=data.shape[0]
+    ) as span:
+        geojson: str = data.to_json()
+        span.set_attribute("bytes", len(geojson))
+        return json.loads(geojson)
+
+
+class FeatureCache:
+    """GeoJSON features of the rows of a GeoDataFrame, built once by row.
+
+    The GeoJSON of a selection of rows is assembled from the cached
+    features; only the rows never serialized are converted, in one batch.
+    The last collections are also kept, keyed by the positions of their
+    rows and by the generation of the geometries, which changes when the
+    geometry column is replaced or when invalidate is called.
+    """
+
+    # number of feature collections kept
+    MAX_COLLECTIONS = 32
+
+    def __init__(self, data: gpd.GeoDataFrame):
+        self.__data: gpd.GeoDataFrame = data
+        self.__geometries = data.geometry.values
+        self.__generation: int = 0
+        self.__features: Dict[int, Dict] = dict()
+        self.__collections: OrderedDict = OrderedDict()
+        self.__lock = threading.RLock()
+
+    @property
+    def generation(self) -> int:
+        with self.__lock:
+            self._check_geometries()
+            return self.__generation
+
+    def _check_geometries(self) -> None:
+        if self.__data.geometry.values is not self.__geometries:
+            self.__geometries = self.__data.geometry.values
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drops the cached features, after a modification of the data."""
+        with self.__lock:
+            self.__generation += 1
+            self.__features.clear()
+            self.__collections.clear()
+
+    def _positions(self, selection: gpd.GeoDataFrame) -> Optional[np.ndarray]:
+        if not self.__data.index.is_unique:
+            return None
+        positions: np.ndarray = self.__data.index.get_indexer(selection.index)
+        if (positions < 0).any():
+            return None
+        return positions
+
+    def features(self, selection: gpd.GeoDataFrame) -> List[Dict]:
+        """Features of the rows of selection, which must be rows of the
+        data; the other selections are serialized without cache."""
+        positions: Optional[np.ndarray] = self._positions(selection)
+        if positions is None:
+            return to_geojson(selection)["features"]
+        with self.__lock:
+            self._check_geometries()
+            missing: List[int] = list(
+                dict.fromkeys(
+                    position
+                    for position in positions.tolist()
+                    if position not in self.__features
+                )
+            )
+            if len(missing) > 0:
+                features: List[Dict] = to_geojson(self.__data.iloc[missing])[
+                    "features"
+                ]
+                self.__features.update(zip(missing, features))
+            return [
+                self.__features[position] for position in positions.tolist()
+            ]
+
+    def geojson(self, selection: gpd.GeoDataFrame) -> Dict:
+        """Feature collection of the rows of selection, shared with the
+        next calls for the same rows: it must not be modified."""
+        positions: Optional[np.ndarray] = self._positions(selection)
+        if positions is None:
+            return to_geojson(selection)
+        with self.__lock:
+            key = (self.generation, positions.tobytes())
+            collection: Optional[Dict] = self.__collections.get(key)
+            if collection is None:
+                collection = {
+                    "type": "FeatureCollection",
+                    "features": self.features(selection),
+                }
+                self.__collections[key] = collection
+                while len(self.__collections) > FeatureCache.MAX_COLLECTIONS:
+                    self.__collections.popitem(last=False)
+            else:
+                self.__collections.move_to_end(key)
+            return collection
@@ -1,32 +1,115 @@
 # -*- coding: utf-8 -*-
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from typing import cast
 from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Tuple
 from typing import Union
 
 import geopandas as gpd
+import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-
+from pyproj import CRS
+from shapely.geometry.base import BaseGeometry
+
+from ..analysis import Footprints
+from ..analysis import Geodesy
+from ..analysis import LevelOfDetail
+from ..analysis import Mask
+from ..analysis import QueryCache
+from ..analysis import Temporal
+from ..analysis import TimeIndex
+from ..dal import ParquetCatalog
+from ..dal import PreviewLoader
+from ..dal import SpatialJoin
 from ..dal import Stac
 from ..dal import StacEnum
+from ..dal import Wfs
 from ..iwidget import GeoJSONLayer
 from ..iwidget import PluginVisu
 from ..iwidget import Surface
+from ..iwidget import TileServer
 from ..iwidget import WMSLayer
 from ..iwidget.mizar import Mizar
+from ..monitoring import UtilsMonitoring
+from ..tracing import Tracer
+from .geojson import FeatureCache
+from .geojson import to_geojson
 
 JSON = Union[None, bool, str, float, int, List["JSON"], Dict[str, "JSON"]]
 
 logger = logging.getLogger(__name__)
 
 
+def _show_geojson(
+    visu: Mizar,
+    name: str,
+    data: gpd.GeoDataFrame,
+    style: Dict,
+    center: bool = False,
+    lod: Optional[LevelOfDetail] = None,
+    cache: Optional[FeatureCache] = None,
+) -> None:
+    """Displays data in the GeoJSON layer name.
+
+    With lod, the footprints are simplified for the extent of data; the
+    zoom of the map in the widget is not observed. When the layer exists,
+    it is updated in place and only the rows that are not displayed yet
+    are serialized, the data of the layer being still sent whole to the
+    widget. The rows at full resolution are serialized through cache.
+    """
+
+    def serialize(rows: gpd.GeoDataFrame, rows_ids: pd.Index) -> Dict:
+        if level == 0 and cache is not None:
+            return cache.geojson(rows)
+        return to_geojson(rows.set_axis(rows_ids))
+
+    level: int = 0
+    if lod is not None:
+        level, data = lod.select(Mizar.extent_of(data.total_bounds), data)
+    # ids of the features, a row simplified at another level is another
+    # feature
+    ids: pd.Index = pd.Index([str(idx) for idx in data.index])
+    if level > 0:
+        ids = ids + f"@{level}"
+    if not visu.has_layer(name):
+        visu.add_layer(
+            GeoJSONLayer(name=name, data=serialize(data, ids), style=style),
+            center=center,
+        )
+        return
+    if not ids.is_unique:
+        visu.update_layer(name, data=serialize(data, ids), style=style)
+    else:
+        displayed: pd.Index = pd.Index(list(visu.feature_ids(name)))
+        is_new: np.ndarray = ~ids.isin(displayed)
+        added: List[Dict] = list()
+        if is_new.any():
+            added = serialize(data[is_new], ids[is_new])["features"]
+        visu.update_features(
+            name,
+            added=added,
+            removed=displayed.difference(ids),
+            style=style,
+        )
+    visu.update_layer(name, visible=True)
+    if center and data.shape[0] > 0:
+        visu.center_on(data.total_bounds)
+
+
 class IPlanet:
-    pass
     # Create interface
 
+    @property
+    def data(self) -> Union[gpd.GeoDataFrame, ParquetCatalog]:
+        """Items of the planet, in memory or partitioned on disk."""
+        raise NotImplementedError("Not implemented")
+
 
 class PlanetEnum(Enum):
 
@@ -36,14 +119,47 @@ class PlanetEnum(Enum):
 
 class PlanetFactory:
     @staticmethod
-    def load(url: str, max_records: int = None) -> IPlanet:
-        gdf: gpd.GeoDataFrame = Stac.load(StacEnum.ITEM, url, max_records)
+    def load(
+        url: str,
+        max_records: int = None,
+        columns: Optional[List[str]] = None,
+    ) -> IPlanet:
+        """Loads the items of url on their planet; with columns, only these
+        columns and the ssys:targets one, which gives the planet, are
+        loaded."""
+        with Tracer.get_instance().span("planet.load", url=url) as span:
+            planet: IPlanet = PlanetFactory._load(url, max_records, columns)
+            span.set_attribute("rows", planet.data.shape[0])
+        return planet
+
+    @staticmethod
+    def _columns(columns: Optional[List[str]]) -> Optional[List[str]]:
+        if columns is None or "ssys:targets" in columns:
+            return columns
+        return list(columns) + ["ssys:targets"]
+
+    @staticmethod
+    def _load(
+        url: str,
+        max_records: int = None,
+        columns: Optional[List[str]] = None,
+    ) -> IPlanet:
+        gdf: gpd.GeoDataFrame = Stac.load(
+            StacEnum.ITEM,
+            url,
+            max_records,
+            columns=PlanetFactory._columns(columns),
+        )
         planet_name: str
         if "ssys:targets" in gdf.columns:
             planet_name = (gdf["ssys:targets"].iloc[0])[0]
         else:
             planet_name = "Mars"
 
+        return PlanetFactory._create(planet_name, gdf)
+
+    @staticmethod
+    def _create(planet_name: str, gdf: gpd.GeoDataFrame) -> IPlanet:
         planet: IPlanet
         if planet_name.upper() == PlanetEnum.MARS.value:
             planet = Mars(gdf)
@@ -54,6 +170,113 @@ class PlanetFactory:
 
         return planet
 
+    @staticmethod
+    def _targets(gdf: gpd.GeoDataFrame) -> pd.Series:
+        """Body of each row, from its first ssys:targets, Mars by
+        default."""
+        if "ssys:targets" not in gdf.columns:
+            return pd.Series(PlanetEnum.MARS.value, index=gdf.index)
+        return gdf["ssys:targets"].map(
+            lambda targets: (
+                str(targets[0]).upper()
+                if isinstance(targets, (list, tuple, np.ndarray))
+                and len(targets) > 0
+                else PlanetEnum.MARS.value
+            )
+        )
+
+    @staticmethod
+    def load_many(
+        urls: Union[List[str], Dict[str, str]],
+        max_records: int = None,
+        max_workers: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[str, IPlanet]:
+        """Loads several STAC collections concurrently and groups their
+        items by body.
+
+        Args:
+            urls: URLs of the item searches, or collection names with
+                their URLs
+            max_records: maximum number of items by collection
+            max_workers: number of collections loaded at the same time,
+                all of them by default
+            columns: columns to load, all of them by default
+
+        Returns:
+            the planets by body name (MARS, EARTH), whose data have the
+            union of the columns of the collections and a source column
+            with the name, or the URL, of the collection of each row
+        """
+        sources: Dict[str, str] = (
+            dict(urls)
+            if isinstance(urls, dict)
+            else {url: url for url in urls}
+        )
+        columns = PlanetFactory._columns(columns)
+        with Tracer.get_instance().span(
+            "planet.load_many", sources=len(sources)
+        ) as span:
+            with ThreadPoolExecutor(
+                max_workers=max_workers or max(len(sources), 1)
+            ) as pool:
+                frames: List[gpd.GeoDataFrame] = list(
+                    pool.map(
+                        lambda url: Stac.load(
+                            StacEnum.ITEM, url, max_records, columns=columns
+                        ),
+                        sources.values(),
+                    )
+                )
+            for source, frame in zip(sources, frames):
+                frame["source"] = source
+            data: gpd.GeoDataFrame = pd.concat(frames).sort_index(
+                kind="stable"
+            )
+            span.set_attribute("rows", data.shape[0])
+
+        planets: Dict[str, IPlanet] = dict()
+        for planet_name, rows in data.groupby(
+            PlanetFactory._targets(data).to_numpy(), sort=False
+        ):
+            if planet_name not in [planet.value for planet in PlanetEnum]:
+                logger.warning(
+                    f"{rows.shape[0]} items of {planet_name} are ignored, "
+                    "this body is not implemented"
+                )
+                continue
+            planets[planet_name] = PlanetFactory._create(planet_name, rows)
+        return planets
+
+    @staticmethod
+    def load_out_of_core(
+        url: str,
+        path: str,
+        max_records: int = None,
+        partition_size: int = ParquetCatalog.PARTITION_SIZE,
+        max_workers: Optional[int] = None,
+    ) -> "PartitionedPlanet":
+        """Streams the STAC items of url in partitions of Parquet files in
+        the directory path, for catalogs that do not fit in memory."""
+        with Tracer.get_instance().span(
+            "planet.load_out_of_core", url=url
+        ) as span:
+            ParquetCatalog.from_stac(url, path, max_records, partition_size)
+            catalog = ParquetCatalog(path, max_workers)
+            span.set_attribute("rows", catalog.shape[0])
+        planet_name: str = "Mars"
+        if len(catalog.files) > 0 and "ssys:targets" in catalog.columns:
+            targets = pd.read_parquet(
+                catalog.files[0], columns=["ssys:targets"]
+            )["ssys:targets"].iloc[0]
+            # the lists are stored as JSON text
+            planet_name = (
+                json.loads(targets) if isinstance(targets, str) else targets
+            )[0]
+        if planet_name.upper() not in [planet.value for planet in PlanetEnum]:
+            raise NotImplementedError("Only Mars is implemented as planet")
+        return PartitionedPlanet(planet_name.upper(), catalog)
+
 
 class MarsVisu(Mizar):
     def __init__(self):
@@ -106,33 +329,47 @@ class EarthVisu(Mizar):
 class Mars(IPlanet):
 
     NAME = PlanetEnum.MARS.value
+    BODY_CRS = Wfs.CRS_WKT
 
     def __init__(self, data: gpd.GeoDataFrame):
         self.__data: gpd.GeoDataFrame = data
+        self.__lod: Optional[LevelOfDetail] = None
+        self.__geojson: Optional[FeatureCache] = None
+        self.__queries: Optional[QueryCache] = None
+        self.__times: Optional[TimeIndex] = None
 
+    @UtilsMonitoring.metric
     def _add_geojson(
         self,
         mars_visu: MarsVisu,
         data: gpd.GeoDataFrame,
         color: List[float] = [0, 190, 100, 1],
     ) -> None:
-        observations = GeoJSONLayer(
-            name="data",
-            data=json.loads(data.to_json()),
-            style={"strokeColor": color, "opacity": 1},
+        _show_geojson(
+            mars_visu,
+            "data",
+            data,
+            {"strokeColor": color, "opacity": 1},
+            center=True,
+            lod=self.lod,
+            cache=self.geojson,
         )
-        mars_visu.add_layer(observations, center=True)
 
     def describe(self) -> str:
         return self.data.describe(include="all")
 
+    @UtilsMonitoring.metric
     def query(
         self,
-        query: str,
+        query: Union[str, Mask],
         mars_visu: MarsVisu = None,
         color: List[float] = [0, 190, 100, 1],
     ) -> gpd.GeoDataFrame:
-        result: gpd.GeoDataFrame = self.data.query(query)
+        with Tracer.get_instance().span(
+            "planet.query", query=str(query)
+        ) as span:
+            result: gpd.GeoDataFrame = self.queries.query(query)
+            span.set_attribute("rows", result.shape[0])
         if mars_visu is not None:
             self._add_geojson(mars_visu, result, color)
         return result
@@ -142,7 +379,7 @@ class Mars(IPlanet):
     ) -> None:
         numerics = ["int16", "int32", "int64", "float16", "float32", "float64"]
         newdf = self.data.select_dtypes(include=numerics)
-        newdf.hist(color, alpha, bins, figsize)
+        newdf.hist(color=color, alpha=alpha, bins=bins, figsize=figsize)
 
     def visu3D(self) -> MarsVisu:
         mars: MarsVisu = MarsVisu()
@@ -158,23 +395,167 @@ class Mars(IPlanet):
             mars.add_layer_wms(base_url, layer_name)
         return mars
 
-    def has_preview(self):
-        pass
+    def download(
+        self,
+        directory: str,
+        assets: Optional[List[str]] = None,
+        index: Optional[pd.Index] = None,
+        max_workers: int = 8,
+    ) -> pd.DataFrame:
+        selection: gpd.GeoDataFrame = (
+            self.data if index is None else self.data.loc[index]
+        )
+        return Stac.download(selection, directory, assets, max_workers)
 
-    def show_image(self):
-        pass
+    def read_window(
+        self,
+        index: int,
+        asset: str,
+        window: Optional[Tuple[int, int, int, int]] = None,
+        overview: Optional[int] = None,
+        bands: Optional[List[int]] = None,
+    ) -> Tuple[np.ndarray, Tuple[float, ...]]:
+        row: pd.Series = self.data.iloc[index]
+        href: str = (
+            row["assets"][asset]["href"]
+            if "assets" in row and isinstance(row["assets"], dict)
+            else row[asset]
+        )
+        return Stac.read_window(href, window, overview, bands)
+
+    def has_preview(self) -> bool:
+        return PreviewLoader.has_preview(self.data)
+
+    def show_image(
+        self,
+        index: Union[List, int, None] = None,
+        ncols: int = 4,
+        max_images: int = 16,
+    ):
+        selection: gpd.GeoDataFrame
+        if index is None:
+            selection = self.data.iloc[0:max_images]
+        elif isinstance(index, int):
+            selection = self.data.iloc[index : index + 1]
+        else:
+            selection = self.data.iloc[index]
+        loader: PreviewLoader = PreviewLoader.get_instance()
+        images = loader.get_all(PreviewLoader.get_hrefs(selection))
+        titles: List[str] = (
+            list(selection["id"].astype(str))
+            if "id" in selection.columns
+            else [str(idx) for idx in selection.index]
+        )
+        return PreviewLoader.plot_grid(images, titles, ncols)
 
     def show_dataset_visu3D(
         self, mars_visu: MarsVisu, color: List[float] = [0, 190, 100, 1]
     ) -> None:
         self._add_geojson(mars_visu, self.data, color)
 
+    def _tiles_name(self) -> str:
+        return f"{self.NAME.lower()}_{id(self):x}"
+
+    def show_dataset_tiles(
+        self,
+        mars_visu: MarsVisu,
+        color: List[float] = [0, 190, 100, 1],
+    ) -> None:
+        """Displays data as GeoJSON tiles computed on demand by the local
+        tile server, for catalogs too large for a GeoJSON layer."""
+        tile_server: TileServer = TileServer.get_instance()
+        tile_server.register(self._tiles_name(), self.data, self.lod)
+        mars_visu.replace_layer(
+            tile_server.layer(
+                self._tiles_name(),
+                style={"strokeColor": color, "opacity": 1},
+            )
+        )
+
+    def remove_dataset_tiles(self, mars_visu: MarsVisu) -> None:
+        mars_visu.remove_layer(self._tiles_name())
+        TileServer.get_instance().unregister(self._tiles_name())
+
     def remove_dataset_visu3D(self, mars_visu: MarsVisu) -> None:
-        mars_visu.remove_layer("data")
+        # hidden rather than removed, so that showing it again only
+        # serializes the rows that changed
+        mars_visu.update_layer("data", visible=False)
 
     def columns(self) -> List[str]:
         return list(self.data.columns)
 
+    def between(
+        self, start: Union[str, pd.Timestamp], end: Union[str, pd.Timestamp]
+    ) -> gpd.GeoDataFrame:
+        return self.times.between(start, end)
+
+    def asof(self, time: Union[str, pd.Timestamp]) -> gpd.GeoDataFrame:
+        return self.times.asof(time)
+
+    def resample(self, freq: str) -> pd.Series:
+        return Temporal.resample(self.data, freq)
+
+    @property
+    def geodesy(self) -> Geodesy:
+        return Geodesy.get_instance(self.BODY_CRS)
+
+    def area(self) -> pd.Series:
+        return Footprints.area(self.data, self.BODY_CRS)
+
+    def perimeter(self) -> pd.Series:
+        return Footprints.perimeter(self.data, self.BODY_CRS)
+
+    def filter_by_area(
+        self,
+        min_area: Optional[float] = None,
+        max_area: Optional[float] = None,
+    ) -> gpd.GeoDataFrame:
+        """Returns the footprints whose area, in square meters, is between
+        min_area and max_area."""
+        area: np.ndarray = self.area().to_numpy()
+        mask = np.ones(len(area), dtype=bool)
+        if min_area is not None:
+            mask &= area >= min_area
+        if max_area is not None:
+            mask &= area <= max_area
+        return self.data[mask]
+
+    def coverage(self, max_workers: Optional[int] = None):
+        return Footprints.coverage(self.data, max_workers)
+
+    def coverage_area(self, max_workers: Optional[int] = None) -> float:
+        return Footprints.coverage_area(self.data, self.BODY_CRS, max_workers)
+
+    def overlap_counts(self) -> pd.Series:
+        return Footprints.overlap_counts(self.data)
+
+    def join(
+        self, other: gpd.GeoDataFrame, predicate: str = "intersects"
+    ) -> gpd.GeoDataFrame:
+        return SpatialJoin.join_frames(self.data, other, predicate)
+
+    def join_wfs(
+        self,
+        wfs: Wfs,
+        layer_name: str,
+        predicate: str = "intersects",
+        pushdown: bool = True,
+    ) -> gpd.GeoDataFrame:
+        return SpatialJoin.frame_wfs(
+            self.data, wfs, layer_name, predicate, pushdown
+        )
+
+    def stereo_pairs(
+        self,
+        min_overlap: float = 0.5,
+        angle_column: Optional[str] = None,
+        min_angle_difference: float = 0,
+    ) -> pd.DataFrame:
+        return Footprints.stereo_pairs(
+            self.data, min_overlap, angle_column, min_angle_difference
+        )
+
+    @UtilsMonitoring.metric
     def highlight(
         self, mars_visu: MarsVisu, index: Union[List, int], color=[1, 0, 0, 1]
     ):
@@ -183,13 +564,14 @@ class Mars(IPlanet):
             selection = self.data.iloc[index : index + 1]
         else:
             selection = self.data.iloc[index]
-        mars_visu.highlight(json.loads(selection.to_json()), color)
+        mars_visu.highlight(self.geojson.geojson(selection), color)
 
+    @UtilsMonitoring.metric
     def highlight_by_index(
         self, mars_visu: MarsVisu, index: pd.Index, color=[1, 0, 0, 1]
     ):
         selection: gpd.GeoDataFrame = self.data.loc[index]
-        mars_visu.highlight(json.loads(selection.to_json()), color)
+        mars_visu.highlight(self.geojson.geojson(selection), color)
 
     def remove_highlight(self, mars_visu: MarsVisu):
         mars_visu.highlight(None)
@@ -198,37 +580,84 @@ class Mars(IPlanet):
     def data(self) -> gpd.GeoDataFrame:
         return self.__data
 
+    @property
+    def lod(self) -> LevelOfDetail:
+        """Simplified footprints of data, computed once by level."""
+        if self.__lod is None:
+            self.__lod = LevelOfDetail(self.data.geometry)
+        return self.__lod
+
+    @property
+    def geojson(self) -> FeatureCache:
+        """GeoJSON features of data, serialized once by row."""
+        if self.__geojson is None:
+            self.__geojson = FeatureCache(self.data)
+        return self.__geojson
+
+    @property
+    def queries(self) -> QueryCache:
+        """Masks and results of the queries of data, computed once."""
+        if self.__queries is None:
+            self.__queries = QueryCache(self.data)
+        return self.__queries
+
+    @property
+    def times(self) -> TimeIndex:
+        """Data sorted by datetime, computed once for the time queries."""
+        if self.__times is None:
+            self.__times = TimeIndex(self.data)
+        return self.__times
+
+    def mask(self, query: str) -> Mask:
+        """Mask of the rows selected by query, to combine with &, | and ~
+        and to pass to query."""
+        return self.queries.mask(query)
+
 
 class Earth(IPlanet):
 
     NAME = PlanetEnum.EARTH.value
+    BODY_CRS = CRS.from_epsg(4326)
 
     def __init__(self, data: gpd.GeoDataFrame):
         self.__data: gpd.GeoDataFrame = data
+        self.__lod: Optional[LevelOfDetail] = None
+        self.__geojson: Optional[FeatureCache] = None
+        self.__queries: Optional[QueryCache] = None
+        self.__times: Optional[TimeIndex] = None
 
+    @UtilsMonitoring.metric
     def _add_geojson(
         self,
         earth_visu: EarthVisu,
         data: gpd.GeoDataFrame,
         color: List[float] = [0, 190, 100, 1],
     ) -> None:
-        observations = GeoJSONLayer(
-            name="data",
-            data=json.loads(data.to_json()),
-            style={"strokeColor": color, "opacity": 1},
+        _show_geojson(
+            earth_visu,
+            "data",
+            data,
+            {"strokeColor": color, "opacity": 1},
+            center=True,
+            lod=self.lod,
+            cache=self.geojson,
         )
-        earth_visu.add_layer(observations, center=True)
 
     def describe(self) -> str:
         return self.data.describe(include="all")
 
+    @UtilsMonitoring.metric
     def query(
         self,
-        query: str,
+        query: Union[str, Mask],
         earth_visu: EarthVisu = None,
         color: List[float] = [0, 190, 100, 1],
     ) -> gpd.GeoDataFrame:
-        result: gpd.GeoDataFrame = self.data.query(query)
+        with Tracer.get_instance().span(
+            "planet.query", query=str(query)
+        ) as span:
+            result: gpd.GeoDataFrame = self.queries.query(query)
+            span.set_attribute("rows", result.shape[0])
         if earth_visu is not None:
             self._add_geojson(earth_visu, result, color)
         return result
@@ -238,7 +667,7 @@ class Earth(IPlanet):
     ) -> None:
         numerics = ["int16", "int32", "int64", "float16", "float32", "float64"]
         newdf = self.data.select_dtypes(include=numerics)
-        newdf.hist(color, alpha, bins, figsize)
+        newdf.hist(color=color, alpha=alpha, bins=bins, figsize=figsize)
 
     def visu3D(self) -> EarthVisu:
         earth: EarthVisu = EarthVisu()
@@ -254,23 +683,167 @@ class Earth(IPlanet):
             earth.add_layer_wms(base_url, layer_name)
         return earth
 
-    def has_preview(self):
-        pass
+    def download(
+        self,
+        directory: str,
+        assets: Optional[List[str]] = None,
+        index: Optional[pd.Index] = None,
+        max_workers: int = 8,
+    ) -> pd.DataFrame:
+        selection: gpd.GeoDataFrame = (
+            self.data if index is None else self.data.loc[index]
+        )
+        return Stac.download(selection, directory, assets, max_workers)
+
+    def read_window(
+        self,
+        index: int,
+        asset: str,
+        window: Optional[Tuple[int, int, int, int]] = None,
+        overview: Optional[int] = None,
+        bands: Optional[List[int]] = None,
+    ) -> Tuple[np.ndarray, Tuple[float, ...]]:
+        row: pd.Series = self.data.iloc[index]
+        href: str = (
+            row["assets"][asset]["href"]
+            if "assets" in row and isinstance(row["assets"], dict)
+            else row[asset]
+        )
+        return Stac.read_window(href, window, overview, bands)
 
-    def show_image(self):
-        pass
+    def has_preview(self) -> bool:
+        return PreviewLoader.has_preview(self.data)
+
+    def show_image(
+        self,
+        index: Union[List, int, None] = None,
+        ncols: int = 4,
+        max_images: int = 16,
+    ):
+        selection: gpd.GeoDataFrame
+        if index is None:
+            selection = self.data.iloc[0:max_images]
+        elif isinstance(index, int):
+            selection = self.data.iloc[index : index + 1]
+        else:
+            selection = self.data.iloc[index]
+        loader: PreviewLoader = PreviewLoader.get_instance()
+        images = loader.get_all(PreviewLoader.get_hrefs(selection))
+        titles: List[str] = (
+            list(selection["id"].astype(str))
+            if "id" in selection.columns
+            else [str(idx) for idx in selection.index]
+        )
+        return PreviewLoader.plot_grid(images, titles, ncols)
 
     def show_dataset_visu3D(
         self, earth_visu: EarthVisu, color: List[float] = [0, 190, 100, 1]
     ) -> None:
         self._add_geojson(earth_visu, self.data, color)
 
+    def _tiles_name(self) -> str:
+        return f"{self.NAME.lower()}_{id(self):x}"
+
+    def show_dataset_tiles(
+        self,
+        earth_visu: EarthVisu,
+        color: List[float] = [0, 190, 100, 1],
+    ) -> None:
+        """Displays data as GeoJSON tiles computed on demand by the local
+        tile server, for catalogs too large for a GeoJSON layer."""
+        tile_server: TileServer = TileServer.get_instance()
+        tile_server.register(self._tiles_name(), self.data, self.lod)
+        earth_visu.replace_layer(
+            tile_server.layer(
+                self._tiles_name(),
+                style={"strokeColor": color, "opacity": 1},
+            )
+        )
+
+    def remove_dataset_tiles(self, earth_visu: EarthVisu) -> None:
+        earth_visu.remove_layer(self._tiles_name())
+        TileServer.get_instance().unregister(self._tiles_name())
+
     def remove_dataset_visu3D(self, earth_visu: EarthVisu) -> None:
-        earth_visu.remove_layer("data")
+        # hidden rather than removed, so that showing it again only
+        # serializes the rows that changed
+        earth_visu.update_layer("data", visible=False)
 
     def columns(self) -> List[str]:
         return list(self.data.columns)
 
+    def between(
+        self, start: Union[str, pd.Timestamp], end: Union[str, pd.Timestamp]
+    ) -> gpd.GeoDataFrame:
+        return self.times.between(start, end)
+
+    def asof(self, time: Union[str, pd.Timestamp]) -> gpd.GeoDataFrame:
+        return self.times.asof(time)
+
+    def resample(self, freq: str) -> pd.Series:
+        return Temporal.resample(self.data, freq)
+
+    @property
+    def geodesy(self) -> Geodesy:
+        return Geodesy.get_instance(self.BODY_CRS)
+
+    def area(self) -> pd.Series:
+        return Footprints.area(self.data, self.BODY_CRS)
+
+    def perimeter(self) -> pd.Series:
+        return Footprints.perimeter(self.data, self.BODY_CRS)
+
+    def filter_by_area(
+        self,
+        min_area: Optional[float] = None,
+        max_area: Optional[float] = None,
+    ) -> gpd.GeoDataFrame:
+        """Returns the footprints whose area, in square meters, is between
+        min_area and max_area."""
+        area: np.ndarray = self.area().to_numpy()
+        mask = np.ones(len(area), dtype=bool)
+        if min_area is not None:
+            mask &= area >= min_area
+        if max_area is not None:
+            mask &= area <= max_area
+        return self.data[mask]
+
+    def coverage(self, max_workers: Optional[int] = None):
+        return Footprints.coverage(self.data, max_workers)
+
+    def coverage_area(self, max_workers: Optional[int] = None) -> float:
+        return Footprints.coverage_area(self.data, self.BODY_CRS, max_workers)
+
+    def overlap_counts(self) -> pd.Series:
+        return Footprints.overlap_counts(self.data)
+
+    def join(
+        self, other: gpd.GeoDataFrame, predicate: str = "intersects"
+    ) -> gpd.GeoDataFrame:
+        return SpatialJoin.join_frames(self.data, other, predicate)
+
+    def join_wfs(
+        self,
+        wfs: Wfs,
+        layer_name: str,
+        predicate: str = "intersects",
+        pushdown: bool = True,
+    ) -> gpd.GeoDataFrame:
+        return SpatialJoin.frame_wfs(
+            self.data, wfs, layer_name, predicate, pushdown
+        )
+
+    def stereo_pairs(
+        self,
+        min_overlap: float = 0.5,
+        angle_column: Optional[str] = None,
+        min_angle_difference: float = 0,
+    ) -> pd.DataFrame:
+        return Footprints.stereo_pairs(
+            self.data, min_overlap, angle_column, min_angle_difference
+        )
+
+    @UtilsMonitoring.metric
     def highlight(
         self,
         earth_visu: EarthVisu,
@@ -282,13 +855,14 @@ class Earth(IPlanet):
             selection = self.data.iloc[index : index + 1]
         else:
             selection = self.data.iloc[index]
-        earth_visu.highlight(json.loads(selection.to_json()), color)
+        earth_visu.highlight(self.geojson.geojson(selection), color)
 
+    @UtilsMonitoring.metric
     def highlight_by_index(
         self, earth_visu: EarthVisu, index: pd.Index, color=[1, 0, 0, 1]
     ):
         selection: gpd.GeoDataFrame = self.data.loc[index]
-        earth_visu.highlight(json.loads(selection.to_json()), color)
+        earth_visu.highlight(self.geojson.geojson(selection), color)
 
     def remove_highlight(self, earth_visu: EarthVisu):
         earth_visu.highlight(None)
@@ -296,3 +870,112 @@ class Earth(IPlanet):
     @property
     def data(self) -> gpd.GeoDataFrame:
         return self.__data
+
+    @property
+    def lod(self) -> LevelOfDetail:
+        """Simplified footprints of data, computed once by level."""
+        if self.__lod is None:
+            self.__lod = LevelOfDetail(self.data.geometry)
+        return self.__lod
+
+    @property
+    def geojson(self) -> FeatureCache:
+        """GeoJSON features of data, serialized once by row."""
+        if self.__geojson is None:
+            self.__geojson = FeatureCache(self.data)
+        return self.__geojson
+
+    @property
+    def queries(self) -> QueryCache:
+        """Masks and results of the queries of data, computed once."""
+        if self.__queries is None:
+            self.__queries = QueryCache(self.data)
+        return self.__queries
+
+    @property
+    def times(self) -> TimeIndex:
+        """Data sorted by datetime, computed once for the time queries."""
+        if self.__times is None:
+            self.__times = TimeIndex(self.data)
+        return self.__times
+
+    def mask(self, query: str) -> Mask:
+        """Mask of the rows selected by query, to combine with &, | and ~
+        and to pass to query."""
+        return self.queries.mask(query)
+
+
+class PartitionedPlanet(IPlanet):
+    """Planet whose footprints are stored out of core in partitions of
+    Parquet files, see ParquetCatalog.
+
+    The queries, statistics and spatial filters stream the partitions
+    through a pool of processes; only their results are held in memory.
+    """
+
+    def __init__(self, name: str, data: ParquetCatalog):
+        self.__name: str = name
+        self.__data: ParquetCatalog = data
+
+    @property
+    def NAME(self) -> str:
+        return self.__name
+
+    @property
+    def data(self) -> ParquetCatalog:
+        return self.__data
+
+    def describe(self) -> pd.DataFrame:
+        return self.data.describe()
+
+    def columns(self) -> List[str]:
+        return self.data.columns
+
+    def query(
+        self,
+        query: str,
+        visu: Mizar = None,
+        color: List[float] = [0, 190, 100, 1],
+    ) -> gpd.GeoDataFrame:
+        with Tracer.get_instance().span("planet.query", query=query) as span:
+            result: gpd.GeoDataFrame = self.data.query(query)
+            span.set_attribute("rows", result.shape[0])
+        if visu is not None:
+            _show_geojson(
+                visu,
+                "data",
+                result,
+                {"strokeColor": color, "opacity": 1},
+                center=True,
+            )
+        return result
+
+    def filter_bbox(
+        self, bbox: Tuple[float, float, float, float]
+    ) -> gpd.GeoDataFrame:
+        return self.data.filter_bbox(bbox)
+
+    def intersects(
+        self, geometry: BaseGeometry, predicate: str = "intersects"
+    ) -> gpd.GeoDataFrame:
+        return self.data.intersects(geometry, predicate)
+
+    def histogram(
+        self, color="k", alpha=0.5, bins=50, figsize=(10, 10)
+    ) -> None:
+        # one pass over the partitions for all the columns
+        histograms: Dict[
+            str, Tuple[np.ndarray, np.ndarray]
+        ] = self.data.histograms(bins=bins)
+        if len(histograms) == 0:
+            return
+        ncols: int = int(np.ceil(np.sqrt(len(histograms))))
+        nrows: int = int(np.ceil(len(histograms) / ncols))
+        _, axes = plt.subplots(nrows, ncols, figsize=figsize, squeeze=False)
+        for ax, (column, (counts, edges)) in zip(
+            axes.flat, histograms.items()
+        ):
+            ax.stairs(counts, edges, fill=True, color=color, alpha=alpha)
+            ax.set_title(column)
+        for ax in axes.flat[len(histograms) :]:
+            ax.set_visible(False)
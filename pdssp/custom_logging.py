@@ -17,13 +17,26 @@
 # You should have received a copy of the GNU Lesser General Public License v3
 # along with Data Access Layer for PDSP.  If not, see <https://www.gnu.org/licenses/>.
 """Module for customizing ths logs."""
+import atexit
+import configparser
+import json
 import logging
+import queue
+from datetime import datetime
+from datetime import timezone
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from typing import Any
+from typing import Dict
+from typing import List
 from typing import Optional
 
 
 class UtilsLogs:  # pylint: disable=R0903
     """Utility class for logs."""
 
+    __listeners: Dict[str, QueueListener] = dict()
+
     @staticmethod
     def add_logging_level(
         level_name: str, level_num: int, method_name: Optional[str] = None
@@ -68,6 +81,104 @@ class UtilsLogs:  # pylint: disable=R0903
         setattr(logging.getLoggerClass(), method_name, log_for_level)
         setattr(logging, method_name, log_to_root)
 
+    @staticmethod
+    def configure(
+        mode: str = "sync", output: str = "text", logger_name: str = "pdssp"
+    ) -> None:
+        """Configure the handlers of a logger.
+
+        Parameters
+        ----------
+        mode: str
+            sync writes the records on the calling thread, async puts them
+            in a queue that a background thread formats and writes to the
+            handlers of the logger
+        output: str
+            text keeps the formatters of the handlers, json replaces them
+            by JsonFormatter
+        logger_name: str
+            name of the logger
+
+        Raises
+        ------
+        ValueError
+            If the mode or the output is unknown
+        """
+        if mode not in ["sync", "async"]:
+            raise ValueError(f"Unknown logging mode : {mode}")
+        if output not in ["text", "json"]:
+            raise ValueError(f"Unknown logging output : {output}")
+        UtilsLogs.stop_queue(logger_name)
+        logger = logging.getLogger(logger_name)
+        handlers: List[logging.Handler] = list(logger.handlers)
+        if output == "json":
+            for handler in handlers:
+                handler.setFormatter(JsonFormatter())
+        if mode == "async" and len(handlers) > 0:
+            records: queue.SimpleQueue = queue.SimpleQueue()
+            listener = QueueListener(
+                records, *handlers, respect_handler_level=True
+            )
+            for handler in handlers:
+                logger.removeHandler(handler)
+            logger.addHandler(_DeferredQueueHandler(records))
+            listener.start()
+            UtilsLogs.__listeners[logger_name] = listener
+
+    @staticmethod
+    def configure_from_file(
+        path_to_conf: str, logger_name: str = "pdssp"
+    ) -> None:
+        """Configure a logger from the [logging] section of a configuration
+        file (mode and output options)."""
+        config = configparser.ConfigParser()
+        config.read(path_to_conf)
+        if not config.has_section("logging"):
+            return
+        section = config["logging"]
+        UtilsLogs.configure(
+            mode=section.get("mode", "sync"),
+            output=section.get("output", "text"),
+            logger_name=logger_name,
+        )
+
+    @staticmethod
+    def stop_queue(logger_name: str = "pdssp") -> None:
+        """Writes the queued records and gives the handlers back to the
+        logger."""
+        listener: Optional[QueueListener] = UtilsLogs.__listeners.pop(
+            logger_name, None
+        )
+        if listener is None:
+            return
+        logger = logging.getLogger(logger_name)
+        for handler in list(logger.handlers):
+            if isinstance(handler, _DeferredQueueHandler):
+                logger.removeHandler(handler)
+        listener.stop()
+        for handler in listener.handlers:
+            logger.addHandler(handler)
+
+    @staticmethod
+    def stop_queues() -> None:
+        """Stops the background threads of all the loggers."""
+        for logger_name in list(UtilsLogs.__listeners):
+            UtilsLogs.stop_queue(logger_name)
+
+
+atexit.register(UtilsLogs.stop_queues)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue handler leaving the formatting to the listener thread.
+
+    The records are queued as they are, so the arguments of a log call must
+    not be modified once it has been logged.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
 
 class LogRecord(logging.LogRecord):  # pylint: disable=R0903
     """Specific class to handle output in logs."""
@@ -75,22 +186,40 @@ class LogRecord(logging.LogRecord):  # pylint: disable=R0903
     def getMessage(self) -> str:
         """Returns the message.
 
-        Format the message according to the type of the message.
+        Format the message according to the type of the message. Messages
+        using the str.format style are formatted with it, the others with
+        the % operator of the standard library.
 
         Returns:
             str: Returns the message
         """
-        msg = self.msg
+        msg = str(self.msg)
         if self.args:
-            if isinstance(self.args, dict):
-                msg = msg.format(**self.args)
-            else:
-                msg = msg.format(*self.args)
+            try:
+                if isinstance(self.args, dict):
+                    formatted = msg.format(**self.args)
+                else:
+                    formatted = msg.format(*self.args)
+            except (IndexError, KeyError, ValueError):
+                formatted = msg
+            if formatted == msg and "%" in msg:
+                # %-style message, from the other libraries
+                try:
+                    formatted = msg % self.args
+                except (TypeError, ValueError, KeyError):
+                    formatted = msg
+            msg = formatted
         return msg
 
 
 class CustomColorFormatter(logging.Formatter):
-    """Color formatter."""
+    """Color formatter.
+
+    The level name and the message are colored according to the level. The
+    colored formatters are built once, when the formatter is created, and
+    the log records are not modified so that the other handlers of the
+    logger receive them unchanged.
+    """
 
     UtilsLogs.add_logging_level("TRACE", 15)
     # Reset
@@ -105,6 +234,27 @@ class CustomColorFormatter(logging.Formatter):
         logging.CRITICAL: "\033[1;41m",  # red reverted
     }
 
+    # placeholder of a record attribute in each formatting style
+    placeholders = {"%": "%({})s", "{": "{{{}}}", "$": "${{{}}}"}
+
+    def __init__(self, fmt=None, datefmt=None, style="%", **kwargs):
+        super().__init__(fmt, datefmt, style, **kwargs)
+        fmt = self._style._fmt  # pylint: disable=W0212
+        self.__formatters: Dict[int, logging.Formatter] = dict()
+        for level, color in CustomColorFormatter.log_colors.items():
+            colored_fmt: str = fmt
+            for attribute in ["levelname", "message"]:
+                placeholder = CustomColorFormatter.placeholders[style].format(
+                    attribute
+                )
+                colored_fmt = colored_fmt.replace(
+                    placeholder,
+                    f"{color}{placeholder}{CustomColorFormatter.color_Off}",
+                )
+            self.__formatters[level] = logging.Formatter(
+                colored_fmt, datefmt, style
+            )
+
     def format(self, record) -> str:
         """Format the log.
 
@@ -114,39 +264,12 @@ class CustomColorFormatter(logging.Formatter):
         Returns:
             str: the formatted log record
         """
-        record.levelname = "{}{}{}".format(
-            CustomColorFormatter.log_colors[record.levelno],
-            record.levelname,
-            CustomColorFormatter.color_Off,
-        )
-        record.msg = "{}{}{}".format(
-            CustomColorFormatter.log_colors[record.levelno],
-            record.msg,
-            CustomColorFormatter.color_Off,
+        formatter: Optional[logging.Formatter] = self.__formatters.get(
+            record.levelno
         )
-
-        # Select the formatter according to the log if several handlers are
-        # attached to the logger
-        my_formatter = logging.Formatter
-        my_handler = None
-        handlers = logging.getLogger(__name__).handlers
-        for handler in handlers:
-            handler_level = handler.level
-            if (
-                handler_level
-                == logging.getLogger(__name__).getEffectiveLevel()
-            ):
-                if handler.formatter:
-                    my_formatter._fmt = (  # pylint: disable=W0212
-                        handler.formatter._fmt  # pylint: disable=W0212
-                    )
-                my_handler = handler
-                break
-        if my_handler is not None:
-            for handler in handlers:
-                if handler != my_handler:
-                    logging.getLogger(__name__).removeHandler(handler)
-        return my_formatter.format(self, record)  # type: ignore
+        if formatter is None:
+            return super().format(record)
+        return formatter.format(record)
 
 
 class ShellColorFormatter(CustomColorFormatter):
@@ -161,9 +284,38 @@ class ShellColorFormatter(CustomColorFormatter):
         Returns:
             str: the formatted log record
         """
-        record.msg = "{}{}{}".format(
+        return "{}{}{}".format(
             CustomColorFormatter.log_colors[logging.INFO],
-            record.msg,
+            record.getMessage(),
             CustomColorFormatter.color_Off,
         )
-        return record.msg
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats the records as JSON objects, one by line."""
+
+    def format(self, record) -> str:
+        """Format the log.
+
+        Args:
+            record: the log record
+
+        Returns:
+            str: the formatted log record
+        """
+        content: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(
+                record.created, tz=timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            content["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            content["exception"] = record.exc_text
+        return json.dumps(content, default=str)
@@ -1,7 +1,26 @@
 # -*- coding: utf-8 -*-
+from .download import AssetDownloader
+from .join import SpatialJoin
 from .ogc import Wfs
 from .ogc import Wms
+from .parquet import ParquetCatalog
+from .preview import PreviewLoader
+from .raster import RasterReader
+from .schema import StacSchema
 from .stac import Stac
 from .stac import StacEnum
+from .transport import Transport
 
-__all__ = ["Wfs", "Wms", "Stac", "StacEnum"]
+__all__ = [
+    "AssetDownloader",
+    "Wfs",
+    "Wms",
+    "ParquetCatalog",
+    "PreviewLoader",
+    "RasterReader",
+    "SpatialJoin",
+    "Stac",
+    "StacSchema",
+    "StacEnum",
+    "Transport",
+]
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import pandas as pd
+
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+class AssetDownloader:
+    """Downloads STAC assets concurrently in a content-addressed store.
+
+    Files are stored under ``objects/<sha256[:2]>/<sha256>`` so that
+    identical contents are stored once, whatever their href. Interrupted
+    downloads are kept in ``partial/`` and resumed with a HTTP range
+    request. The number of parallel downloads is bounded by max_workers,
+    the connections being taken from the pools of the shared transport.
+    """
+
+    INDEX = "index.json"
+
+    # multihash codes of the STAC file extension (file:checksum)
+    MULTIHASH_CODES = {
+        0xD5: "md5",
+        0x11: "sha1",
+        0x12: "sha256",
+        0x13: "sha512",
+    }
+
+    def __init__(
+        self,
+        directory: str,
+        max_workers: int = 8,
+        chunk_size: int = 1024 * 1024,
+        transport: Optional[Transport] = None,
+    ):
+        self.__directory: str = directory
+        self.__max_workers: int = max_workers
+        self.__chunk_size: int = chunk_size
+        self.__transport: Transport = (
+            transport if transport is not None else Transport.get_instance()
+        )
+        self.__lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "partial"), exist_ok=True)
+        self.__index: Dict[str, str] = self._load_index()
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    @property
+    def max_workers(self) -> int:
+        return self.__max_workers
+
+    @property
+    def transport(self) -> Transport:
+        return self.__transport
+
+    def _load_index(self) -> Dict[str, str]:
+        path = os.path.join(self.directory, AssetDownloader.INDEX)
+        if not os.path.exists(path):
+            return dict()
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+
+    def _save_index(self) -> None:
+        path = os.path.join(self.directory, AssetDownloader.INDEX)
+        tmp_path = path + ".tmp"
+        with self.__lock:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(self.__index, file)
+            os.replace(tmp_path, path)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", digest[0:2], digest)
+
+    def _partial_path(self, href: str) -> str:
+        name = hashlib.sha256(href.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "partial", name)
+
+    @staticmethod
+    def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+        """Returns the unsigned varint at offset and the offset after it."""
+        value: int = 0
+        shift: int = 0
+        while offset < len(data):
+            byte: int = data[offset]
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80 == 0:
+                return value, offset
+            shift += 7
+        raise ValueError("Truncated varint in multihash")
+
+    @staticmethod
+    def _parse_checksum(checksum: str) -> Tuple[str, str]:
+        """Returns the hash algorithm and the hex digest of a multihash."""
+        data: bytes = bytes.fromhex(checksum)
+        code, offset = AssetDownloader._read_varint(data, 0)
+        if code not in AssetDownloader.MULTIHASH_CODES:
+            raise ValueError(f"Unsupported multihash code {code:#x}")
+        length, offset = AssetDownloader._read_varint(data, offset)
+        digest: bytes = data[offset:]
+        if len(digest) != length:
+            raise ValueError(
+                f"The digest of {checksum} has {len(digest)} bytes instead "
+                f"of {length}"
+            )
+        return AssetDownloader.MULTIHASH_CODES[code], digest.hex()
+
+    @staticmethod
+    def _hash_file(path: str, algorithms: List[str]) -> Dict[str, str]:
+        hashes = {name: hashlib.new(name) for name in algorithms}
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                for hash_algo in hashes.values():
+                    hash_algo.update(chunk)
+        return {name: hashes[name].hexdigest() for name in hashes}
+
+    def _fetch_local(self, href: str, partial_path: str) -> None:
+        path = url2pathname(urlparse(href).path) if "://" in href else href
+        shutil.copyfile(path, partial_path)
+
+    def _fetch_http(self, href: str, partial_path: str) -> None:
+        headers: Dict[str, str] = dict()
+        offset: int = 0
+        if os.path.exists(partial_path):
+            offset = os.path.getsize(partial_path)
+            headers["Range"] = f"bytes={offset}-"
+        with self.transport.get(
+            href, headers=headers, stream=True
+        ) as response:
+            if response.status_code == 416:
+                # the partial file is already complete
+                return
+            response.raise_for_status()
+            mode = "ab" if response.status_code == 206 else "wb"
+            if mode == "ab":
+                logger.debug(f"Resuming {href} from byte {offset}")
+            with open(partial_path, mode) as file:
+                for chunk in response.iter_content(self.__chunk_size):
+                    file.write(chunk)
+
+    def _store(self, href: str, partial_path: str, checksum: Optional[str]):
+        algorithms: List[str] = ["sha256"]
+        expected: Optional[Tuple[str, str]] = None
+        if checksum:
+            expected = AssetDownloader._parse_checksum(checksum)
+            algorithms.append(expected[0])
+        hashes = AssetDownloader._hash_file(partial_path, algorithms)
+        if expected is not None and hashes[expected[0]] != expected[1]:
+            os.remove(partial_path)
+            raise ValueError(f"Checksum mismatch for {href}")
+
+        digest: str = hashes["sha256"]
+        object_path: str = self._object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        if os.path.exists(object_path):
+            logger.debug(f"{href} is a duplicate of {digest}")
+            os.remove(partial_path)
+        else:
+            os.replace(partial_path, object_path)
+        with self.__lock:
+            self.__index[href] = digest
+        return object_path
+
+    def get(self, href: str) -> Optional[str]:
+        """Returns the local path of an already downloaded href."""
+        digest: Optional[str] = self.__index.get(href)
+        if digest is None:
+            return None
+        object_path: str = self._object_path(digest)
+        return object_path if os.path.exists(object_path) else None
+
+    def download(self, href: str, checksum: Optional[str] = None) -> str:
+        """Downloads a file and returns its path in the local store.
+
+        Args:
+            href (str): URL of the file
+            checksum (Optional[str], optional): expected multihash of the
+                file (file:checksum). Defaults to None.
+
+        Raises:
+            ValueError: the checksum of the downloaded file does not match
+
+        Returns:
+            str: the path of the file in the store
+        """
+        object_path: str = self._download(href, checksum)
+        self._save_index()
+        return object_path
+
+    def _download(self, href: str, checksum: Optional[str] = None) -> str:
+        """Downloads a file without saving the index."""
+        object_path: Optional[str] = self.get(href)
+        if object_path is not None:
+            return object_path
+
+        partial_path: str = self._partial_path(href)
+        if urlparse(href).scheme in ["http", "https"]:
+            self._fetch_http(href, partial_path)
+        else:
+            self._fetch_local(href, partial_path)
+        return self._store(href, partial_path, checksum)
+
+    def download_all(
+        self, files: Dict[str, Optional[str]]
+    ) -> Dict[str, Optional[str]]:
+        """Downloads concurrently a set of files.
+
+        Args:
+            files (Dict[str, Optional[str]]): checksum by href
+
+        Returns:
+            Dict[str, Optional[str]]: local path by href, None when the
+            download failed; the index is saved once at the end
+        """
+        paths: Dict[str, Optional[str]] = dict()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._download, href, checksum): href
+                for href, checksum in files.items()
+            }
+            for future in as_completed(futures):
+                href = futures[future]
+                try:
+                    paths[href] = future.result()
+                except Exception as err:  # pylint: disable=broad-except
+                    logger.error(f"Cannot download {href} : {err}")
+                    paths[href] = None
+        self._save_index()
+        return paths
+
+    @staticmethod
+    def _get_asset(row: pd.Series, key: str) -> Optional[Dict]:
+        assets = row["assets"] if "assets" in row else None
+        if isinstance(assets, dict) and key in assets:
+            return assets[key]
+        if key in row and isinstance(row[key], str):
+            return {"href": row[key]}
+        return None
+
+    def download_assets(
+        self, data: pd.DataFrame, assets: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Downloads the assets of STAC items.
+
+        Args:
+            data (pd.DataFrame): STAC items as loaded by Stac.load
+            assets (Optional[List[str]], optional): keys of the assets to
+                download. Defaults to None (all assets).
+
+        Returns:
+            pd.DataFrame: local path of each asset, one column by asset key
+            with the same index as data
+        """
+        if assets is None:
+            assets = sorted(
+                {
+                    key
+                    for item_assets in data.get("assets", [])
+                    if isinstance(item_assets, dict)
+                    for key in item_assets.keys()
+                }
+            )
+        requested: List[List[Optional[Dict]]] = [
+            [AssetDownloader._get_asset(row, key) for key in assets]
+            for _, row in data.iterrows()
+        ]
+        files: Dict[str, Optional[str]] = {
+            asset["href"]: asset.get("file:checksum")
+            for row_assets in requested
+            for asset in row_assets
+            if asset is not None
+        }
+        logger.info(f"Downloading {len(files)} files in {self.directory}")
+        paths = self.download_all(files)
+        return pd.DataFrame(
+            [
+                [
+                    paths.get(asset["href"]) if asset is not None else None
+                    for asset in row_assets
+                ]
+                for row_assets in requested
+            ],
+            index=data.index,
+            columns=assets,
+        )
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+import logging
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from ..tracing import Tracer
+from .ogc import Wfs
+from .stac import Stac
+from .stac import StacEnum
+
+logger = logging.getLogger(__name__)
+
+
+class SpatialJoin:
+    """Spatial join of two sets of footprints.
+
+    The smaller side is indexed once in a shapely STRtree. The larger side
+    is streamed page by page, and split in chunks, to probe the index, so
+    that only the matching pairs are kept in memory.
+    """
+
+    # predicate(indexed, probe) expressed as predicate(probe, indexed)
+    INVERSE_PREDICATES: Dict[str, str] = {
+        "intersects": "intersects",
+        "overlaps": "overlaps",
+        "touches": "touches",
+        "crosses": "crosses",
+        "within": "contains",
+        "contains": "within",
+        "covers": "covered_by",
+        "covered_by": "covers",
+    }
+
+    def __init__(
+        self,
+        indexed: gpd.GeoDataFrame,
+        predicate: str = "intersects",
+        chunk_size: int = 50000,
+    ):
+        if predicate not in SpatialJoin.INVERSE_PREDICATES:
+            raise ValueError(f"Unsupported predicate : {predicate}")
+        self.__indexed: gpd.GeoDataFrame = indexed
+        self.__predicate: str = predicate
+        self.__chunk_size: int = chunk_size
+        self.__tree = shapely.STRtree(
+            np.asarray(indexed.geometry.values, dtype=object)
+        )
+
+    @property
+    def indexed(self) -> gpd.GeoDataFrame:
+        return self.__indexed
+
+    @property
+    def predicate(self) -> str:
+        return self.__predicate
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """Bounds of the indexed side, to push down to the remote query of
+        the other side."""
+        return tuple(self.indexed.total_bounds)  # type: ignore
+
+    def _query(
+        self, probe: gpd.GeoDataFrame, indexed_on_left: bool
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the positions in probe and in the indexed side of the
+        matching pairs."""
+        predicate: str = (
+            SpatialJoin.INVERSE_PREDICATES[self.predicate]
+            if indexed_on_left
+            else self.predicate
+        )
+        geometries = np.asarray(probe.geometry.values, dtype=object)
+        probe_positions: List[np.ndarray] = list()
+        indexed_positions: List[np.ndarray] = list()
+        for start in range(0, len(geometries), self.__chunk_size):
+            chunk_positions, tree_positions = self.__tree.query(
+                geometries[start : start + self.__chunk_size],
+                predicate=predicate,
+            )
+            probe_positions.append(chunk_positions + start)
+            indexed_positions.append(tree_positions)
+        if len(probe_positions) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        return np.concatenate(probe_positions), np.concatenate(
+            indexed_positions
+        )
+
+    @staticmethod
+    def merge(
+        left: gpd.GeoDataFrame,
+        left_positions: np.ndarray,
+        right: gpd.GeoDataFrame,
+        right_positions: np.ndarray,
+    ) -> gpd.GeoDataFrame:
+        """Builds the rows of the matching pairs as geopandas.sjoin: the
+        columns of left, index_right and the columns of right, without its
+        geometry, the common names being suffixed by _left and _right."""
+        order = np.lexsort((right_positions, left_positions))
+        left_positions = left_positions[order]
+        right_positions = right_positions[order]
+        left_part = left.iloc[left_positions]
+        right_part = right.drop(columns=right.geometry.name).iloc[
+            right_positions
+        ]
+        conflicts = set(left_part.columns) & set(right_part.columns)
+        left_part = left_part.rename(
+            columns={name: f"{name}_left" for name in conflicts}
+        )
+        right_part = right_part.rename(
+            columns={name: f"{name}_right" for name in conflicts}
+        )
+        right_values = right_part.reset_index(drop=True)
+        right_values.insert(0, "index_right", right.index[right_positions])
+        result = pd.concat(
+            [left_part.reset_index(drop=True), right_values], axis=1
+        )
+        result.index = left_part.index
+        return gpd.GeoDataFrame(
+            result, geometry=left_part.geometry.name, crs=left.crs
+        )
+
+    def probe(
+        self, data: gpd.GeoDataFrame, indexed_on_left: bool = False
+    ) -> gpd.GeoDataFrame:
+        """Joins a page of the other side with the indexed side.
+
+        Args:
+            data (gpd.GeoDataFrame): footprints of the other side
+            indexed_on_left (bool, optional): True when the indexed side
+                is the left side of the join. Defaults to False.
+
+        Returns:
+            gpd.GeoDataFrame: the matching pairs
+        """
+        probe_positions, indexed_positions = self._query(data, indexed_on_left)
+        if indexed_on_left:
+            return SpatialJoin.merge(
+                self.indexed, indexed_positions, data, probe_positions
+            )
+        return SpatialJoin.merge(
+            data, probe_positions, self.indexed, indexed_positions
+        )
+
+    def join(
+        self,
+        pages: Iterable[gpd.GeoDataFrame],
+        indexed_on_left: bool = False,
+    ) -> gpd.GeoDataFrame:
+        """Joins all the pages of the other side with the indexed side.
+
+        Without any page, the result is empty, with the columns of the
+        indexed side and index_right, and the CRS of the indexed side.
+        """
+        tracer: Tracer = Tracer.get_instance()
+        results: List[gpd.GeoDataFrame] = list()
+        for page in pages:
+            with tracer.span("join.probe", rows=page.shape[0]) as span:
+                result = self.probe(page, indexed_on_left)
+                span.set_attribute("matches", result.shape[0])
+            results.append(result)
+        if len(results) == 0:
+            return self.probe(
+                gpd.GeoDataFrame(
+                    geometry=gpd.GeoSeries([], crs=self.indexed.crs)
+                ),
+                indexed_on_left,
+            )
+        return pd.concat(results)
+
+    @staticmethod
+    def join_frames(
+        left: gpd.GeoDataFrame,
+        right: gpd.GeoDataFrame,
+        predicate: str = "intersects",
+        chunk_size: int = 50000,
+    ) -> gpd.GeoDataFrame:
+        """Joins two GeoDataFrames in memory, indexing the smaller one."""
+        if left.shape[0] < right.shape[0]:
+            return SpatialJoin(left, predicate, chunk_size).probe(
+                right, indexed_on_left=True
+            )
+        return SpatialJoin(right, predicate, chunk_size).probe(left)
+
+    @staticmethod
+    def frame_wfs(
+        left: gpd.GeoDataFrame,
+        wfs: Wfs,
+        layer_name: str,
+        predicate: str = "intersects",
+        pushdown: bool = True,
+        chunk_size: int = 50000,
+    ) -> gpd.GeoDataFrame:
+        """Joins a GeoDataFrame with the features of a WFS layer, indexing
+        the smaller side; the WFS side is restricted to the bounds of left
+        when pushdown is True."""
+        bbox: Optional[Tuple[float, float, float, float]] = (
+            tuple(left.total_bounds)  # type: ignore
+            if pushdown and left.shape[0] > 0
+            else None
+        )
+        count: int = wfs.get_count(layer_name, bbox)
+        if 0 < count < left.shape[0]:
+            join = SpatialJoin(
+                wfs.get_data(layer_name, bbox), predicate, chunk_size
+            )
+            return join.probe(left)
+        join = SpatialJoin(left, predicate, chunk_size)
+        return join.join(wfs.iter_data(layer_name, bbox), indexed_on_left=True)
+
+    @staticmethod
+    def stac_wfs(
+        stac_url: str,
+        wfs: Wfs,
+        layer_name: str,
+        predicate: str = "intersects",
+        index: str = "wfs",
+        pushdown: bool = True,
+        max_records: Optional[int] = None,
+        chunk_size: int = 50000,
+    ) -> gpd.GeoDataFrame:
+        """Joins the items of a STAC collection with the features of a WFS
+        layer.
+
+        The side given by index, which should be the smaller, is loaded
+        and indexed; the other side is streamed page by page, restricted
+        to the bounds of the indexed side when pushdown is True.
+
+        Args:
+            stac_url (str): URL of the STAC items
+            wfs (Wfs): WFS service
+            layer_name (str): layer of the WFS service
+            predicate (str, optional): predicate(item, feature). Defaults
+                to "intersects".
+            index (str, optional): side to index, wfs or stac. Defaults to
+                "wfs".
+            pushdown (bool, optional): send the bounds of the indexed side
+                as bbox of the remote query of the other side. Defaults to
+                True.
+            max_records (Optional[int], optional): maximum number of STAC
+                items. Defaults to None.
+            chunk_size (int, optional): number of footprints by probe of
+                the index. Defaults to 50000.
+
+        Returns:
+            gpd.GeoDataFrame: the items with the columns of the matching
+            features
+        """
+        pages: Iterator[gpd.GeoDataFrame]
+        if index == "wfs":
+            join = SpatialJoin(wfs.get_data(layer_name), predicate, chunk_size)
+            pages = Stac.iter_pages(
+                StacEnum.ITEM,
+                stac_url,
+                max_records,
+                join.bounds if pushdown else None,
+            )
+            return join.join(pages)
+        if index == "stac":
+            join = SpatialJoin(
+                Stac.load(StacEnum.ITEM, stac_url, max_records),
+                predicate,
+                chunk_size,
+            )
+            pages = wfs.iter_data(
+                layer_name, join.bounds if pushdown else None
+            )
+            return join.join(pages, indexed_on_left=True)
+        raise ValueError(f"index must be wfs or stac, not {index}")
@@ -3,17 +3,34 @@ import json
 import logging
 import re
 import time
+from typing import Any
+from typing import Dict
+from typing import Iterator
 from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 import requests
+import shapely
+from lxml import etree
+from owslib.feature.common import WFSCapabilitiesReader
+from owslib.feature.schema import XS_NAMESPACE
 from owslib.feature.wfs110 import ContentMetadata as WfsContentMetadata
+from owslib.map.common import WMSCapabilitiesReader
 from owslib.map.wms111 import ContentMetadata as WmsContentMetadata
 from owslib.wfs import WebFeatureService
 from owslib.wms import WebMapService
 from pyproj.crs.crs import CRS
 from shapely.geometry import box
+from shapely.geometry.base import BaseGeometry
+
+from ..monitoring import UtilsMonitoring
+from ..tracing import Tracer
+from .transport import Transport
 
 logger = logging.getLogger(__name__)
 
@@ -24,12 +41,35 @@ class Wfs:
         'GEOGCS["Mars 2000",DATUM["D_Mars_2000",SPHEROID["Mars_2000_IAU_IAG",3396190.0,169.89444722361179]],PRIMEM["Greenwich",0],UNIT["Decimal_Degree",0.0174532925199433]]'
     )
     MAX_REQUESTS = 10000
+    # retries of a page after a timeout or a connection error, and delay
+    # between them in seconds
+    MAX_RETRIES = 3
+    RETRY_DELAY = 10
+    # geometries of the GML property types
+    GEOMETRY_TYPES = {
+        "PointPropertyType": "Point",
+        "PolygonPropertyType": "Polygon",
+        "LineStringPropertyType": "LineString",
+        "MultiPointPropertyType": "MultiPoint",
+        "MultiLineStringPropertyType": "MultiLineString",
+        "MultiPolygonPropertyType": "MultiPolygon",
+        "MultiGeometryPropertyType": "MultiGeometry",
+        "GeometryPropertyType": "GeometryCollection",
+        "SurfacePropertyType": "3D Polygon",
+        "MultiSurfacePropertyType": "3D MultiPolygon",
+    }
 
     def __init__(self, url: str, version: str = "2.0.0", **kwargs):
         self.__url: str = url
         self.__version: str = version
+        self.__transport: Transport = Transport.get_instance()
+        capabilities_url: str = WFSCapabilitiesReader(
+            version=version
+        ).capabilities_url(url)
         self.__wfs: WebFeatureService = WebFeatureService(
-            url=url, version=version
+            url=url,
+            version=version,
+            xml=self.transport.get(capabilities_url).content,
         )
         self.__ignore_layers: List[str] = (
             kwargs["ignore_layers"] if "ignore_layers" in kwargs else list()
@@ -47,6 +87,10 @@ class Wfs:
     def wfs(self):
         return self.__wfs
 
+    @property
+    def transport(self) -> Transport:
+        return self.__transport
+
     @property
     def service_type(self):
         return self.wfs.identification.type
@@ -91,52 +135,219 @@ class Wfs:
     def ignore_layers(self) -> List[str]:
         return self.__ignore_layers
 
+    def _bbox_param(
+        self, layer_name: str, bbox: Tuple[float, float, float, float]
+    ) -> str:
+        """BBOX of a request on a layer, followed from WFS 1.1 by the URN of
+        the default CRS of the layer, the axes being swapped for the CRS in
+        latitude, longitude order."""
+        values: List[float] = list(bbox)
+        crs_options: List = (
+            list()
+            if self.version.startswith("1.0")
+            else self.wfs.contents[layer_name].crsOptions
+        )
+        if len(crs_options) == 0:
+            return ",".join(str(value) for value in values)
+        crs = crs_options[0]
+        if crs.axisorder == "yx":
+            values = [values[1], values[0], values[3], values[2]]
+        return ",".join([str(value) for value in values] + [crs.getcodeurn()])
+
+    def _get_feature_params(
+        self,
+        layer_name: str,
+        start_index: int,
+        max_features: int,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        property_names: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        params: Dict[str, Any] = {
+            "service": "WFS",
+            "version": self.version,
+            "request": "GetFeature",
+            "outputFormat": "application/json",
+            "startIndex": start_index,
+        }
+        if self.version.startswith("2"):
+            params["typeNames"] = layer_name
+            params["count"] = max_features
+        else:
+            params["typeName"] = layer_name
+            params["maxFeatures"] = max_features
+        if bbox is not None:
+            params["bbox"] = self._bbox_param(layer_name, bbox)
+        if property_names is not None:
+            params["propertyName"] = ",".join(property_names)
+        return params
+
+    def _property_names(
+        self, layer_name: str, columns: List[str]
+    ) -> Optional[List[str]]:
+        """PROPERTYNAME of the GetFeature requests returning columns and the
+        geometry, None when the layer cannot be described."""
+        try:
+            schema: Optional[Dict] = self.get_schema(layer_name)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.debug(f"Cannot describe {layer_name} : {err}")
+            schema = None
+        if schema is None or "geometry_column" not in schema:
+            return None
+        unknown: List[str] = [
+            name for name in columns if name not in schema["properties"]
+        ]
+        if len(unknown) > 0:
+            logger.warning(f"Unknown columns in {layer_name}: {unknown}")
+        return [schema["geometry_column"]] + [
+            name for name in columns if name in schema["properties"]
+        ]
+
+    def _get_page(
+        self,
+        layer_name: str,
+        start_index: int,
+        max_features: int,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        property_names: Optional[List[str]] = None,
+    ) -> gpd.GeoDataFrame:
+        tracer: Tracer = Tracer.get_instance()
+        with tracer.span(
+            "wfs.page.fetch",
+            url=self.url,
+            layer=layer_name,
+            start_index=start_index,
+        ) as span:
+            features = self.transport.get(
+                self.url,
+                params=self._get_feature_params(
+                    layer_name,
+                    start_index,
+                    max_features,
+                    bbox,
+                    property_names,
+                ),
+            )
+            features.raise_for_status()
+            span.set_attribute("bytes", len(features.content))
+        with tracer.span(
+            "wfs.page.decode", layer=layer_name, start_index=start_index
+        ) as span:
+            data_utf8 = features.content.decode("UTF-8")
+            gdf = gpd.read_file(data_utf8)
+            span.set_attribute("rows", gdf.shape[0])
+        return gdf
+
+    @UtilsMonitoring.metric
     def _retrieve_all_features(
-        self, layer_name: str, start_index: int, max_features: int, count: int
+        self,
+        layer_name: str,
+        start_index: int,
+        max_features: int,
+        count: int,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        property_names: Optional[List[str]] = None,
     ) -> gpd.GeoDataFrame:
         logger.info(
             f"\tRetrieving from {start_index} to {start_index+max_features} on {count}"
         )
-        try:
-            features = self.wfs.getfeature(
-                typename=layer_name,
-                outputFormat="application/json",
-                startindex=start_index,
-                maxfeatures=max_features,
-            )
-            data_utf8 = features.read().decode("UTF-8")
-            gdf = gpd.read_file(data_utf8)
-            return gdf
-        except requests.exceptions.ReadTimeout:
-            time.sleep(10)
-            self._retrieve_all_features(
-                layer_name, start_index, max_features, count
-            )
-        except requests.exceptions.ConnectionError:
-            time.sleep(10)
-            self._retrieve_all_features(
-                layer_name, start_index, max_features, count
-            )
+        retry: int = 0
+        while True:
+            try:
+                return self._get_page(
+                    layer_name,
+                    start_index,
+                    max_features,
+                    bbox,
+                    property_names,
+                )
+            except (
+                requests.exceptions.ReadTimeout,
+                requests.exceptions.ConnectionError,
+            ) as err:
+                if retry >= Wfs.MAX_RETRIES:
+                    raise
+                retry += 1
+                logger.warning(
+                    f"{err}, retry {retry}/{Wfs.MAX_RETRIES} of the page "
+                    f"{start_index} of {layer_name} in {Wfs.RETRY_DELAY} s"
+                )
+                time.sleep(Wfs.RETRY_DELAY)
 
     def has_layer(self) -> bool:
         return len(self.layers) > 0
 
-    def get_data(self, layer_name: str) -> gpd.GeoDataFrame:
+    def iter_data(
+        self,
+        layer_name: str,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Iterator[gpd.GeoDataFrame]:
+        """Fetches the features of a layer page by page, without keeping the
+        previous pages in memory.
+
+        Args:
+            layer_name (str): layer
+            bbox (Optional[Tuple[float, float, float, float]], optional):
+                (min_lon, min_lat, max_lon, max_lat) sent to the server in
+                the default CRS of the layer. Defaults to None.
+            columns (Optional[List[str]], optional): columns to load with
+                the geometry, sent as PROPERTYNAME when the layer can be
+                described. Defaults to None, all the columns.
+
+        Returns:
+            Iterator[gpd.GeoDataFrame]: the features of each page
+        """
         if layer_name not in self.layers:
             raise RuntimeError(f"Layer {layer_name} does not exist")
 
-        count: int = self.get_count(layer_name)
-        list_gdf: List[gpd.GeoDataFrame] = [
-            self._retrieve_all_features(
-                layer_name, start_index, Wfs.MAX_REQUESTS, count
+        count: int = self.get_count(layer_name, bbox)
+        property_names: Optional[List[str]] = (
+            None
+            if columns is None or count == 0
+            else self._property_names(layer_name, columns)
+        )
+        for start_index in range(0, count, Wfs.MAX_REQUESTS):
+            gdf: gpd.GeoDataFrame = self._retrieve_all_features(
+                layer_name,
+                start_index,
+                Wfs.MAX_REQUESTS,
+                count,
+                bbox,
+                property_names,
             )
-            for start_index in range(0, count - 1, Wfs.MAX_REQUESTS)
-        ]
+            if columns is not None:
+                # the servers may ignore PROPERTYNAME
+                gdf = gdf[
+                    [
+                        name
+                        for name in gdf.columns
+                        if name in columns or name == gdf.geometry.name
+                    ]
+                ]
+            yield gdf.set_crs(Wfs.CRS_WKT, allow_override=True)
+
+    @UtilsMonitoring.metric
+    def get_data(
+        self,
+        layer_name: str,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> gpd.GeoDataFrame:
+        if layer_name not in self.layers:
+            raise RuntimeError(f"Layer {layer_name} does not exist")
+
+        list_gdf: List[gpd.GeoDataFrame] = list(
+            self.iter_data(layer_name, bbox, columns)
+        )
         if len(list_gdf) == 0:
             logger.warning(f"WARNING: Cannot retrieve data from {layer_name}")
             # TODO : faire quelque chose pour skipper
-        gdf: gpd.GeoDataFrame = pd.concat(list_gdf, ignore_index=True)
-        gdf.set_crs(Wfs.CRS_WKT, allow_override=True)
+        with Tracer.get_instance().span(
+            "wfs.concat", layer=layer_name, pages=len(list_gdf)
+        ) as span:
+            gdf: gpd.GeoDataFrame = pd.concat(list_gdf, ignore_index=True)
+            span.set_attribute("rows", gdf.shape[0])
+        gdf = gdf.set_crs(Wfs.CRS_WKT, allow_override=True)
         logger.debug(
             f"{gdf.shape[0]} records have been retrieved in {layer_name}"
         )
@@ -146,7 +357,74 @@ class Wfs:
         if layer_name not in self.layers:
             raise RuntimeError(f"Layer {layer_name} does not exist")
 
-        return self.wfs.get_schema(typename=layer_name)
+        params: Dict[str, Any] = {
+            "service": "WFS",
+            "version": self.version,
+            "request": "DescribeFeatureType",
+        }
+        if self.version.startswith("2"):
+            params["typeNames"] = layer_name
+        else:
+            params["typeName"] = layer_name
+        response = self.transport.get(self.url, params=params)
+        response.raise_for_status()
+        return Wfs._parse_schema(response.content)
+
+    @staticmethod
+    def _data_type(element) -> Optional[str]:
+        """Type of an element of a feature type, without its prefix."""
+        data_type: Optional[str] = element.attrib.get(
+            "type", element.attrib.get("ref")
+        )
+        if data_type is None:
+            restriction = element.find(".//{%s}restriction" % XS_NAMESPACE)
+            if restriction is not None:
+                data_type = restriction.attrib.get("base")
+        return None if data_type is None else data_type.split(":")[-1]
+
+    @staticmethod
+    def _parse_schema(content: bytes) -> Optional[Dict]:
+        """Schema, as the fiona ones, of a DescribeFeatureType response:
+        the types of the properties, the required ones and the geometry
+        type and column. None when the response describes no feature
+        type."""
+        root = etree.fromstring(content)
+        type_element = root.find("./{%s}element" % XS_NAMESPACE)
+        if type_element is None or "type" not in type_element.attrib:
+            return None
+        type_name: str = type_element.attrib["type"].split(":")[-1]
+        complex_type = next(
+            (
+                element
+                for element in root.iterfind(
+                    "./{%s}complexType" % XS_NAMESPACE
+                )
+                if element.attrib.get("name") == type_name
+            ),
+            None,
+        )
+        if complex_type is None:
+            return None
+        schema: Dict[str, Any] = {
+            "properties": dict(),
+            "required": list(),
+            "geometry": None,
+        }
+        for element in complex_type.iter("{%s}element" % XS_NAMESPACE):
+            name: Optional[str] = element.attrib.get("name")
+            data_type: Optional[str] = Wfs._data_type(element)
+            if name is None or data_type is None:
+                continue
+            if data_type in Wfs.GEOMETRY_TYPES:
+                schema["geometry"] = Wfs.GEOMETRY_TYPES[data_type]
+                schema["geometry_column"] = name
+            else:
+                schema["properties"][name] = data_type
+            if element.attrib.get("nillable", "false") == "false":
+                schema["required"].append(name)
+        if len(schema["properties"]) == 0 and schema["geometry"] is None:
+            return None
+        return schema
 
     def get_layer(self, layer_name: str) -> WfsContentMetadata:
         if layer_name not in self.layers:
@@ -160,7 +438,12 @@ class Wfs:
 
         return self.wfs.contents[layer_name].crsOptions
 
-    def get_count(self, layer_name: str) -> int:
+    @UtilsMonitoring.metric
+    def get_count(
+        self,
+        layer_name: str,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+    ) -> int:
         params = {
             "service": "wfs",
             "version": self.version,
@@ -168,7 +451,9 @@ class Wfs:
             "typeNames": layer_name,
             "resultType": "hits",
         }
-        r = requests.get(url=self.url, params=params)
+        if bbox is not None:
+            params["bbox"] = self._bbox_param(layer_name, bbox)
+        r = self.transport.get(self.url, params=params)
         txt = r.text
         m = re.search('numberMatched="([0-9]+)"', txt)
         nb = 0
@@ -181,10 +466,19 @@ class Wms:
     def __init__(self, url: str, version: str = "1.1.1", **kwargs):
         self.__url = url
         self.__version = version
-        self.__wms = WebMapService(url=url, version=version)
+        self.__transport: Transport = Transport.get_instance()
+        capabilities_url: str = WMSCapabilitiesReader(
+            version=version
+        ).capabilities_url(url)
+        self.__wms = WebMapService(
+            url=url,
+            version=version,
+            xml=self.transport.get(capabilities_url).content,
+        )
         self.__ignore_layers = (
             kwargs["ignore_layers"] if "ignore_layers" in kwargs else list()
         )
+        self.__catalog: Optional[gpd.GeoDataFrame] = None
 
     @property
     def url(self):
@@ -198,6 +492,10 @@ class Wms:
     def wms(self):
         return self.__wms
 
+    @property
+    def transport(self) -> Transport:
+        return self.__transport
+
     @property
     def service_type(self):
         return self.wms.identification.type
@@ -268,5 +566,127 @@ class Wms:
             for poly in df["boundingBox"]
         ]
         gdf = gpd.GeoDataFrame(df, geometry=geometry)
-        gdf.set_crs(Wfs.CRS_WKT, allow_override=True)
+        gdf = gdf.set_crs(Wfs.CRS_WKT, allow_override=True)
         return gdf
+
+    @staticmethod
+    def _get_bbox(layer: WmsContentMetadata) -> Tuple:
+        bbox = layer.boundingBoxWGS84
+        if bbox is None and layer.boundingBox is not None:
+            bbox = layer.boundingBox[0:4]
+        if bbox is None:
+            bbox = (np.nan, np.nan, np.nan, np.nan)
+        return tuple(bbox)
+
+    @staticmethod
+    def _get_time_range(time_positions: List[str]) -> Tuple:
+        if not time_positions:
+            return (None, None)
+        # a time position is either a value or a start/end/resolution period
+        start: str = time_positions[0].split("/")[0]
+        last: List[str] = time_positions[-1].split("/")
+        return (start, last[1] if len(last) > 1 else last[0])
+
+    @staticmethod
+    def _get_metadata(layer: WmsContentMetadata) -> Dict[str, Any]:
+        time_positions: List[str] = list(layer.timepositions or [])
+        time_start, time_end = Wms._get_time_range(time_positions)
+        return {
+            "name": layer.name,
+            "title": layer.title,
+            "abstract": layer.abstract,
+            "queryable": bool(int(layer.queryable or 0)),
+            "opaque": bool(int(layer.opaque or 0)),
+            "crs_options": list(layer.crsOptions or []),
+            "styles": list(layer.styles.keys()) if layer.styles else [],
+            "default_time": layer.defaulttimeposition,
+            "time_positions": time_positions,
+            "time_start": time_start,
+            "time_end": time_end,
+        }
+
+    def _build_catalog(self) -> gpd.GeoDataFrame:
+        layers: List[WmsContentMetadata] = [
+            self.wms.contents[layer_name] for layer_name in self.layers
+        ]
+        df = pd.DataFrame(
+            [Wms._get_metadata(layer) for layer in layers],
+            columns=[
+                "name",
+                "title",
+                "abstract",
+                "queryable",
+                "opaque",
+                "crs_options",
+                "styles",
+                "default_time",
+                "time_positions",
+                "time_start",
+                "time_end",
+            ],
+        )
+        df = df.astype(
+            {
+                "name": "string",
+                "title": "string",
+                "abstract": "string",
+                "queryable": "bool",
+                "opaque": "bool",
+                "default_time": "string",
+            }
+        )
+        for column in ["time_start", "time_end"]:
+            df[column] = pd.to_datetime(df[column], errors="coerce", utc=True)
+
+        bboxes: np.ndarray = np.array(
+            [Wms._get_bbox(layer) for layer in layers], dtype="float64"
+        ).reshape(-1, 4)
+        df["minx"] = bboxes[:, 0]
+        df["miny"] = bboxes[:, 1]
+        df["maxx"] = bboxes[:, 2]
+        df["maxy"] = bboxes[:, 3]
+        geometry = shapely.box(
+            bboxes[:, 0], bboxes[:, 1], bboxes[:, 2], bboxes[:, 3]
+        )
+        gdf = gpd.GeoDataFrame(df, geometry=geometry, crs=Wfs.CRS_WKT)
+        gdf.set_index("name", drop=False, inplace=True)
+        logger.debug(f"{gdf.shape[0]} layers in the catalog of {self.url}")
+        return gdf
+
+    def catalog(self, refresh: bool = False) -> gpd.GeoDataFrame:
+        """Returns all the layers of the service as a GeoDataFrame.
+
+        The catalog is built once from the capabilities and cached in the
+        service.
+
+        Args:
+            refresh (bool, optional): rebuild the catalog. Defaults to False.
+
+        Returns:
+            gpd.GeoDataFrame: one row per layer, indexed by layer name
+        """
+        if self.__catalog is None or refresh:
+            self.__catalog = self._build_catalog()
+        return self.__catalog
+
+    def find_layers(
+        self,
+        geometry: Union[BaseGeometry, Tuple[float, float, float, float]],
+        predicate: str = "intersects",
+    ) -> gpd.GeoDataFrame:
+        """Returns the layers of the catalog matching a geometry.
+
+        Args:
+            geometry (Union[BaseGeometry, Tuple[float, float, float, float]]):
+                geometry or bounding box (minx, miny, maxx, maxy)
+            predicate (str, optional): spatial predicate. Defaults to
+                "intersects".
+
+        Returns:
+            gpd.GeoDataFrame: the matching layers
+        """
+        if not isinstance(geometry, BaseGeometry):
+            geometry = box(*geometry)
+        catalog: gpd.GeoDataFrame = self.catalog()
+        index = catalog.sindex.query(geometry, predicate=predicate)
+        return catalog.iloc[np.sort(index)]
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from ..tracing import Tracer
+from .stac import Stac
+from .stac import StacEnum
+
+logger = logging.getLogger(__name__)
+
+
+def _read_partition(
+    path: str, columns: Optional[List[str]] = None
+) -> gpd.GeoDataFrame:
+    return gpd.read_parquet(path, columns=columns)
+
+
+def _query_partition(
+    path: str, expression: str, columns: Optional[List[str]]
+) -> gpd.GeoDataFrame:
+    data: gpd.GeoDataFrame = _read_partition(path)
+    result: gpd.GeoDataFrame = data.query(expression)
+    return result if columns is None else result[columns]
+
+
+def _filter_partition(
+    path: str, geometry: BaseGeometry, predicate: str
+) -> gpd.GeoDataFrame:
+    data: gpd.GeoDataFrame = _read_partition(path)
+    positions: np.ndarray = data.sindex.query(geometry, predicate=predicate)
+    return data.iloc[np.sort(positions)]
+
+
+def _aggregate_partition(path: str) -> pd.DataFrame:
+    data: pd.DataFrame = (
+        _read_partition(path).select_dtypes(include="number").astype(float)
+    )
+    mean: pd.Series = data.mean()
+    return pd.DataFrame(
+        {
+            "count": data.count(),
+            "mean": mean,
+            # sum of the squared deviations to the mean of the partition
+            "m2": ((data - mean) ** 2).sum(),
+            "min": data.min(),
+            "max": data.max(),
+        }
+    )
+
+
+def _merge_aggregates(aggregates: List[pd.DataFrame]) -> pd.DataFrame:
+    """Merges the aggregates of the partitions with the parallel algorithm
+    of Chan et al., which does not lose the precision of the variance of
+    large values."""
+    columns: pd.Index = pd.Index(
+        list(
+            dict.fromkeys(name for frame in aggregates for name in frame.index)
+        )
+    )
+    result: pd.DataFrame = pd.DataFrame(
+        {"count": 0.0, "mean": 0.0, "m2": 0.0, "min": np.nan, "max": np.nan},
+        index=columns,
+    )
+    for frame in aggregates:
+        frame = frame.reindex(columns)
+        count_b: pd.Series = frame["count"].fillna(0)
+        count: pd.Series = result["count"] + count_b
+        delta: pd.Series = frame["mean"].fillna(0) - result["mean"]
+        ratio: pd.Series = (count_b / count).fillna(0)
+        result["m2"] = (
+            result["m2"]
+            + frame["m2"].fillna(0)
+            + delta ** 2 * result["count"] * ratio
+        )
+        result["mean"] = result["mean"] + delta * ratio
+        result["count"] = count
+        result["min"] = np.fmin(result["min"], frame["min"])
+        result["max"] = np.fmax(result["max"], frame["max"])
+    return result
+
+
+def _histogram_partition(
+    path: str, edges: Dict[str, np.ndarray]
+) -> Dict[str, np.ndarray]:
+    data: pd.DataFrame = pd.read_parquet(path, columns=list(edges))
+    return {
+        column: np.histogram(
+            data[column].dropna().to_numpy(dtype=float), bins=column_edges
+        )[0]
+        for column, column_edges in edges.items()
+    }
+
+
+class ParquetCatalog:
+    """Catalog stored out of core in partitions of GeoParquet files.
+
+    The partitions are listed, with their number of rows and their bounds,
+    in an index file of the directory. Each operation streams the
+    partitions through a pool of processes, which read, filter or reduce
+    one partition at a time, so that only the results are held in memory.
+    The partitions outside the bounds of a spatial filter are not read.
+    Nested values (dicts and lists) are stored as JSON text. The
+    aggregates of the numeric columns are computed once and kept.
+    """
+
+    INDEX = "_partitions.json"
+    PARTITION_SIZE = 100000
+
+    def __init__(self, path: str, max_workers: Optional[int] = None):
+        self.__path: str = path
+        self.__max_workers: Optional[int] = max_workers
+        with open(
+            os.path.join(path, ParquetCatalog.INDEX), encoding="utf-8"
+        ) as file:
+            self.__partitions: List[Dict] = json.load(file)["partitions"]
+        self.__aggregates: Optional[pd.DataFrame] = None
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    @property
+    def partitions(self) -> List[Dict]:
+        return self.__partitions
+
+    @property
+    def files(self) -> List[str]:
+        return [
+            os.path.join(self.path, partition["file"])
+            for partition in self.partitions
+        ]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        nb_rows: int = sum(partition["rows"] for partition in self.partitions)
+        return nb_rows, len(self.columns)
+
+    @property
+    def columns(self) -> List[str]:
+        if len(self.partitions) == 0:
+            return list()
+        schema = pq.read_schema(self.files[0])
+        index_columns: List = json.loads(schema.metadata[b"pandas"])[
+            "index_columns"
+        ]
+        return [name for name in schema.names if name not in index_columns]
+
+    @staticmethod
+    def _storable(data: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        data = data.copy()
+        for column in data.columns:
+            if column == data.geometry.name or data[column].dtype != object:
+                continue
+            if (
+                data[column]
+                .map(lambda value: isinstance(value, (dict, list, tuple)))
+                .any()
+            ):
+                data[column] = data[column].map(
+                    lambda value: (
+                        None
+                        if value is None
+                        else json.dumps(value, default=str)
+                    )
+                )
+        return data
+
+    @staticmethod
+    def write(
+        pages: Iterable[gpd.GeoDataFrame],
+        path: str,
+        partition_size: int = PARTITION_SIZE,
+    ) -> "ParquetCatalog":
+        """Writes pages of footprints in partitions of partition_size rows
+        in the directory path, without holding more than one partition in
+        memory."""
+        os.makedirs(path, exist_ok=True)
+        partitions: List[Dict] = list()
+        buffer: List[gpd.GeoDataFrame] = list()
+        nb_buffered: int = 0
+
+        def flush() -> None:
+            data: gpd.GeoDataFrame = pd.concat(buffer)
+            name: str = f"part-{len(partitions):05d}.parquet"
+            with Tracer.get_instance().span(
+                "parquet.write", file=name, rows=data.shape[0]
+            ):
+                ParquetCatalog._storable(data).to_parquet(
+                    os.path.join(path, name)
+                )
+            partitions.append(
+                {
+                    "file": name,
+                    "rows": data.shape[0],
+                    "bounds": [float(value) for value in data.total_bounds],
+                }
+            )
+            buffer.clear()
+
+        for page in pages:
+            while page.shape[0] > 0:
+                page_part = page.iloc[: partition_size - nb_buffered]
+                page = page.iloc[page_part.shape[0] :]
+                buffer.append(page_part)
+                nb_buffered += page_part.shape[0]
+                if nb_buffered == partition_size:
+                    flush()
+                    nb_buffered = 0
+        if nb_buffered > 0:
+            flush()
+        with open(
+            os.path.join(path, ParquetCatalog.INDEX), "w", encoding="utf-8"
+        ) as file:
+            json.dump({"partitions": partitions}, file)
+        return ParquetCatalog(path)
+
+    @staticmethod
+    def from_stac(
+        url: str,
+        path: str,
+        max_records: Optional[int] = None,
+        partition_size: int = PARTITION_SIZE,
+    ) -> "ParquetCatalog":
+        """Streams the pages of a STAC search in partitions of path."""
+        return ParquetCatalog.write(
+            Stac.iter_pages(StacEnum.ITEM, url, max_records),
+            path,
+            partition_size,
+        )
+
+    def _map(self, func: Callable, files: List[str], *args) -> List:
+        if len(files) <= 1 or self.__max_workers == 1:
+            return [func(file, *args) for file in files]
+        max_workers: int = min(
+            len(files), self.__max_workers or os.cpu_count() or 1
+        )
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            return list(
+                pool.map(func, files, *[[arg] * len(files) for arg in args])
+            )
+
+    def _concat(self, results: List[gpd.GeoDataFrame]) -> gpd.GeoDataFrame:
+        if len(results) == 0:
+            return gpd.GeoDataFrame()
+        return pd.concat(results)
+
+    def iter_partitions(
+        self, columns: Optional[List[str]] = None
+    ) -> Iterator[gpd.GeoDataFrame]:
+        """Reads the partitions one by one."""
+        for file in self.files:
+            yield _read_partition(file, columns)
+
+    def read(self, columns: Optional[List[str]] = None) -> gpd.GeoDataFrame:
+        """Reads the whole catalog in memory."""
+        return self._concat(list(self.iter_partitions(columns)))
+
+    def query(
+        self, expression: str, columns: Optional[List[str]] = None
+    ) -> gpd.GeoDataFrame:
+        """Rows selected by expression, like DataFrame.query."""
+        with Tracer.get_instance().span(
+            "parquet.query", query=expression
+        ) as span:
+            result: gpd.GeoDataFrame = self._concat(
+                self._map(_query_partition, self.files, expression, columns)
+            )
+            span.set_attribute("rows", result.shape[0])
+        return result
+
+    def intersects(
+        self, geometry: BaseGeometry, predicate: str = "intersects"
+    ) -> gpd.GeoDataFrame:
+        """Footprints for which predicate(footprint, geometry) is true;
+        the partitions outside the bounds of geometry are not read."""
+        min_lon, min_lat, max_lon, max_lat = geometry.bounds
+        files: List[str] = [
+            os.path.join(self.path, partition["file"])
+            for partition in self.partitions
+            if not (
+                partition["bounds"][0] > max_lon
+                or partition["bounds"][2] < min_lon
+                or partition["bounds"][1] > max_lat
+                or partition["bounds"][3] < min_lat
+            )
+        ]
+        return self._concat(
+            self._map(_filter_partition, files, geometry, predicate)
+        )
+
+    def filter_bbox(
+        self, bbox: Tuple[float, float, float, float]
+    ) -> gpd.GeoDataFrame:
+        """Footprints intersecting bbox (min_lon, min_lat, max_lon,
+        max_lat)."""
+        return self.intersects(shapely.box(*bbox))
+
+    def _aggregates(self) -> pd.DataFrame:
+        if self.__aggregates is None:
+            self.__aggregates = _merge_aggregates(
+                self._map(_aggregate_partition, self.files)
+            )
+        return self.__aggregates
+
+    def describe(self) -> pd.DataFrame:
+        """Count, mean, std, min and max of the numeric columns, reduced
+        from the partial aggregates of the partitions."""
+        aggregates: pd.DataFrame = self._aggregates()
+        count: pd.Series = aggregates["count"]
+        return pd.DataFrame(
+            {
+                "count": count,
+                "mean": aggregates["mean"].where(count > 0),
+                "std": np.sqrt(aggregates["m2"] / (count - 1)).where(
+                    count > 1
+                ),
+                "min": aggregates["min"],
+                "max": aggregates["max"],
+            }
+        ).T
+
+    def histograms(
+        self, columns: Optional[List[str]] = None, bins: int = 50
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Counts and edges of the histograms of numeric columns, all of
+        them by default, computed in one pass over the partitions."""
+        aggregates: pd.DataFrame = self._aggregates()
+        if columns is None:
+            columns = list(aggregates.index[aggregates["count"] > 0])
+        edges: Dict[str, np.ndarray] = {
+            column: np.linspace(
+                float(aggregates.loc[column, "min"]),
+                float(aggregates.loc[column, "max"]),
+                bins + 1,
+            )
+            for column in columns
+        }
+        if len(edges) == 0:
+            return dict()
+        counts: List[Dict[str, np.ndarray]] = self._map(
+            _histogram_partition, self.files, edges
+        )
+        return {
+            column: (
+                np.sum([partition[column] for partition in counts], axis=0),
+                column_edges,
+            )
+            for column, column_edges in edges.items()
+        }
+
+    def histogram(
+        self, column: str, bins: int = 50
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Counts and edges of the histogram of a numeric column."""
+        return self.histograms([column], bins)[column]
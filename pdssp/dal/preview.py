@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewLoader:
+    """Fetches, decodes and caches the quicklooks of STAC items.
+
+    Previews are downsampled once, then kept in a bounded in-memory LRU
+    cache and in an on-disk cache of NumPy arrays, so browsing the same
+    items again does not download anything.
+    """
+
+    PREVIEW_KEYS = ["thumbnail", "overview", "quicklook", "browse", "preview"]
+
+    __instance: Optional["PreviewLoader"] = None
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_items: int = 256,
+        max_size: int = 256,
+        max_workers: int = 8,
+        transport: Optional[Transport] = None,
+    ):
+        self.__directory: str = (
+            directory
+            if directory is not None
+            else os.path.join(
+                os.path.expanduser("~"), ".cache", "pdssp", "previews"
+            )
+        )
+        self.__max_items: int = max_items
+        self.__max_size: int = max_size
+        self.__max_workers: int = max_workers
+        self.__transport: Transport = (
+            transport if transport is not None else Transport.get_instance()
+        )
+        self.__cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.__lock = threading.Lock()
+        os.makedirs(self.__directory, exist_ok=True)
+
+    @staticmethod
+    def get_instance() -> "PreviewLoader":
+        """Returns the loader shared by the planets."""
+        if PreviewLoader.__instance is None:
+            PreviewLoader.__instance = PreviewLoader()
+        return PreviewLoader.__instance
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    @property
+    def max_items(self) -> int:
+        return self.__max_items
+
+    @property
+    def max_size(self) -> int:
+        return self.__max_size
+
+    @staticmethod
+    def get_href(row: pd.Series) -> Optional[str]:
+        """Returns the href of the preview of a STAC item, if any."""
+        assets = row["assets"] if "assets" in row else None
+        if isinstance(assets, dict):
+            for key, asset in assets.items():
+                roles = asset.get("roles") or list()
+                if key in PreviewLoader.PREVIEW_KEYS or (
+                    "thumbnail" in roles or "overview" in roles
+                ):
+                    return asset["href"]
+        for key in PreviewLoader.PREVIEW_KEYS:
+            if key in row and isinstance(row[key], str):
+                return row[key]
+        return None
+
+    @staticmethod
+    def iter_hrefs(data: pd.DataFrame) -> Iterator[Optional[str]]:
+        """Yields the href of the preview of each item, reading only the
+        columns that can hold one."""
+        columns: List[str] = [
+            name
+            for name in ["assets"] + PreviewLoader.PREVIEW_KEYS
+            if name in data.columns
+        ]
+        if len(columns) == 0:
+            for _ in range(data.shape[0]):
+                yield None
+            return
+        for _, row in data[columns].iterrows():
+            yield PreviewLoader.get_href(row)
+
+    @staticmethod
+    def get_hrefs(data: pd.DataFrame) -> List[Optional[str]]:
+        return list(PreviewLoader.iter_hrefs(data))
+
+    @staticmethod
+    def has_preview(data: pd.DataFrame) -> bool:
+        """Whether an item has a preview, stopping at the first one."""
+        return any(href is not None for href in PreviewLoader.iter_hrefs(data))
+
+    def _disk_path(self, href: str) -> str:
+        name = hashlib.sha256(href.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}_{self.max_size}.npy")
+
+    def _cache_get(self, href: str) -> Optional[np.ndarray]:
+        with self.__lock:
+            image = self.__cache.get(href)
+            if image is not None:
+                self.__cache.move_to_end(href)
+        return image
+
+    def _cache_put(self, href: str, image: np.ndarray) -> None:
+        with self.__lock:
+            self.__cache[href] = image
+            self.__cache.move_to_end(href)
+            while len(self.__cache) > self.max_items:
+                self.__cache.popitem(last=False)
+
+    def _fetch(self, href: str) -> bytes:
+        if urlparse(href).scheme in ["http", "https"]:
+            response = self.__transport.get(href)
+            response.raise_for_status()
+            return response.content
+        path = url2pathname(urlparse(href).path) if "://" in href else href
+        with open(path, "rb") as file:
+            return file.read()
+
+    def _decode(self, content: bytes) -> np.ndarray:
+        image: Image.Image = Image.open(BytesIO(content))
+        # let the JPEG decoder downscale while decoding
+        image.draft("RGB", (self.max_size, self.max_size))
+        # palette and gray with alpha images are not displayable arrays
+        if image.mode in ["P", "PA"]:
+            image = image.convert(
+                "RGBA"
+                if image.mode == "PA" or "transparency" in image.info
+                else "RGB"
+            )
+        elif image.mode == "LA":
+            image = image.convert("RGBA")
+        image.thumbnail((self.max_size, self.max_size))
+        return np.asarray(image)
+
+    def _read_disk(self, disk_path: str) -> Optional[np.ndarray]:
+        """Preview of the disk cache, None when it is missing or cannot be
+        read, the unreadable file being deleted."""
+        if not os.path.exists(disk_path):
+            return None
+        try:
+            return np.load(disk_path)
+        except (OSError, ValueError, EOFError) as err:
+            logger.debug(f"Cannot read {disk_path}, fetched again : {err}")
+            try:
+                os.remove(disk_path)
+            except OSError:
+                pass
+            return None
+
+    def _write_disk(self, disk_path: str, image: np.ndarray) -> None:
+        """Writes a preview in the disk cache through a temporary file, so
+        that a concurrent reader never sees a partial file."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                np.save(file, image)
+            os.replace(tmp_path, disk_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _load(self, href: str) -> Optional[np.ndarray]:
+        disk_path: str = self._disk_path(href)
+        try:
+            image = self._read_disk(disk_path)
+            if image is None:
+                image = self._decode(self._fetch(href))
+                self._write_disk(disk_path, image)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.warning(f"Cannot load the preview {href} : {err}")
+            return None
+        self._cache_put(href, image)
+        return image
+
+    def get(self, href: str) -> Optional[np.ndarray]:
+        """Returns the downsampled preview of href."""
+        image = self._cache_get(href)
+        return image if image is not None else self._load(href)
+
+    def get_all(
+        self, hrefs: List[Optional[str]]
+    ) -> List[Optional[np.ndarray]]:
+        """Returns the previews of hrefs, loading the missing ones
+        concurrently."""
+        images: Dict[str, Optional[np.ndarray]] = dict()
+        missing: List[str] = list()
+        for href in hrefs:
+            if href is None or href in images:
+                continue
+            images[href] = self._cache_get(href)
+            if images[href] is None:
+                missing.append(href)
+        if len(missing) > 0:
+            with ThreadPoolExecutor(max_workers=self.__max_workers) as pool:
+                for href, image in zip(missing, pool.map(self._load, missing)):
+                    images[href] = image
+        return [images[href] if href is not None else None for href in hrefs]
+
+    def clear(self) -> None:
+        """Clears the in-memory cache."""
+        with self.__lock:
+            self.__cache.clear()
+
+    @staticmethod
+    def plot_grid(
+        images: List[Optional[np.ndarray]],
+        titles: Optional[List[str]] = None,
+        ncols: int = 4,
+        figsize_by_image: float = 3,
+    ):
+        """Renders previews as a grid with matplotlib and returns the
+        figure."""
+        import matplotlib.pyplot as plt
+
+        nrows: int = max(1, -(-len(images) // ncols))
+        fig, axes = plt.subplots(
+            nrows,
+            ncols,
+            figsize=(ncols * figsize_by_image, nrows * figsize_by_image),
+            squeeze=False,
+        )
+        for position, axe in enumerate(axes.flat):
+            axe.axis("off")
+            if position >= len(images):
+                continue
+            if images[position] is not None:
+                axe.imshow(images[position], cmap="gray")
+            if titles is not None:
+                axe.set_title(titles[position], fontsize=8)
+        fig.tight_layout()
+        return fig
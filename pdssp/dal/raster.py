@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import logging
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from .download import AssetDownloader
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+class RasterReader:
+    """Reads a window or an overview level of a (cloud optimized) GeoTIFF.
+
+    Remote files are read through GDAL /vsicurl/, which only fetches the
+    header and the tiles covering the window with HTTP range requests.
+    Local files, or the local copies of the assets downloaded by an
+    AssetDownloader, are read with memory-mapped I/O when uncompressed.
+    """
+
+    GDAL_OPTIONS: Dict[str, str] = {
+        # do not list the remote directory looking for sidecar files
+        "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+        "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+        "GDAL_HTTP_MULTIPLEX": "YES",
+        "VSI_CACHE": "TRUE",
+        # memory map the uncompressed local files
+        "GTIFF_VIRTUAL_MEM_IO": "IF_ENOUGH_RAM",
+    }
+
+    def __init__(
+        self,
+        downloader: Optional[AssetDownloader] = None,
+        **gdal_options: str,
+    ):
+        self.__downloader: Optional[AssetDownloader] = downloader
+        self.__gdal_options: Dict[str, str] = dict(RasterReader.GDAL_OPTIONS)
+        self.__gdal_options.update(Transport.get_instance().gdal_options())
+        self.__gdal_options.update(gdal_options)
+
+    @property
+    def downloader(self) -> Optional[AssetDownloader]:
+        return self.__downloader
+
+    def _to_path(self, href: str) -> str:
+        if self.downloader is not None:
+            local_path: Optional[str] = self.downloader.get(href)
+            if local_path is not None:
+                return local_path
+        scheme: str = urlparse(href).scheme
+        if scheme in ["http", "https"]:
+            return "/vsicurl/" + href
+        if scheme == "file":
+            return url2pathname(urlparse(href).path)
+        return href
+
+    def info(self, href: str) -> Dict:
+        """Returns the size, the number of bands and the overview factors
+        of a raster."""
+        with rasterio.Env(**self.__gdal_options):
+            with rasterio.open(self._to_path(href)) as src:
+                return {
+                    "width": src.width,
+                    "height": src.height,
+                    "count": src.count,
+                    "dtypes": list(src.dtypes),
+                    "crs": src.crs.to_wkt() if src.crs else None,
+                    "overviews": src.overviews(1),
+                }
+
+    def read(
+        self,
+        href: str,
+        window: Optional[Tuple[int, int, int, int]] = None,
+        overview: Optional[int] = None,
+        bands: Optional[List[int]] = None,
+    ) -> Tuple[np.ndarray, Tuple[float, ...]]:
+        """Reads a window of a raster.
+
+        Args:
+            href (str): URL or path of the raster
+            window (Optional[Tuple[int, int, int, int]], optional):
+                (col_off, row_off, width, height) in the pixels of the
+                selected level. Defaults to None (whole level).
+            overview (Optional[int], optional): overview level, 0 being the
+                first overview. Defaults to None (full resolution).
+            bands (Optional[List[int]], optional): bands to read, starting
+                at 1. Defaults to None (all bands).
+
+        Returns:
+            Tuple[np.ndarray, Tuple[float, ...]]: the pixels as a
+            (bands, rows, cols) array and the GDAL geotransform of the
+            window
+        """
+        kwargs: Dict = dict()
+        if overview is not None:
+            kwargs["overview_level"] = overview
+        with rasterio.Env(**self.__gdal_options):
+            with rasterio.open(self._to_path(href), **kwargs) as src:
+                rio_window: Window = (
+                    Window(0, 0, src.width, src.height)
+                    if window is None
+                    else Window(*window)
+                )
+                logger.debug(f"Reading {rio_window} of {href}")
+                data: np.ndarray = src.read(bands, window=rio_window)
+                transform = src.window_transform(rio_window)
+        return data, tuple(transform.to_gdal())
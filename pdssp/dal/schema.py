@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+import configparser
+import logging
+import os
+import threading
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import geopandas as gpd
+import pandas as pd
+
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+class StacSchema:
+    """Types of the properties of the STAC items of a collection.
+
+    The types come from the STAC common metadata, from the JSON schemas of
+    the extensions declared by the items, and from the summaries of the
+    collection: a list of strings gives the categories of a property, a
+    list of numbers or a range gives a numeric property. The asset keys
+    declared in item_assets always become columns.
+
+    The collections and the extension schemas are fetched once by URL,
+    only when fetch is true in the [schema] section of pdssp.conf, since
+    they are often on third-party hosts; the properties without declared
+    type keep the type inferred by pandas.
+    """
+
+    SECTION = "schema"
+    PATH_TO_CONF = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)),
+        os.pardir,
+        "conf",
+        "pdssp.conf",
+    )
+
+    NUMBER = "number"
+    INTEGER = "integer"
+    BOOLEAN = "boolean"
+    DATETIME = "datetime"
+    CATEGORY = "category"
+    ARRAY = "array"
+    STRING = "string"
+
+    # STAC common metadata
+    COMMON_METADATA: Dict[str, str] = {
+        "datetime": DATETIME,
+        "start_datetime": DATETIME,
+        "end_datetime": DATETIME,
+        "created": DATETIME,
+        "updated": DATETIME,
+        "gsd": NUMBER,
+        "instruments": ARRAY,
+        "platform": STRING,
+        "constellation": STRING,
+        "mission": STRING,
+    }
+
+    # fetch the collections and the JSON schemas of the extensions, and
+    # the timeout of these requests in seconds, read from the
+    # configuration file when None
+    FETCH: Optional[bool] = None
+    TIMEOUT: Optional[float] = None
+
+    __documents: Dict[str, Optional[Dict]] = dict()
+    __lock = threading.Lock()
+
+    def __init__(
+        self,
+        types: Optional[Dict[str, str]] = None,
+        categories: Optional[Dict[str, List]] = None,
+        assets: Optional[List[str]] = None,
+    ):
+        self.__types: Dict[str, str] = dict(StacSchema.COMMON_METADATA)
+        self.__types.update(types or dict())
+        self.__categories: Dict[str, List] = dict(categories or dict())
+        self.__assets: List[str] = list(assets or list())
+
+    @property
+    def types(self) -> Dict[str, str]:
+        return self.__types
+
+    @property
+    def categories(self) -> Dict[str, List]:
+        return self.__categories
+
+    @property
+    def assets(self) -> List[str]:
+        return self.__assets
+
+    @staticmethod
+    def configure(path_to_conf: str = PATH_TO_CONF) -> None:
+        """Reads fetch and timeout from the [schema] section of a
+        configuration file."""
+        config = configparser.ConfigParser()
+        config.read(path_to_conf)
+        if config.has_section(StacSchema.SECTION):
+            section = config[StacSchema.SECTION]
+            StacSchema.FETCH = section.getboolean("fetch", False)
+            StacSchema.TIMEOUT = section.getfloat("timeout", 5)
+        else:
+            StacSchema.FETCH = False
+            StacSchema.TIMEOUT = 5
+
+    @staticmethod
+    def _fetch_enabled() -> bool:
+        if StacSchema.FETCH is None or StacSchema.TIMEOUT is None:
+            StacSchema.configure()
+        return bool(StacSchema.FETCH)
+
+    @staticmethod
+    def _fetch(url: str) -> Optional[Dict]:
+        """JSON document at url, fetched once, None when it cannot be
+        fetched."""
+        with StacSchema.__lock:
+            if url in StacSchema.__documents:
+                return StacSchema.__documents[url]
+        document: Optional[Dict]
+        try:
+            document = (
+                Transport.get_instance()
+                .get(url, timeout=StacSchema.TIMEOUT)
+                .json()
+            )
+        except Exception as err:  # pylint: disable=broad-except
+            logger.debug(f"Cannot fetch {url} : {err}")
+            document = None
+        with StacSchema.__lock:
+            StacSchema.__documents[url] = document
+        return document
+
+    @staticmethod
+    def _json_type(definition: Any) -> Optional[str]:
+        if not isinstance(definition, dict):
+            return None
+        json_type = definition.get("type")
+        if isinstance(json_type, list):
+            json_type = next(
+                (value for value in json_type if value != "null"), None
+            )
+        if not isinstance(json_type, str):
+            return None
+        if json_type == "string" and definition.get("format") == "date-time":
+            return StacSchema.DATETIME
+        if json_type == "string" and "enum" in definition:
+            return StacSchema.CATEGORY
+        return {
+            "number": StacSchema.NUMBER,
+            "integer": StacSchema.INTEGER,
+            "boolean": StacSchema.BOOLEAN,
+            "array": StacSchema.ARRAY,
+            "string": StacSchema.STRING,
+        }.get(json_type)
+
+    @staticmethod
+    def _extension_types(schema: Any, types: Dict[str, str]) -> None:
+        """Collects the types of the namespaced fields (prefix:name) found
+        anywhere in the JSON schema of an extension."""
+        if isinstance(schema, list):
+            for value in schema:
+                StacSchema._extension_types(value, types)
+            return
+        if not isinstance(schema, dict):
+            return
+        properties = schema.get("properties")
+        if isinstance(properties, dict):
+            for name, definition in properties.items():
+                json_type: Optional[str] = StacSchema._json_type(definition)
+                if ":" in name and json_type is not None:
+                    types.setdefault(name, json_type)
+        for value in schema.values():
+            StacSchema._extension_types(value, types)
+
+    @staticmethod
+    def _summary_type(summary: Any) -> Optional[str]:
+        if isinstance(summary, dict):
+            if "minimum" in summary or "maximum" in summary:
+                return StacSchema.NUMBER
+            return StacSchema._json_type(summary)
+        if isinstance(summary, list) and len(summary) > 0:
+            if all(isinstance(value, bool) for value in summary):
+                return StacSchema.BOOLEAN
+            if all(
+                isinstance(value, (int, float)) and not isinstance(value, bool)
+                for value in summary
+            ):
+                return StacSchema.NUMBER
+            if all(isinstance(value, str) for value in summary):
+                return StacSchema.CATEGORY
+        return None
+
+    @staticmethod
+    def from_collection(
+        collection: Optional[Dict], extensions: Optional[List[str]] = None
+    ) -> "StacSchema":
+        """Schema of the items of a collection, with the extensions
+        declared by the collection and by the items."""
+        collection = collection or dict()
+        types: Dict[str, str] = dict()
+        categories: Dict[str, List] = dict()
+        extension_urls: List[str] = list(extensions or list())
+        extension_urls += collection.get("stac_extensions", list())
+        if StacSchema._fetch_enabled():
+            for url in dict.fromkeys(extension_urls):
+                schema: Optional[Dict] = StacSchema._fetch(url)
+                if schema is not None:
+                    StacSchema._extension_types(schema, types)
+        for name, summary in collection.get("summaries", dict()).items():
+            summary_type: Optional[str] = StacSchema._summary_type(summary)
+            if summary_type is None:
+                continue
+            # the summary of an array lists the values of its items
+            if (
+                types.get(name, StacSchema.COMMON_METADATA.get(name))
+                == StacSchema.ARRAY
+            ):
+                continue
+            # the summaries are more specific than the extensions
+            types[name] = summary_type
+            if summary_type == StacSchema.CATEGORY:
+                categories[name] = list(summary)
+        return StacSchema(
+            types, categories, list(collection.get("item_assets", dict()))
+        )
+
+    @staticmethod
+    def from_items(features: List[Dict]) -> "StacSchema":
+        """Schema of the collection of the items, found by their
+        collection link, and of the extensions they declare."""
+        collection: Optional[Dict] = None
+        extensions: List[str] = list()
+        for feature in features:
+            extensions += feature.get("stac_extensions", list())
+        if StacSchema._fetch_enabled():
+            for feature in features[:1]:
+                for link in feature.get("links", list()):
+                    if link.get("rel") == "collection" and "href" in link:
+                        collection = StacSchema._fetch(link["href"])
+                        break
+        return StacSchema.from_collection(collection, extensions)
+
+    def _cast(self, values: pd.Series, name: str) -> pd.Series:
+        column_type: Optional[str] = self.types.get(name)
+        if column_type in [StacSchema.NUMBER, StacSchema.INTEGER]:
+            values = pd.to_numeric(values, errors="coerce")
+            if column_type == StacSchema.INTEGER:
+                values = values.astype("Int64")
+        elif column_type == StacSchema.BOOLEAN:
+            values = values.astype("boolean")
+        elif column_type == StacSchema.DATETIME:
+            values = pd.to_datetime(values, utc=True, errors="coerce")
+        elif column_type == StacSchema.CATEGORY and not any(
+            isinstance(value, (list, dict)) for value in values
+        ):
+            categories: List = list(
+                dict.fromkeys(
+                    self.categories.get(name, list())
+                    + sorted(values.dropna().unique().tolist())
+                )
+            )
+            values = values.astype(pd.CategoricalDtype(categories))
+        return values
+
+    def columns(
+        self,
+        data: gpd.GeoDataFrame,
+        features: List[Dict],
+        columns: Optional[List[str]] = None,
+    ) -> gpd.GeoDataFrame:
+        """Types the columns of the properties of data and creates, in one
+        pass over features, the columns of the hashtags and of the asset
+        hrefs; only the ones in columns when columns is given.
+
+        The values of a hashtag key that is also a property are appended
+        to the property, the items without the hashtag keeping their
+        property."""
+        wanted: Optional[set] = None if columns is None else set(columns)
+        for name in data.columns:
+            # the datetime index is parsed by Temporal
+            if name in self.types and name != "datetime":
+                data[name] = self._cast(data[name], name)
+
+        tags: Dict[str, List] = dict()
+        hrefs: Dict[str, List] = {
+            name: [None] * len(features)
+            for name in self.assets
+            if wanted is None or name in wanted
+        }
+        for position, feature in enumerate(features):
+            properties: Dict = feature.get("properties") or dict()
+            for tag in properties.get("hashtags") or list():
+                key, value = tag.split(":", maxsplit=1)
+                if wanted is not None and key not in wanted:
+                    continue
+                values: Optional[List] = tags.get(key)
+                if values is None:
+                    # the column starts with the property of the same name
+                    values = [
+                        (other.get("properties") or dict()).get(key)
+                        for other in features
+                    ]
+                    tags[key] = values
+                # duplicated keys are concatenated
+                values[position] = (
+                    value
+                    if values[position] is None
+                    else f"{values[position]},{value}"
+                )
+            for name, asset in (feature.get("assets") or dict()).items():
+                if wanted is not None and name not in wanted:
+                    continue
+                hrefs.setdefault(name, [None] * len(features))[
+                    position
+                ] = asset.get("href")
+
+        new_columns: Dict[str, List] = dict(tags)
+        new_columns.update(hrefs)
+        if len(new_columns) == 0:
+            return data
+        new_frame: pd.DataFrame = pd.DataFrame(
+            {
+                name: self._cast(
+                    pd.Series(values, index=data.index, dtype=object), name
+                )
+                for name, values in new_columns.items()
+            },
+            index=data.index,
+        )
+        # the asset hrefs replace the properties of the same name
+        return pd.concat(
+            [data.drop(columns=list(new_columns), errors="ignore"), new_frame],
+            axis=1,
+        )
+
+    def categorize(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Casts back to categories the categorical columns of pages
+        concatenated with different categories."""
+        for name, column_type in self.types.items():
+            if (
+                column_type == StacSchema.CATEGORY
+                and name in data.columns
+                and not isinstance(data[name].dtype, pd.CategoricalDtype)
+            ):
+                data[name] = self._cast(data[name], name)
+        return data
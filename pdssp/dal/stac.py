@@ -3,16 +3,26 @@ import logging
 import ssl
 from enum import Enum
 from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import Union
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
-import requests
-import swifter
 from requests.models import PreparedRequest
 
+from ..analysis import Temporal
+from ..metrics import MetricsRegistry
+from ..monitoring import UtilsMonitoring
+from ..tracing import Tracer
+from .download import AssetDownloader
+from .raster import RasterReader
+from .schema import StacSchema
+from .transport import Transport
+
 JSON = Union[None, bool, str, float, int, List["JSON"], Dict[str, "JSON"]]
 
 logger = logging.getLogger(__name__)
@@ -26,50 +36,143 @@ class StacEnum(Enum):
 
 
 class StacItem:
-    def __init__(self, url: str, max_records: int = None):
+
+    # sends the fields extension parameter when the columns are projected,
+    # the servers without the extension ignore it
+    FIELDS_EXTENSION = True
+
+    # columns always loaded
+    REQUIRED_COLUMNS = ["datetime", "geometry", "heatmap"]
+
+    def __init__(
+        self,
+        url: str,
+        max_records: int = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        columns: Optional[List[str]] = None,
+    ):
         self.__url: str = url
+        self.__bbox: Optional[Tuple[float, float, float, float]] = bbox
+        self.__columns: Optional[List[str]] = (
+            None if columns is None else list(columns)
+        )
         self.__url = self._add_limit_results()
-        self.__data: gpd.GeoDataFrame
+        self.__data: Optional[gpd.GeoDataFrame] = None
         self.__max_records: Optional[int] = max_records
-        self._load()
+        self.__schema: Optional[StacSchema] = None
 
     def _add_limit_results(self, max_results: int = 500) -> str:
-        params = {"limit": max_results}
+        params: Dict[str, Union[int, str]] = {"limit": max_results}
+        if self.__bbox is not None:
+            params["bbox"] = ",".join(str(value) for value in self.__bbox)
+        if self.columns is not None and StacItem.FIELDS_EXTENSION:
+            params["fields"] = ",".join(self._fields())
         req = PreparedRequest()
         req.prepare_url(self.url, params)
         if req.url is None:
             raise ValueError(f"The URL {self.url} is not valid")
         return req.url
 
-    def _load(self) -> None:
-        pages: List[gpd.GeoDataFrame] = list()
+    def _fields(self) -> List[str]:
+        """Fields of the items returned by a server with the fields
+        extension: a requested column can be a property, a hashtag or an
+        asset."""
+        fields: List[str] = [
+            "id",
+            "geometry",
+            "links",
+            "stac_extensions",
+            "properties.datetime",
+            "properties.hashtags",
+        ]
+        for name in self.columns or list():
+            if name == "assets":
+                fields.append("assets")
+            elif name not in StacItem.REQUIRED_COLUMNS:
+                fields += [f"properties.{name}", f"assets.{name}"]
+        return fields
+
+    def _project(self, features: List[Dict]) -> List[Dict]:
+        """Features without the properties and the assets that are not
+        requested; the hashtags are kept to create the requested ones."""
+        if self.columns is None:
+            return features
+        wanted: set = set(self.columns) | {"datetime", "hashtags"}
+        all_assets: bool = "assets" in wanted
+        projected: List[Dict] = list()
+        for feature in features:
+            properties: Dict = feature.get("properties") or dict()
+            feature = dict(feature)
+            feature["properties"] = {
+                name: value
+                for name, value in properties.items()
+                if name in wanted
+            }
+            if not all_assets and "assets" in feature:
+                feature["assets"] = {
+                    name: asset
+                    for name, asset in (feature["assets"] or dict()).items()
+                    if name in wanted
+                }
+            projected.append(feature)
+        return projected
+
+    def _select(self, data: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        if self.columns is None:
+            return data
+        wanted: set = set(self.columns) | set(StacItem.REQUIRED_COLUMNS)
+        return data[[name for name in data.columns if name in wanted]]
+
+    def pages(self) -> Iterator[gpd.GeoDataFrame]:
+        """Fetches the pages of the collection one after the other.
+
+        Returns:
+            Iterator[gpd.GeoDataFrame]: the items of each page, with the
+            columns created and indexed by datetime
+        """
+        tracer: Tracer = Tracer.get_instance()
         current_nb_records: int = 0
-        self._get_next_page(self.url, pages, current_nb_records)
-        self.__data = pd.concat(pages, ignore_index=True)
-        self.__data = self.__data.iloc[0 : self.max_records]
-        self.__data = self.__data.swifter.apply(self._create_columns, axis=1)
-        self.__data.set_index("datetime", inplace=True)
-        self.__data.sort_index(inplace=True)
-
-    def _parse_hastags(self, row) -> None:
-        if "hashtags" not in row:
-            return
-        tags = row["hashtags"]
-        for tag in tags:
-            (key, value) = tag.split(":", maxsplit=1)
-            row[key] = value if key not in row else row[key] + "," + value
-
-    def _parse_assets(self, row: gpd.GeoSeries) -> None:
-        if "assets" not in row:
-            return
-        assets = row["assets"]
-        for key in assets.keys():
-            row[key] = assets[key]["href"]
-
-    def _create_columns(self, row: gpd.GeoSeries) -> gpd.GeoSeries:
-        self._parse_hastags(row)
-        self._parse_assets(row)
-        return row
+        page: int = 0
+        next_url: Union[None, str] = self.url
+        while next_url is not None and not self._has_reach_max_records(
+            current_nb_records
+        ):
+            logger.debug(next_url)
+            with tracer.span("stac.page", url=next_url, page=page):
+                gdf, data_json = self._get_page(next_url)
+            if self.max_records is not None:
+                gdf = gdf.iloc[0 : self.max_records - current_nb_records]
+            current_nb_records += gdf.shape[0]
+            page += 1
+            next_url = self._get_next_url(data_json)
+            if gdf.shape[0] == 0:
+                continue
+            features: List[Dict] = data_json["features"][: gdf.shape[0]]
+            if self.__schema is None:
+                self.__schema = StacSchema.from_items(features)
+            with tracer.span("stac.columns", rows=gdf.shape[0]):
+                gdf = self.__schema.columns(gdf, features, self.columns)
+            Temporal.parse(gdf, "datetime")
+            gdf.set_index("datetime", inplace=True)
+            yield self._select(gdf)
+
+    @UtilsMonitoring.metric
+    def _load(self) -> None:
+        tracer: Tracer = Tracer.get_instance()
+        pages: List[gpd.GeoDataFrame] = list(self.pages())
+        with tracer.span("stac.concat", pages=len(pages)) as span:
+            self.__data = (
+                pd.concat(pages)
+                if len(pages) > 0
+                else gpd.GeoDataFrame(
+                    index=pd.DatetimeIndex([], name="datetime", tz="UTC")
+                )
+            )
+            span.set_attribute("rows", self.__data.shape[0])
+        if self.__schema is not None and len(pages) > 1:
+            self.__data = self.__schema.categorize(self.__data)
+        with tracer.span("stac.index", rows=self.__data.shape[0]):
+            self.__data.sort_index(inplace=True, na_position="last")
 
     def _has_reach_max_records(self, current_nb_records: int) -> bool:
         if self.max_records is None:
@@ -94,35 +197,27 @@ class StacItem:
                 break
         return heatmap_url
 
-    def _go_to_next_page(
-        self,
-        data_json: JSON,
-        pages: List[gpd.GeoDataFrame],
-        new_nb_records: int,
-    ) -> None:
-        next_url: Union[None, str] = self._get_next_url(data_json)
-        if next_url is not None and not self._has_reach_max_records(
-            new_nb_records
-        ):
-            logger.debug(next_url)
-            self._get_next_page(next_url, pages, new_nb_records)
-
-    def _get_next_page(
-        self, url: str, pages: List[gpd.GeoDataFrame], current_nb_records: int
-    ) -> None:
-        data = requests.get(url)
-        data_json = data.json()
-        gdf: gpd.GeoDataFrame = gpd.GeoDataFrame.from_features(
-            data_json["features"]
+    @UtilsMonitoring.metric
+    def _get_page(self, url: str) -> Tuple[gpd.GeoDataFrame, JSON]:
+        tracer: Tracer = Tracer.get_instance()
+        with tracer.span("stac.page.fetch", url=url) as span:
+            data = Transport.get_instance().get(url)
+            span.set_attribute("bytes", len(data.content))
+        with tracer.span("stac.page.decode", url=url) as span:
+            data_json = data.json()
+            features: List[Dict] = self._project(data_json["features"])
+            data_json["features"] = features
+            gdf: gpd.GeoDataFrame = gpd.GeoDataFrame.from_features(features)
+            if (self.columns is None or "assets" in self.columns) and any(
+                "assets" in feature for feature in features
+            ):
+                gdf["assets"] = [feature.get("assets") for feature in features]
+            gdf["heatmap"] = self._get_heatmap_url(data_json)
+            span.set_attribute("rows", gdf.shape[0])
+        MetricsRegistry.get_instance().counter("stac_records_total").inc(
+            gdf.shape[0]
         )
-        gdf_tmp: gpd.GeoDataFrame = gpd.GeoDataFrame(data_json["features"])
-        if "assets" in gdf_tmp.columns:
-            gdf["assets"] = gdf_tmp["assets"]
-        gdf["heatmap"] = self._get_heatmap_url(data_json)
-        nb_records: int = gdf.shape[0]
-        new_nb_records: int = current_nb_records + nb_records
-        pages.append(gdf)
-        self._go_to_next_page(data_json, pages, new_nb_records)
+        return gdf, data_json
 
     @property
     def url(self) -> str:
@@ -130,24 +225,77 @@ class StacItem:
 
     @property
     def data(self) -> gpd.GeoDataFrame:
+        if self.__data is None:
+            self._load()
         return self.__data
 
+    @property
+    def schema(self) -> Optional[StacSchema]:
+        """Schema of the items, known once the first page is fetched."""
+        return self.__schema
+
     @property
     def max_records(self) -> Union[None, int]:
         return self.__max_records
 
+    @property
+    def columns(self) -> Optional[List[str]]:
+        """Columns to load, all of them when None."""
+        return self.__columns
+
     def number_records(self) -> int:
         return self.data.size[0]
 
 
 class Stac:
     @staticmethod
+    @UtilsMonitoring.metric
     def load(
-        type: StacEnum, url: str, max_records: int = None
+        type: StacEnum,
+        url: str,
+        max_records: int = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        columns: Optional[List[str]] = None,
     ) -> gpd.GeoDataFrame:
+        """Loads the items; with columns, only these columns are decoded,
+        in addition to the datetime index, the geometry and the heatmap."""
         data: gpd.GeoDataFrame
         if type == StacEnum.ITEM:
-            data = StacItem(url, max_records).data
+            data = StacItem(url, max_records, bbox, columns).data
         else:
             raise NotImplementedError("Type of StacEnum not implemented")
         return data
+
+    @staticmethod
+    def iter_pages(
+        type: StacEnum,
+        url: str,
+        max_records: int = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Iterator[gpd.GeoDataFrame]:
+        """Fetches the items page by page, without keeping the previous
+        pages in memory."""
+        if type != StacEnum.ITEM:
+            raise NotImplementedError("Type of StacEnum not implemented")
+        return StacItem(url, max_records, bbox, columns).pages()
+
+    @staticmethod
+    def download(
+        data: gpd.GeoDataFrame,
+        directory: str,
+        assets: Optional[List[str]] = None,
+        max_workers: int = 8,
+    ) -> pd.DataFrame:
+        downloader = AssetDownloader(directory, max_workers=max_workers)
+        return downloader.download_assets(data, assets)
+
+    @staticmethod
+    def read_window(
+        href: str,
+        window: Optional[Tuple[int, int, int, int]] = None,
+        overview: Optional[int] = None,
+        bands: Optional[List[int]] = None,
+        downloader: Optional[AssetDownloader] = None,
+    ) -> Tuple[np.ndarray, Tuple[float, ...]]:
+        return RasterReader(downloader).read(href, window, overview, bands)
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+import configparser
+import logging
+import os
+import threading
+import time
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .._version import __name_soft__
+from .._version import __version__
+from ..metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class Transport:
+    """HTTP transport shared by the data access layer.
+
+    A pooled session is kept by host so that TCP and TLS connections are
+    reused between the pages of a request. The transport negotiates
+    compressed responses, applies the timeouts, retries and proxies of the
+    configuration and records the latency and the volume of each request.
+    """
+
+    SECTION = "transport"
+    PATH_TO_CONF = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)),
+        os.pardir,
+        "conf",
+        "pdssp.conf",
+    )
+
+    __instance: Optional["Transport"] = None
+    __instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        connect_timeout: float = 10,
+        read_timeout: float = 60,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        compression: bool = True,
+        verify: bool = True,
+        proxies: Optional[Dict[str, str]] = None,
+    ):
+        self.__timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.__pool_connections: int = pool_connections
+        self.__pool_maxsize: int = pool_maxsize
+        self.__retry: Retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "HEAD"],
+            raise_on_status=False,
+        )
+        self.__verify: bool = verify
+        self.__proxies: Dict[str, str] = proxies if proxies else dict()
+        self.__headers: Dict[str, str] = {
+            "User-Agent": f"{__name_soft__}/{__version__}",
+            "Accept-Encoding": Transport._accept_encoding(compression),
+        }
+        self.__sessions: Dict[str, requests.Session] = dict()
+        self.__lock = threading.Lock()
+        self.__metrics: Dict[str, Dict[str, float]] = dict()
+
+    @staticmethod
+    def _accept_encoding(compression: bool) -> str:
+        if not compression:
+            return "identity"
+        try:
+            import brotli  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+
+            return "gzip, deflate, br"
+        except ImportError:
+            return "gzip, deflate"
+
+    @staticmethod
+    def from_config(path_to_conf: str = PATH_TO_CONF) -> "Transport":
+        """Creates a transport from the [transport] section of a
+        configuration file.
+
+        Args:
+            path_to_conf (str, optional): configuration file. Defaults to
+                the pdssp.conf of the package.
+
+        Returns:
+            Transport: the transport
+        """
+        config = configparser.ConfigParser()
+        config.read(path_to_conf)
+        if not config.has_section(Transport.SECTION):
+            return Transport()
+        section = config[Transport.SECTION]
+        proxies: Dict[str, str] = {
+            key: section[option]
+            for key, option in [
+                ("http", "http_proxy"),
+                ("https", "https_proxy"),
+                ("no_proxy", "no_proxy"),
+            ]
+            if section.get(option)
+        }
+        return Transport(
+            connect_timeout=section.getfloat("connect_timeout", 10),
+            read_timeout=section.getfloat("read_timeout", 60),
+            pool_connections=section.getint("pool_connections", 10),
+            pool_maxsize=section.getint("pool_maxsize", 10),
+            max_retries=section.getint("max_retries", 3),
+            backoff_factor=section.getfloat("backoff_factor", 0.5),
+            compression=section.getboolean("compression", True),
+            verify=section.getboolean("verify", True),
+            proxies=proxies,
+        )
+
+    @staticmethod
+    def get_instance() -> "Transport":
+        """Returns the transport shared by the data access layer, created
+        from the configuration file of the package."""
+        with Transport.__instance_lock:
+            if Transport.__instance is None:
+                Transport.__instance = Transport.from_config()
+            return Transport.__instance
+
+    @staticmethod
+    def set_instance(transport: Optional["Transport"]) -> None:
+        """Replaces the shared transport."""
+        with Transport.__instance_lock:
+            Transport.__instance = transport
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return self.__timeout
+
+    @property
+    def proxies(self) -> Dict[str, str]:
+        return self.__proxies
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return self.__headers
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.__pool_connections,
+            pool_maxsize=self.__pool_maxsize,
+            max_retries=self.__retry,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(self.headers)
+        session.proxies.update(self.proxies)
+        session.verify = self.__verify
+        return session
+
+    def session(self, url: str) -> requests.Session:
+        """Returns the pooled session of the host of url."""
+        host: str = urlparse(url).netloc
+        with self.__lock:
+            if host not in self.__sessions:
+                self.__sessions[host] = self._create_session()
+            return self.__sessions[host]
+
+    def _record(self, url: str, elapsed: float, nb_bytes: int, error: bool):
+        host: str = urlparse(url).netloc
+        with self.__lock:
+            metrics = self.__metrics.setdefault(
+                host,
+                {"requests": 0, "errors": 0, "bytes": 0, "elapsed_ms": 0.0},
+            )
+            metrics["requests"] += 1
+            metrics["errors"] += int(error)
+            metrics["bytes"] += nb_bytes
+            metrics["elapsed_ms"] += elapsed * 1000
+        registry = MetricsRegistry.get_instance()
+        registry.histogram("http_request_duration_seconds", host=host).observe(
+            elapsed
+        )
+        registry.counter("http_response_bytes_total", host=host).inc(nb_bytes)
+        if error:
+            registry.counter("http_errors_total", host=host).inc()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Sends a GET request through the pooled session of the host.
+
+        Args:
+            url (str): URL
+            **kwargs: parameters of requests.get
+
+        Returns:
+            requests.Response: the response
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        start_time: float = time.perf_counter()
+        try:
+            response = self.session(url).get(url, **kwargs)
+        except requests.exceptions.RequestException:
+            self._record(url, time.perf_counter() - start_time, 0, True)
+            raise
+        if kwargs.get("stream", False):
+            nb_bytes = int(response.headers.get("Content-Length", 0))
+        else:
+            # bytes read on the wire, before decompression
+            nb_bytes = response.raw.tell() or len(response.content)
+        elapsed: float = time.perf_counter() - start_time
+        self._record(url, elapsed, nb_bytes, not response.ok)
+        logger.debug(
+            f"GET {response.url} {response.status_code} - {nb_bytes} bytes in {elapsed * 1000:.1f} ms"
+        )
+        return response
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Returns the number of requests, errors, bytes and the
+        cumulated latency by host."""
+        with self.__lock:
+            return {
+                host: dict(value) for host, value in self.__metrics.items()
+            }
+
+    def gdal_options(self) -> Dict[str, str]:
+        """Returns the GDAL configuration options matching the transport,
+        for the requests done by GDAL itself."""
+        options: Dict[str, str] = {
+            "GDAL_HTTP_CONNECTTIMEOUT": str(int(self.timeout[0])),
+            "GDAL_HTTP_TIMEOUT": str(int(self.timeout[1])),
+            "GDAL_HTTP_USERAGENT": self.headers["User-Agent"],
+        }
+        proxy: Optional[str] = self.proxies.get("https") or self.proxies.get(
+            "http"
+        )
+        if proxy:
+            options["GDAL_HTTP_PROXY"] = proxy
+        if not self.__verify:
+            options["GDAL_HTTP_UNSAFESSL"] = "YES"
+        return options
@@ -4,5 +4,13 @@ from .interface import WMSLayer
 from .interface import WMTSLayer
 from .surface import PluginVisu
 from .surface import Surface
+from .tiles import TileServer
 
-__all__ = ["PluginVisu", "WMSLayer", "WMTSLayer", "GeoJSONLayer", "Surface"]
+__all__ = [
+    "PluginVisu",
+    "WMSLayer",
+    "WMTSLayer",
+    "GeoJSONLayer",
+    "Surface",
+    "TileServer",
+]
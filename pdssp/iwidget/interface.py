@@ -32,9 +32,18 @@ class ISurface(ABC):
     def add_layer(self, layer):
         raise NotImplementedError("Not implemented")
 
+    def add_layers(self, layers):
+        raise NotImplementedError("Not implemented")
+
+    def replace_layer(self, layer) -> bool:
+        raise NotImplementedError("Not implemented")
+
     def remove_layer(self, rm_layer) -> bool:
         raise NotImplementedError("Not implemented")
 
+    def remove_layers(self, layer_names) -> bool:
+        raise NotImplementedError("Not implemented")
+
     def clear_layers(self):
         raise NotImplementedError("Not implemented")
 
@@ -47,6 +56,16 @@ class ISurface(ABC):
     def highlight(self, json_geometry=None, color=[1, 0, 0, 1]):
         raise NotImplementedError("Not implemented")
 
+    def update_layer(
+        self, layer_name, data=None, style=None, visible=None
+    ) -> bool:
+        raise NotImplementedError("Not implemented")
+
+    def update_features(
+        self, layer_name, added=(), removed=(), style=None
+    ) -> bool:
+        raise NotImplementedError("Not implemented")
+
 
 @dataclass
 class GeoJSONLayer:
@@ -1,12 +1,18 @@
 # -*- coding: utf-8 -*-
+import logging
+from typing import Any
 from typing import cast
 from typing import Dict
+from typing import Iterable
 from typing import List
+from typing import Optional
+from typing import Set
 from typing import Union
 
 import geopandas as gpd
 import ipymizar
 
+from ..tracing import Tracer
 from .interface import GeoJSONLayer
 from .interface import ISurface
 from .interface import WMSLayer
@@ -14,6 +20,8 @@ from .interface import WMTSLayer
 
 JSON = Union[None, bool, str, float, int, List["JSON"], Dict[str, "JSON"]]
 
+logger = logging.getLogger(__name__)
+
 
 class _MizarLayerFactory:
     @staticmethod
@@ -80,6 +88,22 @@ class Mizar(ISurface):
             crs=ipymizar.CRS.WGS84
         )
         self._is_highlight: bool = False
+        # ipymizar layers by name
+        self._layers: Dict[str, Any] = dict()
+        # features displayed in the GeoJSON layers created from data, by id
+        self._features: Dict[str, Dict[str, Dict]] = dict()
+        # last id given to a feature without id
+        self._last_id: int = 0
+
+    def _feature_id(self, feature: Dict) -> str:
+        """Id of a feature, a new one for the features without id."""
+        if "id" in feature:
+            return str(feature["id"])
+        self._last_id += 1
+        return f"_{self._last_id}"
+
+    def _index_features(self, features: Iterable[Dict]) -> Dict[str, Dict]:
+        return {self._feature_id(feature): feature for feature in features}
 
     def _computer_center_and_zoom(
         self, layer: Union[WMSLayer, GeoJSONLayer, WMTSLayer], center: bool
@@ -92,7 +116,40 @@ class Mizar(ISurface):
         gdf: gpd.GeoDataFrame = gpd.GeoDataFrame.from_features(
             data["features"]
         )
-        min_lon, min_lat, max_lon, max_lat = gdf.total_bounds
+        self.center_on(gdf.total_bounds)
+
+    def _find_layer(self, layer_name: str):
+        return self._layers.get(layer_name)
+
+    def _add_layer(
+        self, layer: Union[WMSLayer, GeoJSONLayer, WMTSLayer]
+    ) -> None:
+        if layer.name in self._layers:
+            logger.warning(f"{layer.name} already exists, it is replaced")
+            self._remove_layer(layer.name)
+        layer_to_add: Union[WMSLayer, GeoJSONLayer, WMTSLayer]
+        layer_to_add = _MizarLayerFactory.create(layer)
+        self.planet.add_layer(layer_to_add)
+        self._layers[layer.name] = layer_to_add
+        if isinstance(layer, GeoJSONLayer) and layer.data is not None:
+            self._features[layer.name] = self._index_features(
+                layer.data["features"]
+            )
+
+    def _remove_layer(self, layer_name: str) -> bool:
+        layer = self._layers.pop(layer_name, None)
+        if layer is None:
+            return False
+        self.planet.remove_layer(layer)
+        self._features.pop(layer_name, None)
+        if layer_name == "highlight":
+            self._is_highlight = False
+        return True
+
+    def center_on(self, bounds) -> None:
+        """Zooms on the center of bounds (min_lon, min_lat, max_lon,
+        max_lat)."""
+        min_lon, min_lat, max_lon, max_lat = bounds
         center_lat: float = 0.5 * (min_lat + max_lat)
 
         if (max_lon - min_lon) > 180:
@@ -102,34 +159,193 @@ class Mizar(ISurface):
 
         self.zoom_to([center_lon, center_lat])
 
+    @staticmethod
+    def extent_of(bounds) -> float:
+        """Largest side, in degrees, of bounds (min_lon, min_lat, max_lon,
+        max_lat), crossing the antimeridian when it is shorter."""
+        min_lon, min_lat, max_lon, max_lat = bounds
+        width: float = max_lon - min_lon
+        if width > 180:
+            width = 360 - width
+        return max(width, max_lat - min_lat)
+
+    def has_layer(self, layer_name: str) -> bool:
+        return self._find_layer(layer_name) is not None
+
+    def feature_ids(self, layer_name: str) -> Set[str]:
+        """Ids of the features displayed in a GeoJSON layer created from
+        data, empty for the other layers."""
+        return set(self._features.get(layer_name, dict()))
+
     def add_layer(
         self,
         layer: Union[WMSLayer, GeoJSONLayer, WMTSLayer],
         center: bool = False,
     ) -> None:
-        layer_to_add: Union[WMSLayer, GeoJSONLayer, WMTSLayer]
-        layer_to_add = _MizarLayerFactory.create(layer)
-        self.planet.add_layer(layer_to_add)
+        with Tracer.get_instance().span("mizar.add_layer", layer=layer.name):
+            self._add_layer(layer)
+            self._computer_center_and_zoom(layer, center)
+
+    def add_layers(
+        self, layers: List[Union[WMSLayer, GeoJSONLayer, WMTSLayer]]
+    ) -> None:
+        """Adds several layers with one synchronization of the widget."""
+        with Tracer.get_instance().span(
+            "mizar.add_layers", layers=len(layers)
+        ), self.planet.hold_sync():
+            for layer in layers:
+                self._add_layer(layer)
+
+    def replace_layer(
+        self,
+        layer: Union[WMSLayer, GeoJSONLayer, WMTSLayer],
+        center: bool = False,
+    ) -> bool:
+        """Replaces the layer having the name of layer, or adds it, with one
+        synchronization of the widget.
+
+        Returns True when a layer has been replaced.
+        """
+        with Tracer.get_instance().span(
+            "mizar.replace_layer", layer=layer.name
+        ), self.planet.hold_sync():
+            is_replaced: bool = self._remove_layer(layer.name)
+            self._add_layer(layer)
         self._computer_center_and_zoom(layer, center)
+        return is_replaced
+
+    def update_layer(
+        self,
+        layer_name: str,
+        data: Optional[Dict] = None,
+        style: Optional[Dict] = None,
+        visible: Optional[bool] = None,
+    ) -> bool:
+        """Replaces the data, the style and/or the visibility of a layer in
+        place, without creating a new widget.
+
+        Returns False when the layer does not exist.
+        """
+        layer = self._find_layer(layer_name)
+        if layer is None:
+            return False
+        with Tracer.get_instance().span(
+            "mizar.update_layer", layer=layer_name
+        ), layer.hold_sync():
+            if style is not None and style != layer.style:
+                layer.style = style
+            if visible is not None and visible != layer.visible:
+                layer.visible = visible
+            if data is not None:
+                layer.data = data
+                self._features[layer_name] = self._index_features(
+                    data["features"]
+                )
+        return True
+
+    def update_features(
+        self,
+        layer_name: str,
+        added: Iterable[Dict] = (),
+        removed: Iterable[str] = (),
+        style: Optional[Dict] = None,
+    ) -> bool:
+        """Adds and removes features of a GeoJSON layer in place.
+
+        The features of the layer are kept by id on the Python side, so
+        that the displayed features are not serialized again. ipymizar
+        layers have no incremental update: the whole data of the layer is
+        still sent, once, and nothing is sent when no feature is added or
+        removed. A feature added with the id of a displayed feature
+        replaces it.
+
+        Returns False when the layer does not exist.
+        """
+        layer = self._find_layer(layer_name)
+        if layer is None:
+            return False
+        added = list(added)
+        removed = [str(feature_id) for feature_id in removed]
+        features: Dict[str, Dict] = self._features.setdefault(
+            layer_name, dict()
+        )
+        for feature_id in removed:
+            features.pop(feature_id, None)
+        features.update(self._index_features(added))
+        with Tracer.get_instance().span(
+            "mizar.update_features",
+            layer=layer_name,
+            added=len(added),
+            removed=len(removed),
+        ), layer.hold_sync():
+            if style is not None and style != layer.style:
+                layer.style = style
+            if len(added) > 0 or len(removed) > 0:
+                layer.data = {
+                    "type": "FeatureCollection",
+                    "features": list(features.values()),
+                }
+        return True
+
+    def replace_features(
+        self,
+        layer_name: str,
+        features: List[Dict],
+        style: Optional[Dict] = None,
+    ) -> bool:
+        """Displays features in a GeoJSON layer, adding the features whose
+        id is not displayed yet and removing the ids that are not in
+        features; the layer is not updated when they are the same. The
+        features without id or with duplicated ids replace the data.
+
+        Returns False when the layer does not exist.
+        """
+        has_ids: bool = all("id" in feature for feature in features)
+        ids: List[str] = [str(feature.get("id")) for feature in features]
+        if not has_ids or len(set(ids)) != len(ids):
+            return self.update_layer(
+                layer_name,
+                data={"type": "FeatureCollection", "features": features},
+                style=style,
+            )
+        displayed: Set[str] = self.feature_ids(layer_name)
+        return self.update_features(
+            layer_name,
+            added=[
+                feature
+                for feature_id, feature in zip(ids, features)
+                if feature_id not in displayed
+            ],
+            removed=displayed.difference(ids),
+            style=style,
+        )
 
     def remove_layer(self, layer_name) -> bool:
-        is_removed: bool
-        layer_find = None
-        for layer in self.planet.layers:
-            if layer.name == layer_name:
-                layer_find = layer
-                break
-
-        if layer_find is None:
-            is_removed = False
-            print(f"Cannot find {layer_name}")
-        else:
-            is_removed = True
-            self.planet.remove_layer(layer_find)
+        is_removed: bool = self._remove_layer(layer_name)
+        if not is_removed:
+            logger.warning(f"Cannot find {layer_name}")
+        return is_removed
+
+    def remove_layers(self, layer_names: List[str]) -> bool:
+        """Removes several layers with one synchronization of the widget.
+
+        Returns False when one of the layers cannot be found.
+        """
+        is_removed: bool = True
+        with Tracer.get_instance().span(
+            "mizar.remove_layers", layers=len(layer_names)
+        ), self.planet.hold_sync():
+            for layer_name in layer_names:
+                if not self._remove_layer(layer_name):
+                    logger.warning(f"Cannot find {layer_name}")
+                    is_removed = False
         return is_removed
 
     def clear_layers(self) -> None:
         self.planet.clear_layers()
+        self._layers.clear()
+        self._features.clear()
+        self._is_highlight = False
 
     def zoom_to(self, center, **kwargs) -> None:
         self.planet.zoom_to(center, **kwargs)
@@ -138,15 +354,24 @@ class Mizar(ISurface):
         return self.planet
 
     def highlight(self, json_geometry=None, color=[1, 0, 0, 1]) -> None:
-        if self._is_highlight:
-            self.remove_layer("highlight")
-            self._is_highlight = False
+        if json_geometry is None:
+            if self._is_highlight:
+                self.remove_layer("highlight")
+            return
 
-        if json_geometry is not None:
+        style = {"strokeColor": color, "strokeWidth": 5, "zIndex": 31}
+        # the highlight layer is reused and updated only when its features
+        # change
+        if not (
+            self._is_highlight
+            and self.replace_features(
+                "highlight", json_geometry["features"], style
+            )
+        ):
             geojson = GeoJSONLayer(
                 name="highlight",
                 data=json_geometry,
-                style={"strokeColor": color, "strokeWidth": 5, "zIndex": 31},
+                style=style,
             )
             self.add_layer(geojson)
             self._is_highlight = True
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""Local server of vector tiles generated from a GeoDataFrame.
+
+The tiles are in the geographic grid used by Mizar: the level z has
+2^(z+1) columns and 2^z rows of 180 / 2^z degrees, the tile (0, 0) being
+at the north-west corner (-180, 90). Only the requested tiles are
+computed, from the spatial index of the data, and the last ones are kept
+in an LRU cache.
+"""
+import configparser
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from ..analysis import LevelOfDetail
+from .interface import GeoJSONLayer
+
+logger = logging.getLogger(__name__)
+
+
+class TileCache:
+    """LRU cache of the encoded tiles."""
+
+    def __init__(self, max_size: int = 1024):
+        self.__max_size: int = max_size
+        self.__tiles: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits: int = 0
+        self.__misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self.__lock:
+            tile: Optional[bytes] = self.__tiles.get(key)
+            if tile is None:
+                self.__misses += 1
+            else:
+                self.__hits += 1
+                self.__tiles.move_to_end(key)
+            return tile
+
+    def put(self, key: Tuple, tile: bytes) -> None:
+        with self.__lock:
+            self.__tiles[key] = tile
+            self.__tiles.move_to_end(key)
+            while len(self.__tiles) > self.__max_size:
+                self.__tiles.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__tiles.clear()
+
+    def __len__(self) -> int:
+        return len(self.__tiles)
+
+
+class VectorTiles:
+    """GeoJSON or MVT tiles of the footprints of a GeoDataFrame.
+
+    The MVT encoding needs the optional mapbox-vector-tile package.
+    """
+
+    # size of a tile, in pixels
+    TILE_SIZE = 256
+    # resolution of the MVT tiles
+    MVT_EXTENT = 4096
+    FORMATS = ["geojson", "mvt"]
+
+    def __init__(
+        self,
+        data: gpd.GeoDataFrame,
+        lod: Optional[LevelOfDetail] = None,
+        cache: Optional[TileCache] = None,
+    ):
+        self.__data: gpd.GeoDataFrame = data
+        self.__lod: LevelOfDetail = (
+            lod if lod is not None else LevelOfDetail(data.geometry)
+        )
+        self.__cache: TileCache = cache if cache is not None else TileCache()
+
+    @property
+    def data(self) -> gpd.GeoDataFrame:
+        return self.__data
+
+    @property
+    def cache(self) -> TileCache:
+        return self.__cache
+
+    @staticmethod
+    def bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+        """Bounds (min_lon, min_lat, max_lon, max_lat) of a tile."""
+        if z < 0 or not (0 <= x < 2 ** (z + 1) and 0 <= y < 2 ** z):
+            raise ValueError(f"No tile {z}/{x}/{y}")
+        size: float = 180 / 2 ** z
+        min_lon: float = -180 + x * size
+        max_lat: float = 90 - y * size
+        return min_lon, max_lat - size, min_lon + size, max_lat
+
+    def features(self, z: int, x: int, y: int) -> gpd.GeoDataFrame:
+        """Footprints intersecting a tile, simplified for its level."""
+        bounds = VectorTiles.bounds(z, x, y)
+        positions: np.ndarray = self.data.sindex.query(
+            shapely.box(*bounds), predicate="intersects"
+        )
+        selection: gpd.GeoDataFrame = self.data.iloc[np.sort(positions)]
+        # extent of the view in which the tile has its size in pixels
+        extent: float = (
+            (bounds[2] - bounds[0])
+            * LevelOfDetail.RESOLUTION
+            / VectorTiles.TILE_SIZE
+        )
+        _, selection = self.__lod.select(extent, selection)
+        return selection
+
+    def _encode_mvt(
+        self,
+        name: str,
+        features: gpd.GeoDataFrame,
+        bounds: Tuple[float, float, float, float],
+    ) -> bytes:
+        import mapbox_vector_tile  # pylint: disable=import-outside-toplevel
+
+        geometries: np.ndarray = shapely.clip_by_rect(
+            np.asarray(features.geometry.values, dtype=object), *bounds
+        )
+        return mapbox_vector_tile.encode(
+            [
+                {
+                    "name": name,
+                    "features": [
+                        {"geometry": geometry, "properties": {"id": str(idx)}}
+                        for idx, geometry in zip(features.index, geometries)
+                        if not geometry.is_empty
+                    ],
+                }
+            ],
+            default_options={
+                "quantize_bounds": bounds,
+                "extents": VectorTiles.MVT_EXTENT,
+            },
+        )
+
+    def tile(self, z: int, x: int, y: int, format: str = "geojson") -> bytes:
+        """Returns a tile encoded in format (geojson or mvt)."""
+        if format not in VectorTiles.FORMATS:
+            raise ValueError(f"Unknown tile format : {format}")
+        key: Tuple = (z, x, y, format)
+        tile: Optional[bytes] = self.cache.get(key)
+        if tile is not None:
+            return tile
+        features: gpd.GeoDataFrame = self.features(z, x, y)
+        if format == "geojson":
+            tile = features.to_json().encode("utf-8")
+        else:
+            tile = self._encode_mvt(
+                "footprints", features, VectorTiles.bounds(z, x, y)
+            )
+        logger.debug(
+            f"Tile {z}/{x}/{y}.{format} : {features.shape[0]} features, "
+            f"{len(tile)} bytes"
+        )
+        self.cache.put(key, tile)
+        return tile
+
+
+class _TileHandler(BaseHTTPRequestHandler):
+    """Serves /{name}/{z}/{x}/{y}.{format} from the tiles of the server."""
+
+    PATH = re.compile(r"^/([\w.-]+)/(\d+)/(\d+)/(\d+)\.(\w+)$")
+
+    def do_GET(self):
+        match = _TileHandler.PATH.match(self.path.split("?")[0])
+        tiles: Optional[VectorTiles] = (
+            None if match is None else self.server.tiles.get(match.group(1))
+        )
+        if tiles is None:
+            self.send_error(404)
+            return
+        z, x, y = (int(match.group(index)) for index in range(2, 5))
+        format: str = match.group(5)
+        try:
+            content: bytes = tiles.tile(z, x, y, format)
+        except ValueError as err:
+            self.send_error(404, str(err))
+            return
+        self.send_response(200)
+        self.send_header(
+            "Content-Type",
+            (
+                "application/geo+json"
+                if format == "geojson"
+                else "application/vnd.mapbox-vector-tile"
+            ),
+        )
+        self.send_header("Content-Length", str(len(content)))
+        # the notebook is served from another origin, which is the only
+        # one allowed to read the tiles
+        origin: Optional[str] = self.headers.get("Origin")
+        if origin is not None and TileServer.allows(
+            origin, self.server.origins
+        ):
+            self.send_header("Access-Control-Allow-Origin", origin)
+            self.send_header("Vary", "Origin")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class TileServer:
+    """Local HTTP server of the vector tiles of several datasets.
+
+    The server runs in a thread of the notebook kernel and is started on
+    the first registration. One instance is shared, see get_instance.
+    The tiles can be read from the pages of a local notebook (localhost,
+    any port) and from the origins of the [tiles] section of pdssp.conf.
+    """
+
+    SECTION = "tiles"
+    PATH_TO_CONF = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)),
+        os.pardir,
+        "conf",
+        "pdssp.conf",
+    )
+
+    # pages of a notebook served on the local host
+    LOCAL_ORIGIN = re.compile(
+        r"^https?://(localhost|127\.0\.0\.1|\[::1\])(:\d+)?$"
+    )
+
+    __instance: Optional["TileServer"] = None
+    __lock = threading.Lock()
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        origins: Optional[List[str]] = None,
+    ):
+        self.__host: str = host
+        self.__port: int = port
+        self.__origins: List[str] = list(origins or list())
+        self.__tiles: Dict[str, VectorTiles] = dict()
+        self.__server: Optional[ThreadingHTTPServer] = None
+
+    @staticmethod
+    def from_config(path_to_conf: str = PATH_TO_CONF) -> "TileServer":
+        """Creates a server from the [tiles] section of a configuration
+        file."""
+        config = configparser.ConfigParser()
+        config.read(path_to_conf)
+        if not config.has_section(TileServer.SECTION):
+            return TileServer()
+        section = config[TileServer.SECTION]
+        return TileServer(
+            origins=[
+                origin.strip()
+                for origin in section.get("origins", "").split(",")
+                if origin.strip()
+            ]
+        )
+
+    @staticmethod
+    def get_instance() -> "TileServer":
+        with TileServer.__lock:
+            if TileServer.__instance is None:
+                TileServer.__instance = TileServer.from_config()
+            return TileServer.__instance
+
+    @property
+    def origins(self) -> List[str]:
+        """Origins allowed to read the tiles besides the local ones."""
+        return self.__origins
+
+    @staticmethod
+    def allows(origin: str, origins: List[str]) -> bool:
+        """Whether the pages of origin can read the tiles."""
+        return (
+            TileServer.LOCAL_ORIGIN.match(origin) is not None
+            or origin in origins
+        )
+
+    @property
+    def url(self) -> str:
+        server: ThreadingHTTPServer = self.start()
+        host, port = server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.__tiles)
+
+    def start(self) -> ThreadingHTTPServer:
+        """Starts the server, once, and returns it."""
+        if self.__server is not None:
+            return self.__server
+        server = ThreadingHTTPServer((self.__host, self.__port), _TileHandler)
+        server.daemon_threads = True
+        server.tiles = self.__tiles  # type: ignore
+        server.origins = self.__origins  # type: ignore
+        threading.Thread(
+            target=server.serve_forever,
+            name="pdssp-tiles",
+            daemon=True,
+        ).start()
+        self.__server = server
+        logger.info(f"Tile server started on {self.url}")
+        return server
+
+    def stop(self) -> None:
+        if self.__server is None:
+            return
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__server = None
+
+    def register(
+        self,
+        name: str,
+        data: gpd.GeoDataFrame,
+        lod: Optional[LevelOfDetail] = None,
+    ) -> VectorTiles:
+        """Serves the tiles of data under name, replacing the previous
+        ones."""
+        tiles = VectorTiles(data, lod)
+        self.__tiles[name] = tiles
+        self.start()
+        return tiles
+
+    def unregister(self, name: str) -> bool:
+        return self.__tiles.pop(name, None) is not None
+
+    def url_template(self, name: str, format: str = "geojson") -> str:
+        """URL of the tiles of name, with {z}, {x} and {y} placeholders."""
+        if name not in self.__tiles:
+            raise ValueError(f"No tiles registered as {name}")
+        return f"{self.url}/{name}/{{z}}/{{x}}/{{y}}.{format}"
+
+    def layer(
+        self,
+        name: str,
+        style: Optional[Dict] = None,
+        format: str = "geojson",
+    ) -> GeoJSONLayer:
+        """GeoJSON layer reading the tiles of name.
+
+        Raises:
+            ValueError: format is not geojson, the MVT tiles cannot be read
+                by a GeoJSON layer
+        """
+        if format != "geojson":
+            raise ValueError(
+                f"A GeoJSON layer cannot read {format} tiles, use "
+                "url_template for them"
+            )
+        return GeoJSONLayer(
+            name=name,
+            url=self.url_template(name, format),
+            style=style,
+            background=False,
+        )
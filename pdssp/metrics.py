@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+# Data Access Layer for PDSP - Provides the data access layer for accessing to the data from PDSP
+# Copyright (C) 2021 - CNES (Jean-Christophe Malapert for Pôle Surfaces Planétaires)
+#
+# This file is part of Data Access Layer for PDSP.
+#
+# Data Access Layer for PDSP is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License v3  as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Data Access Layer for PDSP is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License v3  for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License v3
+# along with Data Access Layer for PDSP.  If not, see <https://www.gnu.org/licenses/>.
+"""In-process metrics: counters, gauges and histograms."""
+
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict
+from typing import FrozenSet
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+Labels = FrozenSet[Tuple[str, str]]
+
+
+class Counter:
+    """Monotonic counter."""
+
+    def __init__(self):
+        self.__value: float = 0
+        self.__lock = threading.Lock()
+
+    def inc(self, value: float = 1) -> None:
+        """Increments the counter.
+
+        Args:
+            value (float, optional): increment. Defaults to 1.
+        """
+        with self.__lock:
+            self.__value += value
+
+    @property
+    def value(self) -> float:
+        return self.__value
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__value = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"value": self.value}
+
+
+class Gauge:
+    """Value that can go up and down."""
+
+    def __init__(self):
+        self.__value: float = 0
+
+    def set(self, value: float) -> None:
+        """Sets the value of the gauge.
+
+        Args:
+            value (float): value
+        """
+        self.__value = value
+
+    @property
+    def value(self) -> float:
+        return self.__value
+
+    def reset(self) -> None:
+        self.__value = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"value": self.value}
+
+
+class Histogram:
+    """Distribution of observed values.
+
+    The count, sum, min and max are exact. The quantiles are computed on a
+    bounded reservoir sample, so the memory does not grow with the number
+    of observations.
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, reservoir_size: int = 1024):
+        self.__reservoir_size: int = reservoir_size
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__reservoir: List[float] = list()
+            self.__count: int = 0
+            self.__sum: float = 0
+            self.__min: float = float("inf")
+            self.__max: float = float("-inf")
+
+    def observe(self, value: float) -> None:
+        """Records a value.
+
+        Args:
+            value (float): value
+        """
+        with self.__lock:
+            self.__count += 1
+            self.__sum += value
+            self.__min = min(self.__min, value)
+            self.__max = max(self.__max, value)
+            if len(self.__reservoir) < self.__reservoir_size:
+                self.__reservoir.append(value)
+            else:
+                # reservoir sampling (algorithm R)
+                position = random.randrange(self.__count)
+                if position < self.__reservoir_size:
+                    self.__reservoir[position] = value
+
+    @property
+    def count(self) -> int:
+        return self.__count
+
+    @property
+    def sum(self) -> float:
+        return self.__sum
+
+    def quantile(self, quantile: float) -> float:
+        """Returns a quantile of the observed values.
+
+        Args:
+            quantile (float): quantile between 0 and 1
+
+        Returns:
+            float: the value of the quantile, nan when nothing is observed
+        """
+        with self.__lock:
+            values = sorted(self.__reservoir)
+        if len(values) == 0:
+            return float("nan")
+        position = min(len(values) - 1, int(quantile * len(values)))
+        return values[position]
+
+    def to_dict(self) -> Dict[str, float]:
+        result: Dict[str, float] = {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.__min if self.count else float("nan"),
+            "max": self.__max if self.count else float("nan"),
+        }
+        for quantile in Histogram.QUANTILES:
+            result[f"p{int(quantile * 100)}"] = self.quantile(quantile)
+        return result
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class _Timer:
+    """Context manager observing its duration, in seconds, in a
+    histogram."""
+
+    __slots__ = ("__histogram", "__start")
+
+    def __init__(self, histogram: Histogram):
+        self.__histogram: Histogram = histogram
+        self.__start: int = 0
+
+    def __enter__(self) -> "_Timer":
+        self.__start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.__histogram.observe((time.perf_counter_ns() - self.__start) / 1e9)
+
+
+class MetricsRegistry:
+    """Registry of the metrics of the process.
+
+    Metrics are identified by a name and optional labels, created on
+    first use and exported as JSON or in the Prometheus text format.
+    """
+
+    __instance: Optional["MetricsRegistry"] = None
+
+    def __init__(self):
+        self.__metrics: Dict[Tuple[str, Labels], Metric] = dict()
+        self.__types: Dict[str, str] = dict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def get_instance() -> "MetricsRegistry":
+        """Returns the registry of the process."""
+        if MetricsRegistry.__instance is None:
+            MetricsRegistry.__instance = MetricsRegistry()
+        return MetricsRegistry.__instance
+
+    def _get(self, kind: type, name: str, labels: Dict[str, str]) -> Metric:
+        key = (name, frozenset(labels.items()))
+        metric = self.__metrics.get(key)
+        if metric is None:
+            with self.__lock:
+                metric = self.__metrics.get(key)
+                if metric is None:
+                    if self.__types.setdefault(name, kind.__name__) != (
+                        kind.__name__
+                    ):
+                        raise ValueError(
+                            f"{name} is already registered as a {self.__types[name]}"
+                        )
+                    metric = kind()
+                    self.__metrics[key] = metric
+        return metric
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        """Returns the counter name{labels}, creating it if needed."""
+        return self._get(Counter, name, labels)  # type: ignore
+
+    def gauge(self, name: str, **labels: str) -> Gauge:
+        """Returns the gauge name{labels}, creating it if needed."""
+        return self._get(Gauge, name, labels)  # type: ignore
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        """Returns the histogram name{labels}, creating it if needed."""
+        return self._get(Histogram, name, labels)  # type: ignore
+
+    def timer(self, name: str, **labels: str) -> _Timer:
+        """Returns a context manager observing its duration in seconds in
+        the histogram name{labels}."""
+        return _Timer(self.histogram(name, **labels))
+
+    def reset(self) -> None:
+        """Resets the values of all the metrics."""
+        with self.__lock:
+            for metric in self.__metrics.values():
+                metric.reset()
+
+    @staticmethod
+    def _format_labels(labels: Labels, **extra: str) -> str:
+        items = sorted(labels) + sorted(extra.items())
+        if len(items) == 0:
+            return ""
+        content = ",".join(
+            '{}="{}"'.format(key, str(value).replace('"', '\\"'))
+            for key, value in items
+        )
+        return "{" + content + "}"
+
+    def _snapshot(self) -> List[Tuple[Tuple[str, Labels], Metric]]:
+        """Metrics sorted by name, listed under the lock so that they can
+        be registered while they are exported."""
+        with self.__lock:
+            items = list(self.__metrics.items())
+        return sorted(items, key=lambda item: item[0][0])
+
+    def to_dict(self) -> Dict[str, List[Dict]]:
+        """Returns the metrics by name, with their labels and values."""
+        result: Dict[str, List[Dict]] = dict()
+        for (name, labels), metric in self._snapshot():
+            value: Dict = dict(metric.to_dict())
+            value["labels"] = dict(labels)
+            result.setdefault(name, list()).append(value)
+        return result
+
+    def to_json(self) -> str:
+        """Exports the metrics as JSON."""
+        return json.dumps(self.to_dict())
+
+    def to_prometheus(self) -> str:
+        """Exports the metrics in the Prometheus text format. Histograms
+        are exported as summaries."""
+        prometheus_types: Dict[str, str] = {
+            "Counter": "counter",
+            "Gauge": "gauge",
+            "Histogram": "summary",
+        }
+        lines: List[str] = list()
+        last_name: Optional[str] = None
+        for (name, labels), metric in self._snapshot():
+            if name != last_name:
+                lines.append(
+                    f"# TYPE {name} {prometheus_types[self.__types[name]]}"
+                )
+                last_name = name
+            if isinstance(metric, Histogram):
+                for quantile in Histogram.QUANTILES:
+                    fmt_labels = MetricsRegistry._format_labels(
+                        labels, quantile=str(quantile)
+                    )
+                    lines.append(
+                        f"{name}{fmt_labels} {metric.quantile(quantile)}"
+                    )
+                fmt_labels = MetricsRegistry._format_labels(labels)
+                lines.append(f"{name}_sum{fmt_labels} {metric.sum}")
+                lines.append(f"{name}_count{fmt_labels} {metric.count}")
+            else:
+                fmt_labels = MetricsRegistry._format_labels(labels)
+                lines.append(f"{name}{fmt_labels} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+class MemorySampler:
+    """Samples the resident memory of the process.
+
+    Reading the resident set size is cheap compared with tracemalloc,
+    which slows down every allocation of the process while it is tracing.
+    """
+
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    @staticmethod
+    def rss() -> int:
+        """Returns the resident memory of the process in bytes."""
+        try:
+            with open("/proc/self/statm", encoding="utf-8") as file:
+                return int(file.read().split()[1]) * MemorySampler.PAGE_SIZE
+        except OSError:
+            import resource  # pylint: disable=import-outside-toplevel
+
+            # peak resident memory, in kB on Linux and bytes on macOS
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
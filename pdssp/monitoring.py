@@ -21,11 +21,41 @@
 """Some Utilities."""
 import logging
 import os
+import reprlib
 import time
-import tracemalloc
 from functools import partial
 from functools import wraps
 
+from .metrics import MemorySampler
+from .metrics import MetricsRegistry
+
+
+class _TruncatedRepr(reprlib.Repr):
+    """Bounded repr of the arguments and results of the monitored
+    functions.
+
+    Objects having a shape (DataFrame, GeoDataFrame, ndarray) are
+    described by their type and shape instead of their content.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.maxlevel = 3
+        self.maxlist = 6
+        self.maxtuple = 6
+        self.maxdict = 6
+        self.maxstring = 80
+        self.maxother = 80
+
+    def repr1(self, x, level):
+        shape = getattr(x, "shape", None)
+        if isinstance(shape, tuple):
+            return f"<{type(x).__name__} shape={shape}>"
+        return super().repr1(x, level)
+
+
+_truncated_repr = _TruncatedRepr().repr
+
 
 class UtilsMonitoring:  # noqa: R0205
     """Some Utilities."""
@@ -62,19 +92,21 @@ class UtilsMonitoring:  # noqa: R0205
                 level=level,
             )
 
+        name = func.__qualname__
+        logger = logging.getLogger(__name__ + "." + name)
+
         @wraps(func)
         def wrapped(*args, **kwargs):
-            name = func.__qualname__
-            logger = logging.getLogger(__name__ + "." + name)
-
-            if input and logger.getEffectiveLevel() >= level:
-                msg = f"Entering '{name}' (args={args}, kwargs={kwargs})"
+            # the arguments and the result are only converted to strings,
+            # with a bounded size, when the level is enabled
+            if input and logger.isEnabledFor(level):
+                msg = f"Entering '{name}' (args={_truncated_repr(args)}, kwargs={_truncated_repr(kwargs)})"  # pylint: disable=line-too-long
                 logger.log(level, msg)
 
             result = func(*args, **kwargs)
 
-            if output and logger.getEffectiveLevel() >= level:
-                msg = f"Exiting '{name}' (result={result})"
+            if output and logger.isEnabledFor(level):
+                msg = f"Exiting '{name}' (result={_truncated_repr(result)})"
                 logger.log(level, msg)
 
             return result
@@ -85,6 +117,11 @@ class UtilsMonitoring:  # noqa: R0205
     def time_spend(func=None, level=logging.DEBUG, threshold_in_ms=1000):
         """Monitor the performances of a function.
 
+        The duration is also recorded in the histogram
+        ``function_time_spend_seconds`` of the metrics registry, distinct
+        from the ``function_duration_seconds`` of metric so that a function
+        decorated by both is not counted twice.
+
         Parameters
         ----------
         func: func
@@ -100,31 +137,87 @@ class UtilsMonitoring:  # noqa: R0205
         object : the result of the function
         """
         if func is None:
-            return partial(UtilsMonitoring.time_spend, level=level)
+            return partial(
+                UtilsMonitoring.time_spend,
+                level=level,
+                threshold_in_ms=threshold_in_ms,
+            )
+
+        name = func.__qualname__
+        logger = logging.getLogger(__name__ + "." + name)
+        histogram = MetricsRegistry.get_instance().histogram(
+            "function_time_spend_seconds", function=name
+        )
 
         @wraps(func)
         def newfunc(*args, **kwargs):
-            name = func.__qualname__
-            logger = logging.getLogger(__name__ + "." + name)
-            start_time = time.time()
+            start_time = time.perf_counter_ns()
             result = func(*args, **kwargs)
-            elapsed_time = time.time() - start_time
-            logger.log(
-                level,
-                "function [{}] finished in {:.2f} ms".format(
-                    func.__qualname__, elapsed_time * 1000
-                ),
-            )
+            elapsed_time = (time.perf_counter_ns() - start_time) / 1e9
+            histogram.observe(elapsed_time)
+            if logger.isEnabledFor(level):
+                logger.log(
+                    level,
+                    "function [{}] finished in {:.2f} ms".format(
+                        name, elapsed_time * 1000
+                    ),
+                )
             if float(elapsed_time) * 1000 > threshold_in_ms:
                 logger.warning(
                     "function [{}] is too long to compute : {:.2f} ms".format(
-                        func.__qualname__, elapsed_time * 1000
+                        name, elapsed_time * 1000
                     )
                 )
             return result
 
         return newfunc
 
+    @staticmethod
+    def metric(func=None, name=None):
+        """Record the calls of a function in the metrics registry, without
+        logging.
+
+        The number of calls and of errors are counted in
+        ``function_calls_total`` and ``function_errors_total`` and the
+        duration is recorded in ``function_duration_seconds``.
+
+        Parameters
+        ----------
+        func: func
+            Function to monitor (default: {None})
+        name: str
+            Name of the function in the labels (default: qualified name
+            of the function)
+
+        Returns
+        -------
+        object : the result of the function
+        """
+        if func is None:
+            return partial(UtilsMonitoring.metric, name=name)
+
+        label = name if name is not None else func.__qualname__
+        registry = MetricsRegistry.get_instance()
+        calls = registry.counter("function_calls_total", function=label)
+        errors = registry.counter("function_errors_total", function=label)
+        histogram = registry.histogram(
+            "function_duration_seconds", function=label
+        )
+
+        @wraps(func)
+        def newfunc(*args, **kwargs):
+            calls.inc()
+            start_time = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                histogram.observe((time.perf_counter_ns() - start_time) / 1e9)
+
+        return newfunc
+
     @staticmethod
     def size(func=None, level=logging.INFO):
         """Monitor the number of records in a file.
@@ -143,10 +236,11 @@ class UtilsMonitoring:  # noqa: R0205
         if func is None:
             return partial(UtilsMonitoring.size, level=level)
 
+        name = func.__qualname__
+        logger = logging.getLogger(__name__ + "." + name)
+
         @wraps(func)
         def newfunc(*args, **kwargs):
-            name = func.__qualname__
-            logger = logging.getLogger(__name__ + "." + name)
             filename = os.path.basename(args[1])
             logger.log(level, "Loading file '%s'", filename)
             result = func(*args, **kwargs)
@@ -172,33 +266,51 @@ class UtilsMonitoring:  # noqa: R0205
         return newfunc
 
     @staticmethod
-    def measure_memory(func=None, level=logging.DEBUG):
+    def measure_memory(func=None, level=logging.DEBUG, every=1):
         """Measure the memory of the function
 
+        The resident memory of the process is sampled before and after one
+        call out of ``every`` and its increase is recorded in the histogram
+        ``function_memory_bytes``. Contrary to tracemalloc, sampling does
+        not slow down the allocations and calls can be nested.
+
         Args:
             func (func, optional): Function to measure. Defaults to None.
-            level (int, optional): Level of the log. Defaults to logging.INFO.
+            level (int, optional): Level of the log. Defaults to logging.DEBUG.
+            every (int, optional): Sampling period in calls. Defaults to 1.
 
         Returns:
             object : the result of the function
         """
         if func is None:
-            return partial(UtilsMonitoring.measure_memory, level=level)
+            return partial(
+                UtilsMonitoring.measure_memory, level=level, every=every
+            )
+
+        name = func.__qualname__
+        logger = logging.getLogger(__name__ + "." + name)
+        histogram = MetricsRegistry.get_instance().histogram(
+            "function_memory_bytes", function=name
+        )
+        nb_calls = [0]
 
         @wraps(func)
         def newfunc(*args, **kwargs):
-            name = func.__qualname__
-            logger = logging.getLogger(__name__ + "." + name)
-            tracemalloc.start()
+            nb_calls[0] += 1
+            if nb_calls[0] % every != 0:
+                return func(*args, **kwargs)
+
+            before = MemorySampler.rss()
             result = func(*args, **kwargs)
-            current, peak = tracemalloc.get_traced_memory()
-            msg = f"""
+            current = MemorySampler.rss()
+            histogram.observe(current - before)
+            if logger.isEnabledFor(level):
+                msg = f"""
             \033[37mFunction Name       :\033[35;1m {func.__name__}\033[0m
             \033[37mCurrent memory usage:\033[36m {current / 10 ** 6}MB\033[0m
-            \033[37mPeak                :\033[36m {peak / 10 ** 6}MB\033[0m
+            \033[37mIncrease            :\033[36m {(current - before) / 10 ** 6}MB\033[0m
             """
-            logger.log(level, msg)
-            tracemalloc.stop()
+                logger.log(level, msg)
             return result
 
         return newfunc
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# Data Access Layer for PDSP - Provides the data access layer for accessing to the data from PDSP
+# Copyright (C) 2021 - CNES (Jean-Christophe Malapert for Pôle Surfaces Planétaires)
+#
+# This file is part of Data Access Layer for PDSP.
+#
+# Data Access Layer for PDSP is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License v3  as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Data Access Layer for PDSP is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License v3  for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License v3
+# along with Data Access Layer for PDSP.  If not, see <https://www.gnu.org/licenses/>.
+"""Lightweight tracing of the processing steps.
+
+Spans are disabled by default and cost a single method call. When
+enabled, they are sent to local exporters (log or JSON lines file) or
+delegated to OpenTelemetry when it is installed.
+"""
+
+import configparser
+import contextvars
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _NoopSpan:
+    """Span doing nothing, returned when tracing is disabled."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_CURRENT_SPAN: contextvars.ContextVar = contextvars.ContextVar(
+    "pdssp_current_span", default=None
+)
+
+
+class Span:
+    """Timed step of a processing, with attributes."""
+
+    def __init__(
+        self, tracer: "Tracer", name: str, attributes: Dict[str, Any]
+    ):
+        self.__tracer: "Tracer" = tracer
+        self.__parent: Optional["Span"] = _CURRENT_SPAN.get()
+        self.name: str = name
+        self.attributes: Dict[str, Any] = attributes
+        self.trace_id: str = (
+            self.__parent.trace_id
+            if self.__parent is not None
+            else secrets.token_hex(16)
+        )
+        self.span_id: str = secrets.token_hex(8)
+        self.parent_id: Optional[str] = (
+            self.__parent.span_id if self.__parent is not None else None
+        )
+        self.start_time: int = 0
+        self.end_time: int = 0
+        self.status: str = "OK"
+        self.__start_ns: int = 0
+        self.__token: Optional[contextvars.Token] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Sets an attribute of the span."""
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_time - self.start_time) / 1e6
+
+    def __enter__(self) -> "Span":
+        self.__token = _CURRENT_SPAN.set(self)
+        self.start_time = time.time_ns()
+        self.__start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.end_time = self.start_time + (
+            time.perf_counter_ns() - self.__start_ns
+        )
+        if exc_type is not None:
+            self.status = "ERROR"
+            self.attributes["exception.type"] = exc_type.__name__
+        if self.__token is not None:
+            _CURRENT_SPAN.reset(self.__token)
+        self.__tracer.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Receives the finished spans."""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError("Not implemented")
+
+
+class LoggingSpanExporter(SpanExporter):
+    """Logs the finished spans."""
+
+    def __init__(self, level: int = logging.DEBUG):
+        self.__level: int = level
+
+    def export(self, span: Span) -> None:
+        if logger.isEnabledFor(self.__level):
+            logger.log(
+                self.__level,
+                "span {} {:.3f} ms {}".format(
+                    span.name, span.duration_ms, span.attributes
+                ),
+            )
+
+
+class FileSpanExporter(SpanExporter):
+    """Writes the finished spans in a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.__path: str = path
+        self.__lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self.__lock:
+            with open(self.__path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps the finished spans in memory."""
+
+    def __init__(self):
+        self.spans: List[Span] = list()
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+class Tracer:
+    """Creates the spans of the library.
+
+    The tracer is configured from the [tracing] section of pdssp.conf:
+    exporter is none (default), log, file or opentelemetry and path is
+    the file of the file exporter.
+    """
+
+    SECTION = "tracing"
+    PATH_TO_CONF = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), "conf", "pdssp.conf"
+    )
+
+    __instance: Optional["Tracer"] = None
+
+    def __init__(self, exporters: Optional[List[SpanExporter]] = None):
+        self.__exporters: List[SpanExporter] = (
+            exporters if exporters is not None else list()
+        )
+        self.__otel_tracer = None
+
+    @staticmethod
+    def from_config(path_to_conf: str = PATH_TO_CONF) -> "Tracer":
+        """Creates a tracer from the [tracing] section of a configuration
+        file."""
+        config = configparser.ConfigParser()
+        config.read(path_to_conf)
+        tracer = Tracer()
+        if not config.has_section(Tracer.SECTION):
+            return tracer
+        section = config[Tracer.SECTION]
+        exporter: str = section.get("exporter", "none").lower()
+        if exporter == "log":
+            tracer.add_exporter(LoggingSpanExporter())
+        elif exporter == "file":
+            tracer.add_exporter(
+                FileSpanExporter(section.get("path", "pdssp_spans.jsonl"))
+            )
+        elif exporter == "opentelemetry":
+            tracer.use_opentelemetry()
+        elif exporter != "none":
+            logger.warning(f"Unknown span exporter : {exporter}")
+        return tracer
+
+    @staticmethod
+    def get_instance() -> "Tracer":
+        """Returns the tracer of the library."""
+        if Tracer.__instance is None:
+            Tracer.__instance = Tracer.from_config()
+        return Tracer.__instance
+
+    @staticmethod
+    def set_instance(tracer: Optional["Tracer"]) -> None:
+        """Replaces the tracer of the library."""
+        Tracer.__instance = tracer
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.__exporters) > 0 or self.__otel_tracer is not None
+
+    def add_exporter(self, exporter: SpanExporter) -> None:
+        """Enables the tracing and sends the spans to exporter."""
+        self.__exporters.append(exporter)
+
+    def use_opentelemetry(self) -> None:
+        """Delegates the spans to the OpenTelemetry API, configured by the
+        application."""
+        # pylint: disable-next=import-outside-toplevel
+        from opentelemetry import trace
+
+        self.__otel_tracer = trace.get_tracer("pdssp")
+
+    def span(self, name: str, **attributes: Any):
+        """Returns a span as a context manager.
+
+        Args:
+            name (str): name of the step
+            **attributes: attributes of the span (url, page, rows, bytes, ...)
+
+        Returns:
+            the span, whose set_attribute method adds attributes
+        """
+        if self.__otel_tracer is not None:
+            return self.__otel_tracer.start_as_current_span(
+                name, attributes=attributes
+            )
+        if len(self.__exporters) == 0:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def export(self, span: Span) -> None:
+        for exporter in self.__exporters:
+            try:
+                exporter.export(span)
+            except Exception as err:  # pylint: disable=broad-except
+                logger.warning(f"Cannot export the span {span.name} : {err}")
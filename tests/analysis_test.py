@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+import ast
+import logging
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import box
+from shapely.geometry import LineString
+from shapely.geometry import MultiPolygon
+from shapely.geometry import Point
+from shapely.geometry import Polygon
+
+from pdssp.analysis import Footprints
+from pdssp.analysis import Geodesy
+from pdssp.analysis import LevelOfDetail
+from pdssp.analysis import QueryCache
+from pdssp.analysis import Temporal
+from pdssp.analysis import TimeIndex
+from pdssp.dal import Wfs
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def catalog():
+    data = gpd.GeoDataFrame(
+        {
+            "datetime": [
+                "2020-01-03T10:00:00Z",
+                "2020-01-01T00:00:00Z",
+                None,
+                "2020-02-15T12:00:00Z",
+                "2020-01-20T00:00:00Z",
+            ],
+            "id": ["c", "a", "x", "e", "d"],
+        },
+        geometry=[Point(i, i) for i in range(5)],
+    )
+    Temporal.parse(data)
+    return data.set_index("datetime").sort_index()
+
+
+def test_temporal(catalog):
+    assert isinstance(catalog.index, pd.DatetimeIndex)
+    assert list(catalog["id"]) == ["a", "c", "d", "e", "x"]
+
+    result = Temporal.between(catalog, "2020-01-01", "2020-01-20")
+    assert list(result["id"]) == ["a", "c", "d"]
+    result = Temporal.between(catalog, "2020-03-01", "2020-04-01")
+    assert result.shape[0] == 0
+
+    assert list(Temporal.asof(catalog, "2020-01-19")["id"]) == ["c"]
+    assert list(Temporal.asof(catalog, "2021-01-01")["id"]) == ["e"]
+    assert Temporal.asof(catalog, "2019-01-01").shape[0] == 0
+
+    # a sorted catalog with items without datetime is not sorted again
+    assert catalog.index.hasnans
+    assert Temporal._sorted(catalog) is catalog
+
+    # unsorted catalog
+    result = Temporal.between(catalog.iloc[::-1], "2020-01-02", "2020-02-01")
+    assert list(result["id"]) == ["c", "d"]
+
+    # the unsorted catalog is sorted once for all the queries
+    times = TimeIndex(catalog.iloc[::-1])
+    assert list(times.data["id"]) == ["a", "c", "d", "e", "x"]
+    assert list(times.between("2020-01-02", "2020-02-01")["id"]) == ["c", "d"]
+    assert list(times.asof("2020-01-19")["id"]) == ["c"]
+    assert times.asof("2019-01-01").shape[0] == 0
+
+    counts = Temporal.resample(catalog, "MS")
+    assert list(counts) == [3, 1]
+    with pytest.raises(ValueError):
+        Temporal.between(catalog.reset_index(), "2020-01-01", "2020-02-01")
+
+
+def test_footprints():
+    data = gpd.GeoDataFrame(
+        {"emission": [0.0, 20.0, 5.0, 0.0]},
+        geometry=[
+            box(0, 0, 1, 1),
+            box(0.1, 0.1, 1.1, 1.1),
+            box(0.5, 0.5, 1.5, 1.5),
+            box(10, 10, 11, 11),
+        ],
+    )
+    area = Footprints.area(data, Wfs.CRS_WKT)
+    # 1 degree square at the equator of Mars
+    assert area.iloc[0] == pytest.approx(3.47e9, rel=0.01)
+
+    coverage = Footprints.coverage(data, max_workers=2, chunk_size=2)
+    assert coverage.area == pytest.approx(
+        1 + 1 + 1 - 0.81 - 0.25 - 0.36 + 0.25 + 1
+    )
+    assert Footprints.coverage_area(data, Wfs.CRS_WKT) < area.sum()
+
+    assert list(Footprints.overlap_counts(data)) == [2, 2, 2, 0]
+
+    pairs = Footprints.stereo_pairs(data, min_overlap=0.3)
+    assert list(zip(pairs["left"], pairs["right"])) == [(0, 1), (1, 2)]
+    assert list(pairs["overlap"]) == pytest.approx([0.81, 0.36])
+    pairs = Footprints.stereo_pairs(
+        data, min_overlap=0.2, angle_column="emission", min_angle_difference=10
+    )
+    assert list(zip(pairs["left"], pairs["right"])) == [(0, 1), (1, 2)]
+
+
+def test_level_of_detail(monkeypatch):
+    data = gpd.GeoDataFrame(
+        {"id": ["a", "b", "c"]},
+        geometry=[Point(3 * i, 0).buffer(1, quad_segs=256) for i in range(3)],
+        crs=Wfs.CRS_WKT,
+    )
+    lod = LevelOfDetail(data.geometry)
+    assert lod.level(1.0, data) == 0
+    # coarsest tolerance under a pixel of a 180 degrees view
+    level = lod.level(180.0, data)
+    assert LevelOfDetail.TOLERANCES[level] == 0.1
+
+    simplified = lod.simplify(data.iloc[[2, 0]], level)
+    assert list(simplified.index) == [2, 0]
+    assert simplified.crs == data.crs
+    assert simplified.geometry.is_valid.all()
+    assert (
+        lod.nb_vertices(level)[[2, 0]].sum()
+        < lod.nb_vertices(0)[[2, 0]].sum() / 10
+    )
+    # the circles become squares
+    assert [geometry.area for geometry in simplified.geometry] == (
+        pytest.approx([np.pi, np.pi], rel=0.15)
+    )
+    # the levels are computed once
+    assert lod.geometries(level) is lod.geometries(level)
+
+    # rows that are not in the catalog are simplified on the fly
+    other = data.set_axis(["x", "y", "z"])
+    assert lod.simplify(other, level).geometry.is_valid.all()
+
+    # coarser levels for large selections
+    monkeypatch.setattr(LevelOfDetail, "MAX_VERTICES", 100)
+    assert lod.level(1.0, data) > 0
+
+
+def test_query_cache():
+    data = pd.DataFrame(
+        {"a": [1, 2, 3, 4], "b": ["x", "y", "x", "y"], "c": [0.5, None, 2, 3]}
+    )
+    queries = QueryCache(data)
+    assert QueryCache.normalize("a>1   and b=='x'") == "a > 1 and b == 'x'"
+
+    expression = "a > 1 and (b == 'x' or c >= 3)"
+    assert queries.query(expression).equals(data.query(expression))
+    misses = queries.stats["misses"]
+    # the operands are cached
+    assert list(queries.query("a>1 and b == 'x'").index) == [2]
+    assert queries.stats["misses"] == misses + 2
+    assert list(queries.query(expression).index) == [2, 3]
+
+    mask = queries.mask("a > 1") & ~queries.mask("b == 'y'")
+    assert list(queries.query(mask).index) == [2]
+    assert list(queries.query(queries.mask("a > 3") | mask).index) == [2, 3]
+    assert list(queries.query("(a > 1) & (c > 2)").index) == [3]
+    assert list(queries.query("a > 1 & c > 2").index) == [3]
+    assert list(queries.query("`c` > 1").index) == [2, 3]
+
+    # the results cannot be modified through the returned copies
+    result = queries.query("a > 2")
+    result["a"] = 0
+    assert list(queries.query("a > 2")["a"]) == [3, 4]
+
+    with pytest.raises(ValueError):
+        queries.query("a + 1")
+
+    data["d"] = data["a"] * 2
+    assert list(queries.query("d > 4").index) == [2, 3]
+
+
+def test_query_cache_without_unparse(monkeypatch):
+    # Python < 3.9
+    monkeypatch.delattr(ast, "unparse")
+    data = pd.DataFrame({"a": [1, 2, 3, 4], "b": ["x", "y", "x", "y"]})
+    queries = QueryCache(data)
+    assert QueryCache.normalize(" a > 1  and b == 'x'") == "a > 1 and b == 'x'"
+    assert list(queries.query("a > 1 and b == 'x'").index) == [2]
+    misses = queries.stats["misses"]
+    assert list(queries.query("a > 1   and b == 'x'").index) == [2]
+    assert queries.stats["misses"] == misses
+    mask = queries.mask("a > 1") & ~queries.mask("b == 'y'")
+    assert list(queries.query(mask).index) == [2]
+
+
+def test_geodesy():
+    geodesy = Geodesy.get_instance(Wfs.CRS_WKT)
+    assert Geodesy.get_instance(Wfs.CRS_WKT) is geodesy
+    geometries = np.array(
+        [
+            box(0, 0, 1, 1),
+            box(170, -80, 190, -70),
+            MultiPolygon([box(0, 0, 1, 1), box(3, 60, 4, 61)]),
+            Polygon(
+                [(0, 0), (0, 5), (5, 5), (5, 0)],
+                [[(1, 1), (2, 1), (2, 2), (1, 2)]],
+            ),
+            Point(0, 0),
+            None,
+        ],
+        dtype=object,
+    )
+    area = geodesy.area(geometries)
+    perimeter = geodesy.perimeter(geometries)
+    for position in range(3):
+        (
+            expected_area,
+            expected_perimeter,
+        ) = geodesy.geod.geometry_area_perimeter(geometries[position])
+        assert area[position] == pytest.approx(abs(expected_area), rel=1e-4)
+        assert perimeter[position] == pytest.approx(expected_perimeter)
+    # the hole is removed
+    assert area[3] == pytest.approx(
+        geodesy.area(np.array([box(0, 0, 5, 5)]))[0] - area[0], rel=1e-3
+    )
+    assert list(area[4:]) == [0, 0]
+    assert list(perimeter[4:]) == [0, 0]
+
+    line = LineString([(0, 0), (1, 1), (2, 1)])
+    assert geodesy.length(np.array([line]))[0] == pytest.approx(
+        geodesy.geod.geometry_length(line)
+    )
+    distance = geodesy.distance_points(
+        np.array([Point(0, 0), Point(0, 0)]),
+        np.array([Point(0, 1), Point(90, 0)]),
+    )
+    # quarter of the equator of Mars
+    assert distance[1] == pytest.approx(np.pi / 2 * 3396190.0)
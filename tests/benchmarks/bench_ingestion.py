@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of the ingestion of the STAC and WFS services."""
+import os
+
+import pytest
+
+from pdssp.dal import Stac
+from pdssp.dal import StacEnum
+from pdssp.dal import Wfs
+
+# number of footprints served by the mock services
+SIZES = [
+    int(size)
+    for size in os.environ.get("PDSSP_BENCH_SIZES", "1000,10000").split(",")
+]
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_stac_load(size, mock_server_factory, measure):
+    server = mock_server_factory(size)
+    data = measure(server, lambda: Stac.load(StacEnum.ITEM, server.stac_url))
+    assert data.shape[0] == size
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_stac_load_columns(size, mock_server_factory, measure):
+    server = mock_server_factory(size)
+    data = measure(
+        server,
+        lambda: Stac.load(
+            StacEnum.ITEM, server.stac_url, columns=["instrument"]
+        ),
+    )
+    assert data.shape == (size, 3)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_wfs_get_data(size, mock_server_factory, measure, monkeypatch):
+    server = mock_server_factory(size)
+    monkeypatch.setattr(Wfs, "MAX_REQUESTS", 2000)
+    wfs = Wfs(server.wfs_url)
+    data = measure(server, lambda: wfs.get_data("footprints"))
+    assert data.shape[0] == size
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_wfs_get_data_columns(
+    size, mock_server_factory, measure, monkeypatch
+):
+    server = mock_server_factory(size)
+    monkeypatch.setattr(Wfs, "MAX_REQUESTS", 2000)
+    wfs = Wfs(server.wfs_url)
+    data = measure(
+        server, lambda: wfs.get_data("footprints", columns=["instrument"])
+    )
+    assert list(data.columns) == ["instrument", "geometry"]
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_planet_load(size, mock_server_factory, measure):
+    pytest.importorskip("ipymizar")
+    from pdssp.body import PlanetFactory
+
+    server = mock_server_factory(size)
+    planet = measure(server, lambda: PlanetFactory.load(server.stac_url).data)
+    assert planet.shape[0] == size
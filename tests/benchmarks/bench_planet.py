@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks of the interactive operations of a planet.
+
+The footprints are synthetic; PDSSP_BENCH_ROWS selects the sizes of the
+catalogs, for instance 1000,100000,1000000,5000000.
+"""
+import os
+
+import matplotlib
+import numpy as np
+import pytest
+from synthetic import footprints
+
+pytest.importorskip("ipymizar")
+
+from pdssp.body.geojson import to_geojson  # noqa: E402
+from pdssp.body.planet import Mars  # noqa: E402
+from pdssp.body.planet import MarsVisu  # noqa: E402
+
+matplotlib.use("Agg")
+
+SIZES = [
+    int(size)
+    for size in os.environ.get("PDSSP_BENCH_ROWS", "1000,100000").split(",")
+]
+ROUNDS = int(os.environ.get("PDSSP_BENCH_ROUNDS", "5"))
+# number of footprints highlighted
+SELECTION = 1000
+
+
+@pytest.fixture(scope="module")
+def planets():
+    cache = dict()
+
+    def create(size):
+        if size not in cache:
+            cache[size] = Mars(footprints(size))
+        return cache[size]
+
+    return create
+
+
+@pytest.fixture
+def run(benchmark, profile):
+    def timed(func):
+        profile(func)
+        return benchmark.pedantic(
+            func, rounds=ROUNDS, iterations=1, warmup_rounds=1
+        )
+
+    return timed
+
+
+def _selection(size):
+    rng = np.random.default_rng(0)
+    return sorted(rng.choice(size, min(size, SELECTION), replace=False))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_query(size, planets, run):
+    planet = planets(size)
+    result = run(
+        lambda: planet.query("instrument == 'ctx' and incidence < 30")
+    )
+    assert 0 < result.shape[0] < size
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_highlight(size, planets, run):
+    planet = planets(size)
+    visu = MarsVisu()
+    positions = [int(position) for position in _selection(size)]
+    run(lambda: planet.highlight(visu, positions))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_highlight_by_index(size, planets, run):
+    planet = planets(size)
+    visu = MarsVisu()
+    index = planet.data.index[_selection(size)]
+    run(lambda: planet.highlight_by_index(visu, index))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_to_geojson(size, planets, run):
+    planet = planets(size)
+    geojson = run(lambda: to_geojson(planet.data))
+    assert len(geojson["features"]) == size
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_add_geojson(size, planets, run):
+    planet = planets(size)
+    visu = MarsVisu()
+
+    def show():
+        planet.show_dataset_visu3D(visu)
+        planet.remove_dataset_visu3D(visu)
+
+    run(show)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_describe(size, planets, run):
+    planet = planets(size)
+    run(planet.describe)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_histogram(size, planets, run):
+    import matplotlib.pyplot as plt
+
+    planet = planets(size)
+
+    def histogram():
+        planet.histogram()
+        plt.close("all")
+
+    run(histogram)
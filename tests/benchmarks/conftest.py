@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in of the STAC and WFS services for the benchmarks.
+
+The server runs in its own process and generates synthetic item
+collections and GetFeature pages of a configurable size, page size and
+latency. The pages are generated once and then served from memory.
+
+When PDSSP_BENCH_PROFILE is cprofile or pyinstrument, one call of each
+benchmarked function is profiled and the profile is written in
+PDSSP_BENCH_PROFILE_DIR.
+"""
+import cProfile
+import json
+import multiprocessing
+import os
+import re
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+import pytest
+from synthetic import features
+
+from pdssp.dal import Transport
+
+# latency added to each response, in ms
+LATENCY_MS = float(os.environ.get("PDSSP_BENCH_LATENCY_MS", "0"))
+PROFILER = os.environ.get("PDSSP_BENCH_PROFILE", "")
+PROFILE_DIR = os.environ.get(
+    "PDSSP_BENCH_PROFILE_DIR", os.path.join(".benchmarks", "profiles")
+)
+
+WFS_CAPABILITIES = """<?xml version="1.0" encoding="UTF-8"?>
+<wfs:WFS_Capabilities version="2.0.0"
+  xmlns:wfs="http://www.opengis.net/wfs/2.0"
+  xmlns:ows="http://www.opengis.net/ows/1.1"
+  xmlns:xlink="http://www.w3.org/1999/xlink">
+  <ows:ServiceIdentification>
+    <ows:Title>Mars</ows:Title>
+    <ows:ServiceType>WFS</ows:ServiceType>
+    <ows:ServiceTypeVersion>2.0.0</ows:ServiceTypeVersion>
+  </ows:ServiceIdentification>
+  <ows:OperationsMetadata>
+    <ows:Operation name="GetFeature">
+      <ows:DCP><ows:HTTP><ows:Get xlink:href="{url}"/></ows:HTTP></ows:DCP>
+    </ows:Operation>
+  </ows:OperationsMetadata>
+  <wfs:FeatureTypeList>
+    <wfs:FeatureType>
+      <wfs:Name>footprints</wfs:Name>
+      <wfs:Title>Footprints</wfs:Title>
+      <wfs:DefaultCRS>urn:ogc:def:crs:EPSG::4326</wfs:DefaultCRS>
+      <ows:WGS84BoundingBox>
+        <ows:LowerCorner>-180 -90</ows:LowerCorner>
+        <ows:UpperCorner>180 90</ows:UpperCorner>
+      </ows:WGS84BoundingBox>
+    </wfs:FeatureType>
+  </wfs:FeatureTypeList>
+</wfs:WFS_Capabilities>
+"""
+
+WFS_HITS = """<?xml version="1.0" encoding="UTF-8"?>
+<wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs/2.0"
+  numberMatched="{count}" numberReturned="0"/>
+"""
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Serves /stac/items and /wfs from the configuration of the server."""
+
+    def _send(self, content, content_type):
+        if self.server.latency > 0:
+            time.sleep(self.server.latency / 1000)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _cached(self, key, generate):
+        if key not in self.server.pages:
+            self.server.pages[key] = generate()
+        return self.server.pages[key]
+
+    def _stac_page(self, page):
+        start = page * self.server.page_size
+        nb_items = max(0, min(self.server.page_size, self.server.size - start))
+        links = list()
+        if start + nb_items < self.server.size:
+            links.append(
+                {
+                    "rel": "next",
+                    "href": f"{self.server.url}/stac/items?page={page + 1}",
+                }
+            )
+        return json.dumps(
+            {
+                "type": "FeatureCollection",
+                "features": features(start, nb_items, stac=True),
+                "links": links,
+            }
+        ).encode("utf-8")
+
+    def _wfs(self, params):
+        request = params.get("request", [""])[0].lower()
+        if request == "getcapabilities":
+            content = WFS_CAPABILITIES.format(url=f"{self.server.url}/wfs")
+            return content.encode("utf-8"), "text/xml"
+        if params.get("resultType", [""])[0] == "hits":
+            content = WFS_HITS.format(count=self.server.size)
+            return content.encode("utf-8"), "text/xml"
+        start = int(params.get("startIndex", ["0"])[0])
+        count = int(params.get("count", [str(self.server.size)])[0])
+        nb_items = max(0, min(count, self.server.size - start))
+        content = self._cached(
+            ("wfs", start, nb_items),
+            lambda: json.dumps(
+                {
+                    "type": "FeatureCollection",
+                    "features": features(start, nb_items, stac=False),
+                }
+            ).encode("utf-8"),
+        )
+        return content, "application/json"
+
+    def do_GET(self):
+        with self.server.nb_requests.get_lock():
+            self.server.nb_requests.value += 1
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path == "/stac/items":
+            page = int(params.get("page", ["0"])[0])
+            content = self._cached(
+                ("stac", page), lambda: self._stac_page(page)
+            )
+            self._send(content, "application/geo+json")
+        elif url.path == "/wfs":
+            self._send(*self._wfs(params))
+        else:
+            self.send_error(404)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(size, page_size, latency, nb_requests, queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    server.size = size
+    server.page_size = page_size
+    server.latency = latency
+    server.nb_requests = nb_requests
+    server.pages = dict()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    queue.put(server.url)
+    server.serve_forever()
+
+
+class MockServer:
+    """STAC and WFS services returning size synthetic footprints."""
+
+    def __init__(self, size, page_size=500, latency=LATENCY_MS):
+        self.size = size
+        self.page_size = page_size
+        self.__nb_requests = multiprocessing.Value("i", 0)
+        queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_serve,
+            args=(size, page_size, latency, self.__nb_requests, queue),
+            daemon=True,
+        )
+        self.process.start()
+        self.url = queue.get(timeout=10)
+
+    @property
+    def stac_url(self):
+        return f"{self.url}/stac/items"
+
+    @property
+    def wfs_url(self):
+        return f"{self.url}/wfs"
+
+    @property
+    def nb_requests(self):
+        return self.__nb_requests.value
+
+    def close(self):
+        self.process.terminate()
+        self.process.join()
+
+
+@pytest.fixture(scope="module")
+def mock_server_factory():
+    servers = dict()
+
+    def create(size, page_size=500):
+        if (size, page_size) not in servers:
+            servers[(size, page_size)] = MockServer(size, page_size)
+        return servers[(size, page_size)]
+
+    yield create
+    for server in servers.values():
+        server.close()
+
+
+@pytest.fixture
+def profile(request):
+    """Profiles one call of a function when PDSSP_BENCH_PROFILE is set."""
+
+    def run(func):
+        if PROFILER == "":
+            return
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = os.path.join(
+            PROFILE_DIR, re.sub(r"[^\w.-]", "_", request.node.name)
+        )
+        if PROFILER == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.runcall(func)
+            profiler.dump_stats(name + ".prof")
+        elif PROFILER == "pyinstrument":
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+            func()
+            profiler.stop()
+            with open(name + ".html", "w", encoding="utf-8") as file:
+                file.write(profiler.output_html())
+        else:
+            raise ValueError(f"Unknown profiler : {PROFILER}")
+
+    return run
+
+
+@pytest.fixture
+def measure(benchmark, profile):
+    """Benchmarks a loader and records, in the extra information of the
+    benchmark, its peak memory, its number of HTTP requests and bytes, the
+    number of rows and the throughput in rows by second."""
+
+    def run(server, func, rounds=3):
+        transport = Transport.get_instance()
+        host = urlparse(server.url).netloc
+        nb_requests = server.nb_requests
+        nb_bytes = transport.metrics().get(host, dict()).get("bytes", 0)
+        tracemalloc.start()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        benchmark.extra_info["rows"] = result.shape[0]
+        benchmark.extra_info["requests"] = server.nb_requests - nb_requests
+        benchmark.extra_info["bytes"] = (
+            transport.metrics()[host]["bytes"] - nb_bytes
+        )
+        benchmark.extra_info["peak_memory_mb"] = peak / 10 ** 6
+
+        profile(func)
+        result = benchmark.pedantic(func, rounds=rounds, iterations=1)
+        # no statistics with --benchmark-disable
+        if benchmark.stats is not None:
+            benchmark.extra_info["rows_per_second"] = (
+                result.shape[0] / benchmark.stats.stats.mean
+            )
+        return result
+
+    return run
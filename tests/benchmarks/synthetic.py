@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Synthetic footprints of Mars observations for the benchmarks."""
+from typing import Any
+from typing import Dict
+from typing import List
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from pdssp.dal import Wfs
+
+INSTRUMENTS = ["ctx", "hirise", "crism", "omega", "themis"]
+
+
+def footprint_properties(start: int, nb_rows: int, seed: int = 0) -> Dict:
+    """Returns the columns of the footprints start to start + nb_rows."""
+    rng = np.random.default_rng(seed + start)
+    index = np.arange(start, start + nb_rows)
+    return {
+        "id": [f"item{i}" for i in index],
+        "lon": rng.uniform(-179, 178, nb_rows),
+        "lat": rng.uniform(-89, 88, nb_rows),
+        "size": rng.uniform(0.01, 1, nb_rows),
+        "datetime": pd.Timestamp("2006-01-01", tz="UTC")
+        + pd.to_timedelta(index * 3600, unit="s"),
+        "instrument": [INSTRUMENTS[i % len(INSTRUMENTS)] for i in index],
+        "incidence": rng.uniform(0, 90, nb_rows),
+    }
+
+
+def footprints(nb_rows: int, seed: int = 0) -> gpd.GeoDataFrame:
+    """Returns nb_rows random rectangular footprints on Mars, indexed by
+    datetime as the catalogs loaded from STAC."""
+    columns = footprint_properties(0, nb_rows, seed)
+    geometry = shapely.box(
+        columns["lon"],
+        columns["lat"],
+        columns["lon"] + columns["size"],
+        columns["lat"] + columns["size"],
+    )
+    data = {
+        key: value
+        for key, value in columns.items()
+        if key not in ["lon", "lat", "size"]
+    }
+    return gpd.GeoDataFrame(
+        data, geometry=geometry, crs=Wfs.CRS_WKT
+    ).set_index("datetime")
+
+
+def features(start: int, nb_rows: int, stac: bool) -> List[Dict[str, Any]]:
+    """Returns the footprints start to start + nb_rows as GeoJSON features,
+    with the STAC attributes when stac is True."""
+    columns = footprint_properties(start, nb_rows)
+    result: List[Dict[str, Any]] = list()
+    for position in range(nb_rows):
+        lon = round(float(columns["lon"][position]), 6)
+        lat = round(float(columns["lat"][position]), 6)
+        size = round(float(columns["size"][position]), 6)
+        instrument = columns["instrument"][position]
+        properties: Dict[str, Any] = {
+            "datetime": columns["datetime"][position].isoformat(),
+            "incidence": round(float(columns["incidence"][position]), 3),
+        }
+        feature: Dict[str, Any] = {
+            "type": "Feature",
+            "id": columns["id"][position],
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [
+                        [lon, lat],
+                        [lon + size, lat],
+                        [lon + size, lat + size],
+                        [lon, lat + size],
+                        [lon, lat],
+                    ]
+                ],
+            },
+            "properties": properties,
+        }
+        if stac:
+            properties["ssys:targets"] = ["Mars"]
+            properties["hashtags"] = [
+                f"instrument:{instrument}",
+                "target:mars",
+            ]
+            feature["assets"] = {
+                "data": {
+                    "href": f"http://localhost/{columns['id'][position]}.img"
+                },
+                "thumbnail": {
+                    "href": f"http://localhost/{columns['id'][position]}.jpg"
+                },
+            }
+        else:
+            properties["instrument"] = instrument
+        result.append(feature)
+    return result
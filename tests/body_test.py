@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import box
+
+from pdssp.dal import Stac
+
+pytest.importorskip("ipymizar")
+
+from pdssp.body import PlanetFactory  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def _collection(name, targets, start):
+    return gpd.GeoDataFrame(
+        {
+            f"{name}:mode": [name] * len(targets),
+            "ssys:targets": [[target] for target in targets],
+        },
+        geometry=[box(i, 0, i + 1, 1) for i in range(len(targets))],
+        index=pd.DatetimeIndex(
+            pd.date_range(start, periods=len(targets), freq="D", tz="UTC"),
+            name="datetime",
+        ),
+    )
+
+
+def test_load_many(monkeypatch):
+    collections = {
+        "http://stac/ctx": _collection("ctx", ["Mars", "Mars"], "2020-01-02"),
+        "http://stac/hirise": _collection("hirise", ["mars"], "2020-01-01"),
+        "http://stac/modis": _collection("modis", ["Earth", "Moon"], "2020"),
+    }
+    monkeypatch.setattr(
+        Stac,
+        "load",
+        lambda type, url, *args, **kwargs: collections[url].copy(),
+    )
+    planets = PlanetFactory.load_many(
+        {
+            "ctx": "http://stac/ctx",
+            "hirise": "http://stac/hirise",
+            "modis": "http://stac/modis",
+        }
+    )
+    assert sorted(planets) == ["EARTH", "MARS"]
+    mars = planets["MARS"].data
+    assert list(mars["source"]) == ["hirise", "ctx", "ctx"]
+    assert mars.index.is_monotonic_increasing
+    assert list(mars.columns).count("ctx:mode") == 1
+    assert mars["ctx:mode"].isna().sum() == 1
+    assert list(planets["EARTH"].data["source"]) == ["modis"]
+
+    planets = PlanetFactory.load_many(["http://stac/ctx"], max_workers=1)
+    assert list(planets["MARS"].data["source"]) == ["http://stac/ctx"] * 2
@@ -0,0 +1,736 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+import requests
+from PIL import Image
+from rasterio.transform import from_origin
+from shapely.geometry import box
+from shapely.geometry import Point
+
+from pdssp.dal import AssetDownloader
+from pdssp.dal import ogc
+from pdssp.dal import ParquetCatalog
+from pdssp.dal import PreviewLoader
+from pdssp.dal import RasterReader
+from pdssp.dal import SpatialJoin
+from pdssp.dal import Stac
+from pdssp.dal import StacEnum
+from pdssp.dal import StacSchema
+from pdssp.dal import Transport
+from pdssp.metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+WMS_CAPABILITIES = b"""<?xml version="1.0" encoding="UTF-8"?>
+<WMT_MS_Capabilities version="1.1.1">
+  <Service>
+    <Name>OGC:WMS</Name>
+    <Title>Mars</Title>
+  </Service>
+  <Capability>
+    <Request>
+      <GetMap>
+        <Format>image/png</Format>
+        <DCPType><HTTP><Get>
+          <OnlineResource xmlns:xlink="http://www.w3.org/1999/xlink"
+            xlink:href="http://localhost/wms?"/>
+        </Get></HTTP></DCPType>
+      </GetMap>
+    </Request>
+    <Layer>
+      <Title>root</Title>
+      <SRS>EPSG:4326</SRS>
+      <Layer queryable="1">
+        <Name>viking</Name>
+        <Title>Viking mosaic</Title>
+        <LatLonBoundingBox minx="-180" miny="-90" maxx="180" maxy="90"/>
+        <Style><Name>default</Name><Title>default</Title></Style>
+      </Layer>
+      <Layer>
+        <Name>gale</Name>
+        <Title>Gale crater</Title>
+        <LatLonBoundingBox minx="137" miny="-6" maxx="138" maxy="-4"/>
+        <Extent name="time" default="2012-08-06">2012-08-06/2020-01-01/P1D</Extent>
+      </Layer>
+    </Layer>
+  </Capability>
+</WMT_MS_Capabilities>
+"""
+
+WFS_CAPABILITIES = b"""<?xml version="1.0" encoding="UTF-8"?>
+<wfs:WFS_Capabilities version="2.0.0"
+  xmlns:wfs="http://www.opengis.net/wfs/2.0"
+  xmlns:ows="http://www.opengis.net/ows/1.1">
+  <ows:ServiceIdentification>
+    <ows:Title>Mars</ows:Title>
+    <ows:ServiceType>WFS</ows:ServiceType>
+    <ows:ServiceTypeVersion>2.0.0</ows:ServiceTypeVersion>
+  </ows:ServiceIdentification>
+  <ows:OperationsMetadata/>
+  <wfs:FeatureTypeList>
+    <wfs:FeatureType>
+      <wfs:Name>footprints</wfs:Name>
+      <wfs:Title>Footprints</wfs:Title>
+      <wfs:DefaultCRS>urn:ogc:def:crs:EPSG::4326</wfs:DefaultCRS>
+    </wfs:FeatureType>
+  </wfs:FeatureTypeList>
+</wfs:WFS_Capabilities>
+"""
+
+WFS_FEATURE_TYPE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+  xmlns:gml="http://www.opengis.net/gml/3.2"
+  xmlns:mars="http://mars">
+  <xsd:complexType name="footprintsType">
+    <xsd:complexContent>
+      <xsd:extension base="gml:AbstractFeatureType">
+        <xsd:sequence>
+          <xsd:element name="geom" type="gml:MultiSurfacePropertyType"
+            nillable="true"/>
+          <xsd:element name="orbit" type="xsd:int" nillable="false"/>
+          <xsd:element name="mode" nillable="true">
+            <xsd:simpleType>
+              <xsd:restriction base="xsd:string"/>
+            </xsd:simpleType>
+          </xsd:element>
+        </xsd:sequence>
+      </xsd:extension>
+    </xsd:complexContent>
+  </xsd:complexType>
+  <xsd:element name="footprints" type="mars:footprintsType"/>
+</xsd:schema>
+"""
+
+
+def _png(width, height):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), (200, 10, 10)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+FILES = {
+    "a.img": b"a" * 5000,
+    "b.img": b"b" * 3000,
+    "c.img": b"a" * 5000,
+    "q.png": _png(1000, 500),
+}
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves the files of the current directory with range requests and
+    logs the requests in requests.log."""
+
+    def _log_request(self):
+        with open("requests.log", "a", encoding="utf-8") as file:
+            file.write(f"{self.path} {self.headers.get('Range', '')}\n")
+
+    def _send_headers(self):
+        path = urlparse(self.path).path.lstrip("/")
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return None
+        with open(path, "rb") as file:
+            content = file.read()
+        start, end = 0, len(content) - 1
+        if "Range" in self.headers:
+            first, last = self.headers["Range"][6:].split("-")
+            start = int(first)
+            end = min(int(last), end) if last else end
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{end}/{len(content)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        return content[start : end + 1]
+
+    def do_HEAD(self):
+        self._send_headers()
+
+    def do_GET(self):
+        self._log_request()
+        content = self._send_headers()
+        if content is not None:
+            self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(directory, queue):
+    os.chdir(directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class HttpServer:
+    def __init__(self, directory):
+        self.directory = directory
+        for name, content in FILES.items():
+            self.add(name, content)
+        queue = multiprocessing.Queue()
+        # GDAL keeps the GIL while reading, so the server needs its own
+        # process
+        self.process = multiprocessing.Process(
+            target=_serve, args=(directory, queue), daemon=True
+        )
+        self.process.start()
+        self.url = f"http://127.0.0.1:{queue.get(timeout=10)}"
+
+    def add(self, name, content):
+        with open(os.path.join(self.directory, name), "wb") as file:
+            file.write(content)
+
+    def requests(self):
+        path = os.path.join(self.directory, "requests.log")
+        if not os.path.exists(path):
+            return list()
+        with open(path, encoding="utf-8") as file:
+            return [line.split(" ", 1) for line in file.read().splitlines()]
+
+    def close(self):
+        self.process.terminate()
+        self.process.join()
+
+
+@pytest.fixture
+def http_server(tmp_path_factory):
+    server = HttpServer(str(tmp_path_factory.mktemp("www")))
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def wms(http_server):
+    http_server.add("wms", WMS_CAPABILITIES)
+    return ogc.Wms(f"{http_server.url}/wms")
+
+
+def test_wms_catalog(wms):
+    catalog = wms.catalog()
+    assert list(catalog.index) == ["viking", "gale"]
+    assert catalog.loc["viking", "queryable"]
+    assert catalog.loc["viking", "styles"] == ["default"]
+    assert catalog.loc["gale", "maxx"] == 138.0
+    assert catalog.loc["gale", "time_end"].year == 2020
+    assert wms.catalog() is catalog
+
+
+def test_wms_find_layers(wms):
+    layers = wms.find_layers(Point(137.4, -5.4))
+    assert list(layers.index) == ["viking", "gale"]
+    layers = wms.find_layers((10, 10, 20, 20))
+    assert list(layers.index) == ["viking"]
+
+
+def test_wfs_schema():
+    assert ogc.Wfs._parse_schema(WFS_FEATURE_TYPE) == {
+        "properties": {"orbit": "int", "mode": "string"},
+        "required": ["orbit"],
+        "geometry": "3D MultiPolygon",
+        "geometry_column": "geom",
+    }
+    assert ogc.Wfs._parse_schema(WFS_CAPABILITIES) is None
+
+
+def test_wfs_requests(http_server, monkeypatch):
+    http_server.add("wfs", WFS_CAPABILITIES)
+    wfs = ogc.Wfs(f"{http_server.url}/wfs")
+    assert wfs.layers == ["footprints"]
+    # EPSG:4326 is in latitude, longitude order
+    assert (
+        wfs._bbox_param("footprints", (1, 2, 3, 4))
+        == "2,1,4,3,urn:ogc:def:crs:EPSG::4326"
+    )
+    calls = list()
+
+    def get(url, **kwargs):
+        calls.append(url)
+        raise requests.exceptions.ConnectionError("refused")
+
+    monkeypatch.setattr(wfs.transport, "get", get)
+    monkeypatch.setattr(ogc.time, "sleep", lambda delay: None)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        wfs._retrieve_all_features("footprints", 0, 10, 10)
+    assert len(calls) == ogc.Wfs.MAX_RETRIES + 1
+
+
+def test_download_assets(http_server, tmp_path):
+    checksum = "1220" + hashlib.sha256(FILES["a.img"]).hexdigest()
+    data = pd.DataFrame(
+        {
+            "assets": [
+                {
+                    "data": {
+                        "href": f"{http_server.url}/a.img",
+                        "file:checksum": checksum,
+                    },
+                    "thumbnail": {"href": f"{http_server.url}/b.img"},
+                },
+                {"data": {"href": f"{http_server.url}/c.img"}},
+            ]
+        }
+    )
+    downloader = AssetDownloader(str(tmp_path), max_workers=2)
+    paths = downloader.download_assets(data, ["data"])
+    assert list(paths.columns) == ["data"]
+    # same content, stored once
+    assert paths["data"].iloc[0] == paths["data"].iloc[1]
+    with open(paths["data"].iloc[0], "rb") as file:
+        assert file.read() == FILES["a.img"]
+
+    paths = downloader.download_assets(data)
+    assert list(paths.columns) == ["data", "thumbnail"]
+    assert pd.isna(paths["thumbnail"].iloc[1])
+
+
+def test_download_resume_and_checksum(http_server, tmp_path):
+    downloader = AssetDownloader(str(tmp_path))
+    href = f"{http_server.url}/b.img"
+    with open(downloader._partial_path(href), "wb") as file:
+        file.write(FILES["b.img"][0:1000])
+    path = downloader.download(href)
+    assert ["/b.img", "bytes=1000-"] in http_server.requests()
+    assert os.path.getsize(path) == 3000
+    # the index is saved by download
+    assert AssetDownloader(str(tmp_path)).get(href) == path
+
+    with pytest.raises(ValueError):
+        downloader.download(f"{http_server.url}/a.img", "1220" + "0" * 64)
+
+    # the multihash code of md5 is a 2 bytes varint
+    checksum = "d50110" + hashlib.md5(FILES["c.img"]).hexdigest()
+    assert AssetDownloader._parse_checksum(checksum) == (
+        "md5",
+        hashlib.md5(FILES["c.img"]).hexdigest(),
+    )
+    path = downloader.download(f"{http_server.url}/c.img", checksum)
+    assert os.path.getsize(path) == 5000
+    with pytest.raises(ValueError):
+        AssetDownloader._parse_checksum(checksum[:-2])
+
+
+def test_previews(http_server, tmp_path):
+    data = pd.DataFrame(
+        {
+            "assets": [
+                {"thumbnail": {"href": f"{http_server.url}/q.png"}},
+                {
+                    "img": {
+                        "href": f"{http_server.url}/a.img",
+                        "roles": ["data"],
+                    }
+                },
+            ]
+        }
+    )
+    hrefs = PreviewLoader.get_hrefs(data)
+    assert hrefs == [f"{http_server.url}/q.png", None]
+    assert PreviewLoader.has_preview(data)
+    assert not PreviewLoader.has_preview(data.iloc[1:])
+    assert not PreviewLoader.has_preview(pd.DataFrame({"id": [1, 2]}))
+
+    loader = PreviewLoader(str(tmp_path), max_items=1, max_size=100)
+    images = loader.get_all(hrefs + hrefs)
+    assert images[0].shape == (50, 100, 3)
+    assert images[1] is None
+    assert [path for path, _ in http_server.requests()] == ["/q.png"]
+
+    # evicted from memory, reloaded from the disk cache
+    loader.clear()
+    assert loader.get(hrefs[0]).shape == (50, 100, 3)
+    assert [path for path, _ in http_server.requests()] == ["/q.png"]
+    assert os.listdir(str(tmp_path)) == [
+        os.path.basename(loader._disk_path(hrefs[0]))
+    ]
+
+    # a corrupted file of the disk cache is fetched again
+    loader.clear()
+    with open(loader._disk_path(hrefs[0]), "wb") as file:
+        file.write(b"\x93NUMPY")
+    assert loader.get(hrefs[0]).shape == (50, 100, 3)
+    assert [path for path, _ in http_server.requests()] == ["/q.png"] * 2
+
+    # palette and gray with alpha images are converted to RGB(A)
+    for mode, channels in [("P", 3), ("LA", 4)]:
+        buffer = BytesIO()
+        Image.new(mode, (20, 10)).save(buffer, "PNG")
+        assert loader._decode(buffer.getvalue()).shape == (10, 20, channels)
+
+
+def test_read_window(http_server, tmp_path):
+    path = str(tmp_path / "cog.tif")
+    data = np.arange(1024 * 1024, dtype="uint16").reshape(1, 1024, 1024)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=1024,
+        height=1024,
+        count=1,
+        dtype="uint16",
+        tiled=True,
+        blockxsize=256,
+        blockysize=256,
+        compress="deflate",
+        transform=from_origin(137.0, -4.0, 0.001, 0.001),
+    ) as dst:
+        dst.write(data)
+        dst.build_overviews([2, 4])
+    with open(path, "rb") as file:
+        http_server.add("cog.tif", file.read())
+
+    reader = RasterReader()
+    assert reader.info("file://" + path)["overviews"] == [2, 4]
+
+    for href in ["file://" + path, f"{http_server.url}/cog.tif"]:
+        window, transform = reader.read(href, (512, 256, 100, 50))
+        assert np.array_equal(window, data[:, 256:306, 512:612])
+        assert transform == (137.512, 0.001, 0.0, -4.256, 0.0, -0.001)
+
+        overview, transform = reader.read(href, overview=1)
+        assert overview.shape == (1, 256, 256)
+        assert transform[1] == 0.004
+    assert all(value for _, value in http_server.requests())
+
+
+def test_transport(http_server, tmp_path):
+    conf = tmp_path / "pdssp.conf"
+    conf.write_text(
+        "[transport]\nread_timeout=5\nhttps_proxy=http://proxy:3128\n"
+    )
+    transport = Transport.from_config(str(conf))
+    assert transport.timeout == (10, 5)
+    assert transport.proxies == {"https": "http://proxy:3128"}
+    assert "gzip" in transport.headers["Accept-Encoding"]
+
+    transport = Transport()
+    for _ in range(2):
+        assert transport.get(f"{http_server.url}/b.img").content == b"b" * 3000
+    assert transport.session(http_server.url + "/a.img") is transport.session(
+        http_server.url
+    )
+    host = http_server.url[len("http://") :]
+    assert transport.metrics()[host]["requests"] == 2
+    assert transport.metrics()[host]["bytes"] == 6000
+
+
+def _stac_page(start, nb_items, next_href=None):
+    features = [
+        {
+            "type": "Feature",
+            "id": f"item{i}",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[i, 0], [i + 1, 0], [i + 1, 1], [i, 0]]],
+            },
+            "properties": {
+                "datetime": f"2020-01-{i + 1:02d}T00:00:00Z",
+                "hashtags": ["instrument:ctx", "target:mars"],
+            },
+            "assets": {"data": {"href": f"http://localhost/item{i}.img"}},
+        }
+        for i in range(start, start + nb_items)
+    ]
+    links = [] if next_href is None else [{"rel": "next", "href": next_href}]
+    return json.dumps(
+        {"type": "FeatureCollection", "features": features, "links": links}
+    ).encode("utf-8")
+
+
+def test_stac_load(http_server):
+    http_server.add("items", _stac_page(0, 3, f"{http_server.url}/page2"))
+    http_server.add("page2", _stac_page(3, 2))
+    registry = MetricsRegistry.get_instance()
+    records = registry.counter("stac_records_total").value
+
+    data = Stac.load(StacEnum.ITEM, f"{http_server.url}/items")
+    assert data.shape[0] == 5
+    assert isinstance(data.index, pd.DatetimeIndex)
+    assert list(data["instrument"]) == ["ctx"] * 5
+    assert data["data"].iloc[4] == "http://localhost/item4.img"
+    assert registry.counter("stac_records_total").value == records + 5
+    assert [path for path, _ in http_server.requests()] == [
+        "/items?limit=500",
+        "/page2",
+    ]
+
+    data = Stac.load(StacEnum.ITEM, f"{http_server.url}/items", max_records=2)
+    assert data.shape[0] == 2
+
+
+def test_stac_columns(http_server):
+    page = json.loads(_stac_page(0, 3))
+    for feature in page["features"]:
+        feature["properties"]["orbit"] = 10
+        feature["assets"]["browse"] = {"href": "http://localhost/browse.png"}
+    http_server.add("items", json.dumps(page).encode("utf-8"))
+
+    data = Stac.load(
+        StacEnum.ITEM, f"{http_server.url}/items", columns=["browse", "target"]
+    )
+    assert sorted(data.columns) == ["browse", "geometry", "heatmap", "target"]
+    assert isinstance(data.index, pd.DatetimeIndex)
+    assert list(data["target"]) == ["mars"] * 3
+    assert data["browse"].iloc[0] == "http://localhost/browse.png"
+    query = parse_qs(urlparse(http_server.requests()[-1][0]).query)
+    assert "properties.target" in query["fields"][0].split(",")
+    assert "assets.browse" in query["fields"][0].split(",")
+
+    data = Stac.load(
+        StacEnum.ITEM, f"{http_server.url}/items", columns=["orbit", "assets"]
+    )
+    assert sorted(data.columns) == ["assets", "geometry", "heatmap", "orbit"]
+    assert sorted(data["assets"].iloc[0]) == ["browse", "data"]
+
+
+def test_stac_schema(http_server, monkeypatch):
+    collection = {
+        "summaries": {
+            "view:incidence_angle": {"minimum": 0, "maximum": 90},
+            "processing:level": ["raw", "calibrated"],
+            "instruments": ["hirise", "ctx"],
+            "ssys:targets": ["Mars"],
+        },
+        "item_assets": {"data": {}, "browse": {}},
+    }
+    extension = {
+        "definitions": {
+            "fields": {
+                "properties": {
+                    "orbit:number": {"type": "integer"},
+                    "orbit:start": {"type": "string", "format": "date-time"},
+                    "ssys:targets": {"type": "array"},
+                }
+            }
+        }
+    }
+    http_server.add("collection", json.dumps(collection).encode("utf-8"))
+    http_server.add("extension", json.dumps(extension).encode("utf-8"))
+    pages = [json.loads(_stac_page(0, 2)), json.loads(_stac_page(2, 1))]
+    for page in pages:
+        for i, feature in enumerate(page["features"]):
+            feature["links"] = [
+                {"rel": "collection", "href": f"{http_server.url}/collection"}
+            ]
+            feature["stac_extensions"] = [f"{http_server.url}/extension"]
+            feature["properties"].update(
+                {
+                    "view:incidence_angle": str(10 * i),
+                    "processing:level": "raw",
+                    "orbit:number": 100 + i,
+                    "orbit:start": "2020-01-01T10:00:00Z",
+                    "instruments": ["hirise"],
+                    "ssys:targets": ["Mars"],
+                    "hashtags": ["mode:a", "mode:b"],
+                }
+            )
+    pages[0]["links"] = [{"rel": "next", "href": f"{http_server.url}/page2"}]
+    http_server.add("items", json.dumps(pages[0]).encode("utf-8"))
+    http_server.add("page2", json.dumps(pages[1]).encode("utf-8"))
+
+    # the collection and the extensions are not fetched by default
+    monkeypatch.setattr(StacSchema, "FETCH", False)
+    data = Stac.load(StacEnum.ITEM, f"{http_server.url}/items")
+    assert not pd.api.types.is_numeric_dtype(data["view:incidence_angle"])
+    assert [path for path, _ in http_server.requests()] == [
+        "/items?limit=500",
+        "/page2",
+    ]
+
+    monkeypatch.setattr(StacSchema, "FETCH", True)
+    monkeypatch.setattr(StacSchema, "TIMEOUT", 5)
+    data = Stac.load(StacEnum.ITEM, f"{http_server.url}/items")
+    assert list(data["view:incidence_angle"]) == [0.0, 10.0, 0.0]
+    assert isinstance(data["processing:level"].dtype, pd.CategoricalDtype)
+    assert list(data["processing:level"].cat.categories) == [
+        "raw",
+        "calibrated",
+    ]
+    assert str(data["orbit:number"].dtype) == "Int64"
+    assert isinstance(data["orbit:start"].dtype, pd.DatetimeTZDtype)
+    # the summaries of arrays do not make them categories
+    assert list(data["instruments"]) == [["hirise"]] * 3
+    assert list(data["ssys:targets"]) == [["Mars"]] * 3
+    # duplicated hashtags are concatenated
+    assert list(data["mode"]) == ["a,b"] * 3
+    # the declared assets are columns even when the items do not have them
+    assert data["browse"].isna().all()
+    assert data["data"].iloc[2] == "http://localhost/item2.img"
+    paths = [path for path, _ in http_server.requests()]
+    assert paths.count("/collection") == 1
+    assert paths.count("/extension") == 1
+
+
+def test_stac_hashtags():
+    features = [
+        {"properties": {"mode": "x", "hashtags": ["mode:a", "mode:b"]}},
+        {"properties": {"hashtags": ["mode:c"]}},
+        {"properties": {"mode": "y"}},
+    ]
+    data = gpd.GeoDataFrame.from_features(
+        [dict(feature, geometry=None) for feature in features]
+    )
+    data = StacSchema().columns(data, features)
+    # the hashtags are appended to the property of the item, if any
+    assert list(data["mode"]) == ["x,a,b", "c", "y"]
+
+
+def test_spatial_join(http_server):
+    left = gpd.GeoDataFrame(
+        {"name": ["a", "b", "c"]},
+        geometry=[box(0, 0, 1, 1), box(5, 5, 6, 6), box(0.5, 0.5, 5.5, 5.5)],
+    )
+    right = gpd.GeoDataFrame(
+        {"name": ["crater", "site"], "diameter": [10.0, 0.0]},
+        geometry=[box(0.8, 0.8, 0.9, 0.9), Point(5.8, 5.8)],
+        index=[10, 20],
+    )
+    expected = gpd.sjoin(left, right, predicate="intersects").sort_index()
+    for result in [
+        SpatialJoin.join_frames(left, right),
+        SpatialJoin(left, chunk_size=1).probe(right, indexed_on_left=True),
+    ]:
+        assert list(result.index) == list(expected.index)
+        assert list(result["index_right"]) == list(expected["index_right"])
+        assert list(result["name_right"]) == list(expected["name_right"])
+    result = SpatialJoin(right, "within").probe(left)
+    assert result.shape[0] == 0
+    result = SpatialJoin(right, "contains").probe(left)
+    assert list(result["name_left"]) == ["a", "b", "c"]
+
+    # the smaller side of a WFS join is indexed
+    class FakeWfs:
+        def __init__(self, data):
+            self.data = data
+            self.calls = list()
+
+        def get_count(self, layer_name, bbox=None):
+            return self.data.shape[0]
+
+        def get_data(self, layer_name, bbox=None):
+            self.calls.append("get_data")
+            return self.data
+
+        def iter_data(self, layer_name, bbox=None):
+            self.calls.append("iter_data")
+            yield self.data
+
+    wfs = FakeWfs(right)
+    result = SpatialJoin.frame_wfs(left, wfs, "layer")
+    assert wfs.calls == ["get_data"]
+    assert list(result["index_right"]) == list(expected["index_right"])
+    wfs = FakeWfs(right)
+    result = SpatialJoin.frame_wfs(left.iloc[0:1], wfs, "layer")
+    assert wfs.calls == ["iter_data"]
+    assert list(result["index_right"]) == [10]
+
+    # without pages, the result has the columns and the CRS of the join
+    right = right.set_crs(ogc.Wfs.CRS_WKT)
+    result = SpatialJoin(right).join([], indexed_on_left=True)
+    assert result.shape[0] == 0
+    assert list(result.columns) == [
+        "name",
+        "diameter",
+        "geometry",
+        "index_right",
+    ]
+    assert result.crs == right.crs
+    result = SpatialJoin(right).join([])
+    assert list(result.columns) == [
+        "geometry",
+        "index_right",
+        "name",
+        "diameter",
+    ]
+    assert result.crs == right.crs
+
+    http_server.add("items", _stac_page(0, 3))
+    join = SpatialJoin(right.iloc[0:1])
+    pages = Stac.iter_pages(
+        StacEnum.ITEM, f"{http_server.url}/items", bbox=join.bounds
+    )
+    result = join.join(pages)
+    assert list(result["data"]) == ["http://localhost/item0.img"]
+    assert (
+        http_server.requests()[-1][0]
+        == "/items?limit=500&bbox=0.8%2C0.8%2C0.9%2C0.9"
+    )
+
+
+def test_parquet_catalog_std(tmp_path):
+    rng = np.random.default_rng(0)
+    values = 1e9 + rng.normal(size=3000)
+    data = gpd.GeoDataFrame(
+        {"value": values}, geometry=[box(0, 0, 1, 1)] * len(values)
+    )
+    catalog = ParquetCatalog.write(
+        [data], str(tmp_path / "data"), partition_size=700
+    )
+    description = catalog.describe()
+    assert description.loc["std", "value"] == pytest.approx(
+        np.std(values, ddof=1), rel=1e-6
+    )
+    assert description.loc["mean", "value"] == pytest.approx(np.mean(values))
+
+
+def test_parquet_catalog(http_server, tmp_path):
+    data = gpd.GeoDataFrame(
+        {"emission": np.arange(10, dtype=float), "orbit": np.arange(10) % 3},
+        geometry=[box(i * 10, 0, i * 10 + 1, 1) for i in range(10)],
+    )
+    pages = [data.iloc[0:3], data.iloc[3:4], data.iloc[4:10]]
+    catalog = ParquetCatalog.write(pages, str(tmp_path / "data"), 4)
+    assert [partition["rows"] for partition in catalog.partitions] == [
+        4,
+        4,
+        2,
+    ]
+    assert catalog.shape == (10, 3)
+    assert catalog.read().equals(data)
+
+    catalog = ParquetCatalog(str(tmp_path / "data"), max_workers=2)
+    assert list(catalog.query("orbit == 1").index) == [1, 4, 7]
+    expected = data[["emission", "orbit"]].describe()
+    description = catalog.describe()
+    for stat in ["count", "mean", "std", "min", "max"]:
+        assert list(description.loc[stat]) == pytest.approx(
+            list(expected.loc[stat])
+        )
+    counts, edges = catalog.histogram("emission", bins=5)
+    assert list(counts) == list(np.histogram(data["emission"], bins=5)[0])
+    assert list(edges) == pytest.approx(list(np.linspace(0, 9, 6)))
+    histograms = catalog.histograms(bins=5)
+    assert list(histograms) == ["emission", "orbit"]
+    assert list(histograms["emission"][0]) == list(counts)
+
+    result = catalog.filter_bbox((25, 0, 45, 1))
+    assert list(result.index) == [3, 4]
+
+    http_server.add("items", _stac_page(0, 3, f"{http_server.url}/page2"))
+    http_server.add("page2", _stac_page(3, 2))
+    catalog = ParquetCatalog.from_stac(
+        f"{http_server.url}/items", str(tmp_path / "stac"), partition_size=2
+    )
+    assert len(catalog.partitions) == 3
+    result = catalog.query("instrument == 'ctx'")
+    assert result.shape[0] == 5
+    assert isinstance(result.index, pd.DatetimeIndex)
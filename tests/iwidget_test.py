@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import json
+import logging
+import urllib.request
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+from pdssp.dal import Wfs
+
+pytest.importorskip("ipymizar")
+
+from pdssp.iwidget import GeoJSONLayer  # noqa: E402
+from pdssp.iwidget.mizar import Mizar  # noqa: E402
+from pdssp.iwidget.tiles import TileCache  # noqa: E402
+from pdssp.iwidget.tiles import TileServer  # noqa: E402
+from pdssp.iwidget.tiles import VectorTiles  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def footprints():
+    return gpd.GeoDataFrame(
+        {"name": ["west", "east", "north"]},
+        geometry=[
+            box(-10, -10, -5, -5),
+            box(5, -10, 10, -5),
+            box(1, 60, 2, 61),
+        ],
+        crs=Wfs.CRS_WKT,
+    )
+
+
+def _collection(*ids):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            dict(
+                {"type": "Feature", "geometry": None, "properties": {}},
+                **({} if feature_id is None else {"id": feature_id}),
+            )
+            for feature_id in ids
+        ],
+    }
+
+
+def _ids(layer):
+    return [feature.get("id") for feature in layer.data["features"]]
+
+
+def _record_syncs(visu, monkeypatch):
+    """Records the layers added and removed, and the hold_sync blocks of
+    the widget."""
+    events = list()
+    planet = visu.planet
+    hold_sync = planet.hold_sync
+    add_layer = planet.add_layer
+    remove_layer = planet.remove_layer
+
+    @contextlib.contextmanager
+    def recorded_hold_sync():
+        events.append("hold")
+        with hold_sync():
+            yield
+        events.append("sync")
+
+    def recorded_add_layer(layer):
+        events.append(f"add {layer.name}")
+        add_layer(layer)
+
+    def recorded_remove_layer(layer):
+        events.append(f"remove {layer.name}")
+        remove_layer(layer)
+
+    monkeypatch.setattr(planet, "hold_sync", recorded_hold_sync)
+    monkeypatch.setattr(planet, "add_layer", recorded_add_layer)
+    monkeypatch.setattr(planet, "remove_layer", recorded_remove_layer)
+    return events
+
+
+def test_layers(monkeypatch):
+    visu = Mizar()
+    events = _record_syncs(visu, monkeypatch)
+    visu.add_layers(
+        [
+            GeoJSONLayer(name="a", data=_collection("1")),
+            GeoJSONLayer(name="b", data=_collection("2")),
+        ]
+    )
+    assert events == ["hold", "add a", "add b", "sync"]
+    assert visu.has_layer("a") and visu.has_layer("b")
+    layer = visu._find_layer("a")
+
+    # a layer with the name of another one replaces it
+    events.clear()
+    visu.add_layer(GeoJSONLayer(name="a", data=_collection("3")))
+    assert events == ["remove a", "add a"]
+    assert visu._find_layer("a") is not layer
+    assert visu.feature_ids("a") == {"3"}
+
+    events.clear()
+    assert visu.replace_layer(GeoJSONLayer(name="b", data=_collection("4")))
+    assert events == ["hold", "remove b", "add b", "sync"]
+    assert not visu.replace_layer(GeoJSONLayer(name="c", data=_collection()))
+
+    events.clear()
+    assert not visu.remove_layers(["a", "unknown", "c"])
+    assert events == ["hold", "remove a", "remove c", "sync"]
+    assert not visu.has_layer("a") and not visu.has_layer("c")
+    assert visu.feature_ids("a") == set()
+    assert visu.has_layer("b")
+    assert visu.remove_layer("b")
+    assert not visu.remove_layer("b")
+
+
+def test_update_features():
+    visu = Mizar()
+    visu.add_layer(GeoJSONLayer(name="data", data=_collection("a", "b")))
+    layer = visu._find_layer("data")
+    assert visu.feature_ids("data") == {"a", "b"}
+
+    features = _collection("c")["features"]
+    assert visu.update_features("data", added=features, removed=["a"])
+    assert _ids(layer) == ["b", "c"]
+    # nothing is sent without change
+    data = layer.data
+    assert visu.update_features("data")
+    assert layer.data is data
+
+    # the features without id get ids that are never reused
+    visu.update_features("data", added=_collection(None, None)["features"])
+    new_ids = visu.feature_ids("data") - {"b", "c"}
+    assert len(new_ids) == 2
+    visu.update_features("data", removed=[sorted(new_ids)[0]])
+    visu.update_features("data", added=_collection(None)["features"])
+    assert len(visu.feature_ids("data")) == 4
+    assert not visu.update_features("unknown", removed=["a"])
+
+
+def test_replace_features():
+    visu = Mizar()
+    visu.add_layer(GeoJSONLayer(name="data", data=_collection("a", "b")))
+    layer = visu._find_layer("data")
+    assert visu.replace_features("data", _collection("b", "c")["features"])
+    assert _ids(layer) == ["b", "c"]
+    data = layer.data
+    assert visu.replace_features("data", _collection("c", "b")["features"])
+    assert layer.data is data
+
+    # the features without id replace the data
+    assert visu.replace_features("data", _collection(None)["features"])
+    assert _ids(layer) == [None]
+    assert len(visu.feature_ids("data")) == 1
+    assert not visu.replace_features("unknown", [])
+
+
+def test_highlight():
+    visu = Mizar()
+    visu.highlight(_collection("a", "b"))
+    layer = visu._find_layer("highlight")
+    # the highlight layer is updated, not created again
+    visu.highlight(_collection("b", "c"), color=[0, 0, 1, 1])
+    assert visu._find_layer("highlight") is layer
+    assert _ids(layer) == ["b", "c"]
+    assert layer.style["strokeColor"] == [0, 0, 1, 1]
+    visu.highlight(None)
+    assert not visu.has_layer("highlight")
+    visu.highlight(_collection("a"))
+    assert _ids(visu._find_layer("highlight")) == ["a"]
+
+
+def test_remove_dataset_visu3D(footprints):
+    from pdssp.body.planet import Mars
+    from pdssp.body.planet import MarsVisu
+
+    mars = Mars(footprints)
+    visu = MarsVisu()
+    mars.show_dataset_visu3D(visu)
+    layer = visu._find_layer("data")
+    mars.remove_dataset_visu3D(visu)
+    # hidden, not removed
+    assert visu._find_layer("data") is layer
+    assert layer.visible is False
+    data = layer.data
+    mars.show_dataset_visu3D(visu)
+    assert visu._find_layer("data") is layer
+    assert layer.visible is True
+    assert layer.data is data
+
+
+def test_tile_cache():
+    cache = TileCache(max_size=2)
+    cache.put((0, 0, 0), b"a")
+    cache.put((0, 1, 0), b"b")
+    assert cache.get((0, 0, 0)) == b"a"
+    cache.put((1, 0, 0), b"c")
+    # the least recently used tile is evicted
+    assert cache.get((0, 1, 0)) is None
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_vector_tiles(footprints):
+    assert VectorTiles.bounds(0, 1, 0) == (0, -90, 180, 90)
+    assert VectorTiles.bounds(2, 3, 1) == (-45, 0, 0, 45)
+    with pytest.raises(ValueError):
+        VectorTiles.bounds(0, 2, 0)
+
+    tiles = VectorTiles(footprints)
+    assert list(tiles.features(0, 0, 0)["name"]) == ["west"]
+    assert list(tiles.features(0, 1, 0)["name"]) == ["east", "north"]
+    tile = json.loads(tiles.tile(1, 2, 0))
+    assert [feature["id"] for feature in tile["features"]] == ["2"]
+    assert tiles.tile(1, 2, 0) is tiles.tile(1, 2, 0)
+    with pytest.raises(ValueError):
+        tiles.tile(0, 0, 0, "png")
+
+
+def test_tile_server(footprints):
+    server = TileServer(origins=["https://hub.example.org"])
+    try:
+        server.register("mars", footprints)
+        layer = server.layer("mars")
+        assert layer.url == f"{server.url}/mars/{{z}}/{{x}}/{{y}}.geojson"
+        with pytest.raises(ValueError):
+            server.layer("mars", format="mvt")
+        url = layer.url.format(z=0, x=1, y=0)
+        with urllib.request.urlopen(url) as response:
+            assert "Access-Control-Allow-Origin" not in response.headers
+            tile = json.loads(response.read())
+        assert len(tile["features"]) == 2
+        # only the notebook origins can read the tiles
+        for origin, allowed in [
+            ("http://localhost:8888", True),
+            ("https://hub.example.org", True),
+            ("https://other.example.org", False),
+        ]:
+            request = urllib.request.Request(url, headers={"Origin": origin})
+            with urllib.request.urlopen(request) as response:
+                assert response.headers["Access-Control-Allow-Origin"] == (
+                    origin if allowed else None
+                )
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{server.url}/venus/0/0/0.geojson")
+    finally:
+        server.stop()
+
+
+def test_feature_cache(footprints):
+    from pdssp.body.geojson import FeatureCache
+
+    cache = FeatureCache(footprints)
+    selection = cache.geojson(footprints.iloc[[2, 0]])
+    assert [feature["id"] for feature in selection["features"]] == ["2", "0"]
+    assert cache.geojson(footprints.iloc[[2, 0]]) is selection
+    # the features are built once by row
+    features = cache.features(footprints.iloc[[0, 1]])
+    assert features[0] is selection["features"][1]
+
+    footprints.geometry = footprints.geometry.translate(1)
+    moved = cache.geojson(footprints.iloc[[2, 0]])
+    assert cache.generation == 1
+    assert moved is not selection
+    assert moved["features"][0]["geometry"]["coordinates"][0][0][0] == 3
+
+    # rows that are not in the data are serialized without cache
+    other = footprints.set_axis(["a", "b", "c"])
+    assert cache.features(other)[0]["id"] == "a"
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from pdssp.custom_logging import CustomColorFormatter
+from pdssp.custom_logging import UtilsLogs
+from pdssp.metrics import MetricsRegistry
+from pdssp.monitoring import UtilsMonitoring
+from pdssp.tracing import FileSpanExporter
+from pdssp.tracing import InMemorySpanExporter
+from pdssp.tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_histogram(registry):
+    histogram = registry.histogram("latency_seconds", host="mars")
+    for value in range(1, 101):
+        histogram.observe(value)
+    result = histogram.to_dict()
+    assert result["count"] == 100
+    assert result["p50"] == 51
+    assert result["p99"] == 100
+    assert registry.histogram("latency_seconds", host="mars") is histogram
+
+
+def test_registry_export(registry):
+    registry.counter("requests_total", host="a").inc(2)
+    registry.gauge("rows").set(10)
+    with registry.timer("step_seconds"):
+        pass
+    text = registry.to_prometheus()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{host="a"} 2' in text
+    assert 'step_seconds{quantile="0.5"}' in text
+    assert "step_seconds_count 1" in text
+    assert json.loads(registry.to_json())["rows"][0]["value"] == 10
+
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total")
+
+    registry.reset()
+    assert registry.counter("requests_total", host="a").value == 0
+
+
+def test_registry_export_while_registering(registry):
+    def register():
+        for index in range(5000):
+            registry.counter("requests_total", host=str(index)).inc()
+
+    thread = threading.Thread(target=register)
+    thread.start()
+    while thread.is_alive():
+        registry.to_prometheus()
+        registry.to_dict()
+    thread.join()
+    assert len(registry.to_dict()["requests_total"]) == 5000
+
+
+def test_monitoring_decorators():
+    @UtilsMonitoring.metric
+    def failing():
+        raise RuntimeError("failure")
+
+    @UtilsMonitoring.measure_memory
+    @UtilsMonitoring.time_spend
+    @UtilsMonitoring.measure_memory
+    def nested():
+        return list(range(1000))
+
+    @UtilsMonitoring.metric
+    @UtilsMonitoring.time_spend
+    def both():
+        return None
+
+    for _ in range(3):
+        assert len(nested()) == 1000
+        both()
+        with pytest.raises(RuntimeError):
+            failing()
+
+    registry = MetricsRegistry.get_instance()
+    name = "test_monitoring_decorators.<locals>.failing"
+    assert registry.counter("function_calls_total", function=name).value == 3
+    assert registry.counter("function_errors_total", function=name).value == 3
+    name = "test_monitoring_decorators.<locals>.nested"
+    assert (
+        registry.histogram("function_time_spend_seconds", function=name).count
+        == 3
+    )
+    assert (
+        registry.histogram("function_memory_bytes", function=name).count == 6
+    )
+    # each decorator has its own histogram
+    name = "test_monitoring_decorators.<locals>.both"
+    for metric in ["function_duration_seconds", "function_time_spend_seconds"]:
+        assert registry.histogram(metric, function=name).count == 3
+
+
+def test_tracing(tmp_path):
+    assert Tracer().span("step") is Tracer().span("other")
+
+    exporter = InMemorySpanExporter()
+    path = str(tmp_path / "spans.jsonl")
+    tracer = Tracer([exporter, FileSpanExporter(path)])
+    with tracer.span("load", url="http://mars") as parent:
+        with tracer.span("page") as child:
+            child.set_attribute("rows", 10)
+    with pytest.raises(ValueError):
+        with tracer.span("failed"):
+            raise ValueError("error")
+
+    page, load, failed = exporter.spans
+    assert page.parent_id == load.span_id
+    assert page.trace_id == load.trace_id
+    assert load.parent_id is None and load is parent
+    assert page.attributes == {"rows": 10}
+    assert failed.status == "ERROR"
+    with open(path, encoding="utf-8") as file:
+        lines = [json.loads(line) for line in file]
+    assert [line["name"] for line in lines] == ["page", "load", "failed"]
+    assert lines[1]["attributes"]["url"] == "http://mars"
+
+
+def test_io_display_is_lazy(caplog):
+    class Expensive:
+        nb_repr = 0
+
+        def __repr__(self):
+            Expensive.nb_repr += 1
+            return "x" * 10000
+
+    @UtilsMonitoring.io_display
+    def identity(value):
+        return value
+
+    logger = logging.getLogger("pdssp.monitoring")
+    logger.setLevel(logging.INFO)
+    identity(Expensive())
+    assert Expensive.nb_repr == 0
+
+    logger.setLevel(logging.TRACE)
+    with caplog.at_level(logging.TRACE, logger="pdssp.monitoring"):
+        identity(list(range(1000)))
+    logger.setLevel(logging.NOTSET)
+    entering, exiting = [record.getMessage() for record in caplog.records]
+    assert entering.startswith("Entering") and "..." in entering
+    assert len(exiting) < 200
+
+
+def test_color_formatter_keeps_records():
+    formatter = CustomColorFormatter("%(levelname)s %(message)s")
+    record = logging.LogRecord(
+        "pdssp", logging.WARNING, "pathname", 1, "message", None, None
+    )
+    text = formatter.format(record)
+    color = CustomColorFormatter.log_colors[logging.WARNING]
+    assert text == (
+        f"{color}WARNING{CustomColorFormatter.color_Off} "
+        f"{color}message{CustomColorFormatter.color_Off}"
+    )
+    assert record.levelname == "WARNING" and record.msg == "message"
+
+
+def test_async_json_logging():
+    stream = io.StringIO()
+    logger = logging.getLogger("pdssp.queue_test")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler(stream))
+    UtilsLogs.configure(
+        mode="async", output="json", logger_name="pdssp.queue_test"
+    )
+    logger.info("page {} loaded", 2)
+    logger.info("%s in %s", "tile", "cache")
+    UtilsLogs.stop_queue("pdssp.queue_test")
+
+    assert isinstance(logger.handlers[0], logging.StreamHandler)
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["message"] for line in lines] == [
+        "page 2 loaded",
+        "tile in cache",
+    ]
+    assert lines[0]["level"] == "INFO"
+    with pytest.raises(ValueError):
+        UtilsLogs.configure(mode="unknown")